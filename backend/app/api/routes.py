@@ -1,99 +1,362 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
-from typing import List, Dict, Any, Optional
+import os
+import json
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, AsyncIterator
 
-from app.utils.file_parsers import parse_file
+from app.utils.file_parsers import parse_file, parse_file_stream
 
-from app.schemas import DocumentCreate, QueryRequest, QueryResponse, HealthResponse
-from app.core.document_processor import process_document
-from app.database.vector_store import init_vector_store, search_similar_documents
-from app.core.llm import generate_response
+from app.schemas import (
+    DocumentCreate,
+    QueryRequest,
+    QueryResponse,
+    BatchQueryRequest,
+    BatchQueryResult,
+    SourceDocument,
+    HealthResponse,
+    JobStatusResponse,
+)
+from app.core.document_processor import process_document, stream_document_chunks
+from app.database.vector_store import (
+    init_vector_store,
+    index_chunk_stream,
+    search_similar_documents,
+    search_similar_documents_batch,
+    SearchHit,
+    get_local_vector_store,
+    get_qdrant_backend,
+    use_local_vector_store,
+)
+from app.core.llm import generate_response, stream_response, get_prompt_prefix_cache
+from app.core.context_builder import pack_context_async
+from app.core.executors import ExecutorSaturatedError, ExecutorTimeoutError, get_executor_stats, get_preprocess_pool
+from app.core.embeddings import get_embedding_batcher
+from app.core.embedding_cache import get_embedding_cache
+from app.core.jobs import IngestionJob, get_job_queue
+from app.core.answer_cache import answer_with_cache, find_cached_answer, get_answer_cache
+from app.database.retrieval_cache import get_retrieval_cache
+from app.database.lexical_index import get_lexical_index, is_hybrid_enabled
+from app.core.model_client import get_model_client, use_model_server
+from app.core.reranker import get_pair_score_cache, get_rerank_candidates, is_rerank_enabled, rerank, rerank_batch
 
 router = APIRouter()
 
 
 @router.post("/documents", status_code=201)
 async def upload_document(
+    response: Response,
     file: UploadFile = File(...),
     title: str = Form(...),
     source_type: str = Form("upload"),
-    description: Optional[str] = Form(None)
+    description: Optional[str] = Form(None),
+    background: bool = Query(False, description="Queue the document and return a job ID immediately")
 ):
     """
     Upload and process a document for the medical RAG system.
     Supports various file types including text, PDF, and potentially others.
+    
+    The upload is spooled to disk while it is received. Files larger than
+    STREAMING_MIN_BYTES are decoded, chunked and indexed incrementally from
+    the spooled file, so memory use does not grow with the file size.
+    With `background=true` the file is queued as an ingestion job instead.
     """
     try:
-        # Read file content
-        content = await file.read()
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, os.SEEK_END)
+            file_size = file.file.tell()
         
-        # Parse the file based on its type
-        parsed_document = await parse_file(content, file.filename)
+        # Additional metadata
+        extra_metadata = {"title": title, "source_type": source_type, "file_size": file_size}
+        if description:
+            extra_metadata["description"] = description
         
-        # Add additional metadata
-        parsed_document["metadata"]["title"] = title
-        parsed_document["metadata"]["source_type"] = source_type
-        parsed_document["metadata"]["file_size"] = len(content)
+        if background:
+            job = await get_job_queue().submit_upload(file.file, file.filename, extra_metadata)
+            response.status_code = 202
+            return _job_accepted(job, "Document queued for processing")
         
-        if description:
-            parsed_document["metadata"]["description"] = description
+        # PDFs are always streamed, so their pages can be extracted in parallel and chunked as they arrive
+        is_pdf = os.path.splitext(file.filename.lower())[1] == ".pdf"
+        streaming = is_pdf or file_size > int(os.getenv("STREAMING_MIN_BYTES", "1000000"))
         
-        # Process document into chunks
-        processed_docs = await process_document(parsed_document)
+        # Parse the file based on its type
+        if streaming:
+            parsed_document = await parse_file_stream(file.file, file.filename, pool=get_preprocess_pool())
+        else:
+            content = await file.read()
+            parsed_document = await parse_file(content, file.filename)
         
-        # Add documents to vector store
-        await init_vector_store(processed_docs)
+        # Add additional metadata
+        parsed_document["metadata"].update(extra_metadata)
+        
+        if streaming:
+            # Chunks are embedded and upserted as the file is decoded
+            chunk_count, chunks_indexed = await index_chunk_stream(
+                stream_document_chunks(parsed_document),
+                replace_sources=True
+            )
+        else:
+            # Process document into chunks
+            processed_docs = await process_document(parsed_document)
+            chunk_count = len(processed_docs)
+            
+            # Add documents to vector store, replacing any chunks left over from a previous upload
+            chunks_indexed = await init_vector_store(processed_docs, replace_sources=True)
         
         return {
             "message": "Document processed successfully", 
-            "chunks": len(processed_docs),
+            "chunks": chunk_count,
+            "chunks_indexed": chunks_indexed,
             "file_type": parsed_document["metadata"].get("file_type", "unknown")
         }
     
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
 
+async def _retrieve(query: str, max_docs: int, min_score: Optional[float]) -> List[SearchHit]:
+    """Search for a query's context, reranking over-fetched candidates when enabled"""
+    if not is_rerank_enabled():
+        return await search_similar_documents(query, k=max_docs, min_score=min_score)
+    candidates = await search_similar_documents(query, k=get_rerank_candidates(max_docs), min_score=min_score)
+    return await rerank(query, candidates, max_docs)
+
+
 @router.post("/query", response_model=QueryResponse)
 async def query_model(request: QueryRequest):
     """
     Query the medical RAG system.
     """
     try:
-        # Search for relevant documents
+        # Search for relevant documents, dropping those below the score cutoff
         max_docs = request.max_documents or 5
-        similar_docs = await search_similar_documents(request.query, k=max_docs)
+        hits = await _retrieve(request.query, max_docs, request.min_score)
         
-        # Generate response using retrieved documents as context
-        answer = await generate_response(request.query, similar_docs)
+        # Keep the best chunks that fit the context window, without repeated overlap
+        similar_docs, used_hits = await pack_context_async(request.query, hits)
         
-        # Return response with sources
+        # Generate response using retrieved documents as context, unless an
+        # answer to the same (or a near-identical) question is cached
+        answer, cached = await answer_with_cache(request.query, similar_docs, generate_response)
+        
+        # Return response with the sources the answer was generated from
         return QueryResponse(
             answer=answer,
-            sources=[f"Source {i+1}" for i in range(len(similar_docs))]
+            sources=[SourceDocument(**hit.to_dict()) for hit in used_hits],
+            cached=cached
         )
     
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    except ExecutorTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/query/stream")
+async def query_model_stream(request: QueryRequest, http_request: Request):
+    """
+    Query the medical RAG system and stream the answer as Server-Sent Events.
+    
+    Emits a `sources` event with the chunks put in the prompt and their
+    scores once retrieval is done, then one `token` event per
+    generated token, and finally `done` (or `error` if generation fails).
+    A cached answer is sent as a single token. Generation is aborted if the
+    client disconnects. A full generation pool, here or in the model server,
+    is reported as 503 before the response starts.
+    """
+    try:
+        # Retrieval and pool admission happen before the response starts,
+        # so failures here are still reported with a proper status code
+        max_docs = request.max_documents or 5
+        hits = await _retrieve(request.query, max_docs, request.min_score)
+        similar_docs, used_hits = await pack_context_async(request.query, hits)
+        cached_answer, remember = await find_cached_answer(request.query, similar_docs)
+        tokens = await stream_response(request.query, similar_docs) if cached_answer is None else None
+    
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            yield _sse_event("sources", {"sources": [hit.to_dict() for hit in used_hits]})
+            
+            if cached_answer is not None:
+                yield _sse_event("token", {"token": cached_answer})
+                yield _sse_event("done", {"cached": True})
+                return
+            
+            answer_parts = []
+            async for token in tokens:
+                if await http_request.is_disconnected():
+                    break
+                answer_parts.append(token)
+                yield _sse_event("token", {"token": token})
+            else:
+                # Only complete answers are cached
+                if remember is not None:
+                    remember("".join(answer_parts))
+                yield _sse_event("done", {})
+        
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Error generating response: {str(e)}"})
+        
+        finally:
+            # Stops generation if we left the loop early, or never entered it;
+            # with the model server this also frees the admitted request's slot
+            if tokens is not None:
+                await tokens.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/query/batch")
+async def query_model_batch(request: BatchQueryRequest):
+    """
+    Answer a batch of queries and stream the results as NDJSON.
+    
+    Retrieval for the whole batch runs up front: one embedding call and one
+    batched vector search. Answers are then generated with at most
+    BATCH_QUERY_CONCURRENCY (default: GENERATION_WORKERS) queries in the
+    generation pool at once, leaving its queue to interactive requests, and
+    each result is written as one JSON line as soon as it is ready, so lines
+    arrive in completion order and carry the `index` of their query. A query
+    whose generation fails gets a line with its `status` and `error` instead
+    of failing the batch.
+    """
+    max_batch = int(os.getenv("BATCH_QUERY_MAX_SIZE", "256"))
+    if len(request.queries) > max_batch:
+        raise HTTPException(status_code=413, detail=f"At most {max_batch} queries per batch")
+    
+    try:
+        max_docs = request.max_documents or 5
+        if is_rerank_enabled():
+            candidates = await search_similar_documents_batch(
+                request.queries, k=get_rerank_candidates(max_docs), min_score=request.min_score
+            )
+            all_hits = await rerank_batch(request.queries, candidates, max_docs)
+        else:
+            all_hits = await search_similar_documents_batch(request.queries, k=max_docs, min_score=request.min_score)
+    
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    
+    concurrency = int(os.getenv("BATCH_QUERY_CONCURRENCY", os.getenv("GENERATION_WORKERS", "1")))
+    slots = asyncio.Semaphore(max(1, concurrency))
+    
+    async def answer(index: int, query: str, hits: List[SearchHit]) -> BatchQueryResult:
+        result = BatchQueryResult(index=index, query=query)
+        async with slots:
+            try:
+                similar_docs, used_hits = await pack_context_async(query, hits)
+                result.sources = [SourceDocument(**hit.to_dict()) for hit in used_hits]
+                result.answer, result.cached = await answer_with_cache(query, similar_docs, generate_response)
+            
+            except ExecutorSaturatedError as e:
+                result.status, result.error = 503, str(e)
+            
+            except ExecutorTimeoutError as e:
+                result.status, result.error = 504, str(e)
+            
+            except Exception as e:
+                result.status, result.error = 500, f"Error processing query: {str(e)}"
+        return result
+    
+    async def result_lines() -> AsyncIterator[str]:
+        tasks = [
+            asyncio.ensure_future(answer(index, query, hits))
+            for index, (query, hits) in enumerate(zip(request.queries, all_hits))
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield (await next_result).model_dump_json() + "\n"
+        finally:
+            # Stops the remaining generations if the client disconnected
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
 
 
 @router.post("/text", status_code=201)
-async def add_text(document: DocumentCreate):
+async def add_text(
+    response: Response,
+    document: DocumentCreate,
+    background: bool = Query(False, description="Queue the text and return a job ID immediately")
+):
     """
     Add text content directly to the medical RAG system.
+    With `background=true` the text is queued as an ingestion job instead.
     """
     try:
+        if background:
+            job = await get_job_queue().submit_text(document.dict())
+            response.status_code = 202
+            return _job_accepted(job, "Text queued for processing")
+        
         # Process document into chunks
         processed_docs = await process_document(document.dict())
         
         # Add documents to vector store
-        await init_vector_store(processed_docs)
+        chunks_indexed = await init_vector_store(processed_docs)
         
-        return {"message": "Text processed successfully", "chunks": len(processed_docs)}
+        return {
+            "message": "Text processed successfully",
+            "chunks": len(processed_docs),
+            "chunks_indexed": chunks_indexed
+        }
+    
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing text: {str(e)}")
 
 
+def _job_accepted(job: IngestionJob, message: str) -> Dict[str, Any]:
+    """Build the response for a queued ingestion job"""
+    return {
+        "message": message,
+        "job_id": job.id,
+        "status_url": f"/api/jobs/{job.id}"
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """
+    Report the state, progress and throughput of an ingestion job.
+    """
+    job = await get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return JobStatusResponse(**job.to_dict())
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """
@@ -114,3 +377,41 @@ async def health_check():
             models_loaded=False,
             vector_db_connected=False
         )
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Report runtime counters for the model pools, the query embedding batcher,
+    the embedding, answer and retrieval caches, and prompt prefix reuse.
+    With a model server, its own counters are included under `model_server`.
+    The vector backend reports its Qdrant call counters or the embedded
+    store's size, and the lexical index and rerank score cache theirs when
+    they are in use.
+    """
+    metrics = {
+        "executors": get_executor_stats(),
+        "embedding_batcher": get_embedding_batcher().stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "retrieval_cache": get_retrieval_cache().stats(),
+        "prompt_cache": get_prompt_prefix_cache().stats()
+    }
+    
+    if use_local_vector_store():
+        metrics["local_vector_store"] = get_local_vector_store().stats()
+    else:
+        metrics["qdrant"] = get_qdrant_backend().stats()
+    if is_hybrid_enabled():
+        metrics["lexical_index"] = get_lexical_index().stats()
+    if is_rerank_enabled():
+        metrics["rerank_cache"] = get_pair_score_cache().stats()
+    
+    # The models, their pools and the embedding cache live in the model server
+    if use_model_server():
+        try:
+            metrics["model_server"] = await get_model_client().stats()
+        except Exception as e:
+            metrics["model_server"] = {"error": str(e)}
+    
+    return metrics
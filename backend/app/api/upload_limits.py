@@ -0,0 +1,64 @@
+"""
+Request body size limit for upload endpoints, enforced while the body is received.
+"""
+
+import os
+from typing import Iterable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def get_max_upload_bytes() -> int:
+    """
+    Return the maximum accepted upload size in bytes.
+
+    Returns:
+        int: Value of MAX_UPLOAD_BYTES (100 MB by default)
+    """
+    return int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than ``max_bytes`` on the given paths.
+
+    A declared Content-Length over the limit is refused before any of the body
+    is read. Otherwise the received bytes are counted as the body streams in,
+    and the request fails with 413 as soon as the limit is crossed, so an
+    oversized upload is never fully received or spooled.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload exceeds the maximum size of {self.max_bytes} bytes"
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, which FastAPI turns into the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,300 @@
+"""
+Semantic cache of generated answers.
+
+An answer is reused when a new query is either an exact (normalized) match
+of a cached query, or its embedding is within a cosine similarity threshold
+of one. In both cases the retrieved context must be the same set of
+documents, and the collection must not have changed since the answer was
+generated. Collection changes are tracked with the version shared by all
+processes, so re-ingesting a document from the ingestion script or another
+API worker also drops the answers cached here.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.embedding_cache import normalize_for_cache
+from app.core.embeddings import embed_text
+from app.database.vector_store import get_collection_version
+
+
+def make_source_key(context_documents: List[str]) -> str:
+    """
+    Identify a set of retrieved documents independently of their order.
+
+    The key hashes the text of the documents, not their IDs or sources, so a
+    chunk re-ingested with different content never matches answers that
+    were generated from its old text.
+
+    Args:
+        context_documents (List[str]): Retrieved document contents
+
+    Returns:
+        str: Hex digest of the set of documents
+    """
+    digests = sorted(hashlib.sha256(doc.encode("utf-8")).hexdigest() for doc in set(context_documents))
+    return hashlib.sha256("\0".join(digests).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _CachedAnswer:
+    query: str
+    embedding: np.ndarray  # unit length
+    source_key: str
+    answer: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    LRU cache of answers with a time-to-live and similarity lookups.
+
+    Entries are grouped by source set, so a similarity lookup only compares
+    the query against answers generated from the same documents. All
+    methods are thread-safe.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.97, ttl_seconds: float = 3600, max_items: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._entries: "OrderedDict[Tuple[str, str], _CachedAnswer]" = OrderedDict()
+        self._by_sources: Dict[str, List[Tuple[str, str]]] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_sources[entry.source_key]
+        keys.remove(key)
+        if not keys:
+            del self._by_sources[entry.source_key]
+
+    def _check_version(self, collection_version: int) -> None:
+        # Answers generated before the collection changed are all dropped at once
+        if self._version != collection_version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._by_sources.clear()
+            self._version = collection_version
+
+    def _is_expired(self, entry: _CachedAnswer, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def lookup(
+        self,
+        query: str,
+        embedding: np.ndarray,
+        source_key: str,
+        collection_version: int
+    ) -> Optional[str]:
+        """
+        Find a cached answer for a query and its retrieved documents.
+
+        Args:
+            query (str): The user's question
+            embedding (np.ndarray): Embedding of the question
+            source_key (str): make_source_key() of the retrieved documents
+            collection_version (int): Current collection version
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss
+        """
+        now = time.monotonic()
+        key = (normalize_for_cache(query), source_key)
+        with self._lock:
+            self._check_version(collection_version)
+
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(entry, now):
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                return entry.answer
+
+            best_key, best_similarity = None, self.similarity_threshold
+            query_vector = _unit(embedding)
+            for candidate_key in list(self._by_sources.get(source_key, [])):
+                candidate = self._entries[candidate_key]
+                if self._is_expired(candidate, now):
+                    self._remove(candidate_key)
+                    self._evictions += 1
+                    continue
+                similarity = float(np.dot(query_vector, candidate.embedding))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = candidate_key, similarity
+
+            if best_key is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self._semantic_hits += 1
+            return self._entries[best_key].answer
+
+    def store(
+        self,
+        query: str,
+        embedding: np.ndarray,
+        source_key: str,
+        collection_version: int,
+        answer: str
+    ) -> None:
+        """
+        Cache an answer generated for a query and its retrieved documents.
+
+        Args:
+            query (str): The user's question
+            embedding (np.ndarray): Embedding of the question
+            source_key (str): make_source_key() of the retrieved documents
+            collection_version (int): Collection version the answer was generated at
+            answer (str): The generated answer
+        """
+        key = (normalize_for_cache(query), source_key)
+        with self._lock:
+            # The collection changed while the answer was being generated
+            if self._version is not None and collection_version < self._version:
+                return
+            self._check_version(collection_version)
+
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CachedAnswer(
+                query=query,
+                embedding=_unit(embedding),
+                source_key=source_key,
+                answer=answer,
+                created_at=time.monotonic(),
+            )
+            self._by_sources.setdefault(source_key, []).append(key)
+
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_sources.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and the cache size.
+
+        Returns:
+            Dict[str, Any]: Cache counters and settings
+        """
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            lookups = hits + self._misses
+            return {
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "items": len(self._entries),
+                "max_items": self.max_items,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "similarity_threshold": self.similarity_threshold,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def is_answer_cache_enabled() -> bool:
+    return os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Return the shared answer cache configured from environment variables.
+
+    Returns:
+        SemanticAnswerCache: The answer cache
+    """
+    return SemanticAnswerCache(
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        max_items=int(os.getenv("ANSWER_CACHE_SIZE", "1000")),
+    )
+
+
+async def find_cached_answer(
+    query: str,
+    context_documents: List[str]
+) -> Tuple[Optional[str], Optional[Callable[[str], None]]]:
+    """
+    Look up a cached answer for the query and its retrieved documents.
+
+    Args:
+        query (str): The user's question
+        context_documents (List[str]): Retrieved document contents
+
+    Returns:
+        Tuple[Optional[str], Optional[Callable[[str], None]]]: The cached answer on
+            a hit. On a miss, a callback that caches the answer once it is generated.
+            (None, None) when ANSWER_CACHE_ENABLED is not "true".
+    """
+    if not is_answer_cache_enabled():
+        return None, None
+
+    cache = get_answer_cache()
+    source_key = make_source_key(context_documents)
+    collection_version = await get_collection_version()
+
+    # Retrieval just embedded the query, so this is an embedding cache hit
+    embedding = await embed_text(query)
+    answer = cache.lookup(query, embedding, source_key, collection_version)
+    if answer is not None:
+        return answer, None
+
+    def remember(generated_answer: str) -> None:
+        cache.store(query, embedding, source_key, collection_version, generated_answer)
+
+    return None, remember
+
+
+async def answer_with_cache(
+    query: str,
+    context_documents: List[str],
+    generate: Callable[[str, List[str]], Awaitable[str]]
+) -> Tuple[str, bool]:
+    """
+    Return a cached answer for the query and documents, or generate and cache one.
+
+    Args:
+        query (str): The user's question
+        context_documents (List[str]): Retrieved document contents
+        generate (Callable): Generates an answer from the query and documents
+
+    Returns:
+        Tuple[str, bool]: The answer and whether it came from the cache
+    """
+    answer, remember = await find_cached_answer(query, context_documents)
+    if answer is not None:
+        return answer, True
+
+    answer = await generate(query, context_documents)
+    if remember is not None:
+        remember(answer)
+    return answer, False
@@ -0,0 +1,176 @@
+"""
+Packing of retrieved chunks into a prompt context that fits the model's window.
+"""
+
+import os
+import asyncio
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from app.core.llm import build_prompt, count_prompt_tokens
+from app.database.vector_store import SearchHit
+
+# build_prompt() joins the context documents with this separator
+CONTEXT_SEPARATOR = "\n\n"
+
+# Shorter matches between chunk edges are treated as coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 20
+
+
+def get_context_token_budget(query: str, count_tokens: Optional[Callable[[str], int]] = None) -> int:
+    """
+    Return the number of tokens available for context documents in the prompt.
+
+    The context window (CONTEXT_WINDOW_SIZE) must hold the prompt template,
+    the question and the generated answer (MAX_NEW_TOKENS); the context gets
+    the rest, optionally capped by CONTEXT_TOKEN_BUDGET.
+
+    Args:
+        query (str): The user's question
+        count_tokens (Optional[Callable[[str], int]]): Tokenizer used to measure
+            text. Defaults to the generation model's tokenizer.
+
+    Returns:
+        int: Token budget for the context
+    """
+    count_tokens = count_tokens or count_prompt_tokens
+    context_window_size = int(os.getenv("CONTEXT_WINDOW_SIZE", "4096"))
+    max_new_tokens = int(os.getenv("MAX_NEW_TOKENS", "512"))
+
+    # +1 for the BOS token llama.cpp adds to the prompt
+    prompt_tokens = count_tokens(build_prompt(query, [])) + 1
+    budget = context_window_size - max_new_tokens - prompt_tokens
+
+    budget_cap = os.getenv("CONTEXT_TOKEN_BUDGET", "")
+    if budget_cap:
+        budget = min(budget, int(budget_cap))
+    return max(budget, 0)
+
+
+def _overlap_length(head: str, tail: str) -> int:
+    # Length of the longest suffix of head that is a prefix of tail
+    if len(head) < MIN_OVERLAP_CHARS or len(tail) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = tail[:MIN_OVERLAP_CHARS]
+    position = head.find(probe)
+    while position != -1:
+        if tail.startswith(head[position:]):
+            return len(head) - position
+        position = head.find(probe, position + 1)
+    return 0
+
+
+def remove_overlap(text: str, passages: Sequence[str]) -> str:
+    """
+    Strip the parts of a chunk that are already in the selected passages.
+
+    Neighbouring chunks of a document share the text of the chunk overlap,
+    so when both are retrieved the shared sentences would appear twice.
+
+    Args:
+        text (str): The chunk text
+        passages (Sequence[str]): Passages already in the context
+
+    Returns:
+        str: The remaining text, or "" if the chunk is fully contained
+    """
+    for passage in passages:
+        if text in passage:
+            return ""
+        overlap = _overlap_length(passage, text)
+        if overlap:
+            text = text[overlap:].strip()
+        overlap = _overlap_length(text, passage)
+        if overlap:
+            text = text[:-overlap].strip()
+        if not text:
+            return ""
+    return text
+
+
+def _truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    # Longest prefix (cut at whitespace) that fits, found by bisecting on characters
+    best = ""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        cut = text.rfind(" ", 0, middle)
+        candidate = text[:cut if cut > 0 else middle].rstrip()
+        if count_tokens(candidate) <= max_tokens:
+            best = candidate if len(candidate) > len(best) else best
+            low = middle
+        else:
+            high = middle - 1
+    return best
+
+
+def pack_context(
+    query: str,
+    hits: Sequence[SearchHit],
+    budget: Optional[int] = None,
+    count_tokens: Optional[Callable[[str], int]] = None
+) -> Tuple[List[str], List[SearchHit]]:
+    """
+    Select the context documents for a query within the prompt's token budget.
+
+    Hits are taken in descending score order. Text already covered by a
+    higher-scoring chunk is removed, and chunks that no longer fit are
+    skipped in favour of smaller lower-scoring ones. If not even the best
+    chunk fits, it is truncated so the prompt never overflows the window.
+
+    Args:
+        query (str): The user's question
+        hits (Sequence[SearchHit]): Retrieved chunks
+        budget (Optional[int]): Token budget for the context. Defaults to
+            get_context_token_budget().
+        count_tokens (Optional[Callable[[str], int]]): Tokenizer used to measure
+            text. Defaults to the generation model's tokenizer.
+
+    Returns:
+        Tuple[List[str], List[SearchHit]]: Context documents for build_prompt(),
+            best first, and the hits they were taken from, in the same order
+    """
+    count_tokens = count_tokens or count_prompt_tokens
+    if budget is None:
+        budget = get_context_token_budget(query, count_tokens)
+
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    passages: List[str] = []
+    kept: List[SearchHit] = []
+    used = 0
+
+    for hit in sorted(hits, key=lambda hit: hit.ranking_score, reverse=True):
+        text = remove_overlap(hit.content.strip(), passages)
+        if not text:
+            continue
+
+        # Token counts are not exactly additive across the join, so allow one extra per passage
+        cost = count_tokens(text) + 1 + (separator_tokens if passages else 0)
+        if used + cost > budget:
+            if passages:
+                continue
+            text = _truncate_to_tokens(text, budget - 1, count_tokens)
+            if not text:
+                break
+            cost = count_tokens(text) + 1
+
+        passages.append(text)
+        kept.append(hit)
+        used += cost
+
+    return passages, kept
+
+
+async def pack_context_async(query: str, hits: Sequence[SearchHit]) -> Tuple[List[str], List[SearchHit]]:
+    """
+    Run pack_context() on a worker thread.
+    Counting tokens tokenizes every candidate chunk, and the first call loads
+    the tokenizer, so it must not run on the event loop.
+
+    Args:
+        query (str): The user's question
+        hits (Sequence[SearchHit]): Retrieved chunks
+
+    Returns:
+        Tuple[List[str], List[SearchHit]]: Context documents and the hits they were taken from
+    """
+    return await asyncio.to_thread(pack_context, query, hits)
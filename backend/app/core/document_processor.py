@@ -1,8 +1,83 @@
 import os
 import re
-from typing import List, Dict, Any
+import asyncio
+import itertools
+from collections import ChainMap, deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Dict, Any, AsyncIterator, Deque, Iterable, Iterator, Optional, Tuple, Union
+
+from app.core.embeddings import get_embeddings_model_name
+from app.core.executors import get_preprocess_pool
+from app.utils.text_preprocessing import clean_text, extract_medical_entities
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_SENTENCE_END = re.compile(r'[.!?]\Z')
+_LAST_WHITESPACE = re.compile(r'\s(?=\S*\Z)')
+_WHITESPACE = re.compile(r'\s')
+
+
+@dataclass
+class TextChunk:
+    """A chunk of text with its character offsets in the source text"""
+    text: str
+    start: int
+    end: int
+    token_count: Optional[int] = None
+
+
+def _pack_sentences(
+    sizes: List[int],
+    chunk_size: int,
+    chunk_overlap: int,
+    separator_size: int,
+    strict: bool = False
+) -> List[Tuple[int, int]]:
+    """
+    Greedily pack consecutive sentences into overlapping chunks.
+    
+    Args:
+        sizes (List[int]): Size of each sentence
+        chunk_size (int): Maximum size of each chunk
+        chunk_overlap (int): Maximum size carried over from the previous chunk
+        separator_size (int): Size added after every sentence
+        strict (bool): Shrink the overlap when needed so that no chunk exceeds
+            chunk_size (sentences must then be no larger than chunk_size)
+    
+    Returns:
+        List[Tuple[int, int]]: Half-open sentence index ranges, one per chunk
+    """
+    ranges = []
+    first = 0
+    current_length = 0
+    
+    for i, size in enumerate(sizes):
+        # If adding this sentence exceeds the chunk size and we already have content
+        if current_length + size > chunk_size and i > first:
+            ranges.append((first, i))
+            
+            # Work backwards from the end of the chunk to find where the overlap starts
+            overlap_budget = chunk_overlap
+            if strict:
+                overlap_budget = min(chunk_overlap, chunk_size - size - separator_size)
+            overlap_start = i
+            overlap_length = 0
+            while overlap_start > first and overlap_length + sizes[overlap_start - 1] <= overlap_budget:
+                overlap_start -= 1
+                overlap_length += sizes[overlap_start] + separator_size
+            
+            first = overlap_start
+            current_length = overlap_length
+        
+        current_length += size + separator_size
+    
+    # Add the last chunk if it's not empty
+    if first < len(sizes):
+        ranges.append((first, len(sizes)))
+    
+    return ranges
 
-from app.utils.text_preprocessing import preprocess_medical_document
 
 def chunk_text(text: str, chunk_size: int = None, chunk_overlap: int = None) -> List[str]:
     """
@@ -27,49 +102,107 @@ def chunk_text(text: str, chunk_size: int = None, chunk_overlap: int = None) ->
         return [text]
     
     # Split text into sentences for better chunking
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    chunks = []
-    current_chunk = []
-    current_length = 0
+    sentences = _SENTENCE_BREAK.split(text)
+    ranges = _pack_sentences([len(sentence) for sentence in sentences], chunk_size, chunk_overlap, 1)
+    return [" ".join(sentences[first:last]) for first, last in ranges]
+
+
+@lru_cache(maxsize=1)
+def get_chunk_tokenizer():
+    """
+    Load the tokenizer of the embeddings model, used to size chunks in tokens.
+    Only the tokenizer is loaded, so worker processes stay light.
     
-    for sentence in sentences:
-        sentence_length = len(sentence)
-        
-        # If adding this sentence exceeds the chunk size and we already have content
-        if current_length + sentence_length > chunk_size and current_chunk:
-            # Join the current chunk into a string and add to chunks
-            chunks.append(" ".join(current_chunk))
-            
-            # Keep some sentences for overlap
-            overlap_sentences = []
-            overlap_length = 0
-            
-            # Work backwards through current_chunk to build overlap
-            for s in reversed(current_chunk):
-                if overlap_length + len(s) <= chunk_overlap:
-                    overlap_sentences.insert(0, s)
-                    overlap_length += len(s) + 1  # +1 for space
-                else:
-                    break
-            
-            # Reset current chunk with overlap sentences
-            current_chunk = overlap_sentences
-            current_length = overlap_length
-        
-        # Add the sentence to the current chunk
-        current_chunk.append(sentence)
-        current_length += sentence_length + 1  # +1 for space
+    Returns:
+        PreTrainedTokenizerFast: The embeddings model's tokenizer
+    """
+    from transformers import AutoTokenizer
     
-    # Add the last chunk if it's not empty
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+    return AutoTokenizer.from_pretrained(get_embeddings_model_name(), use_fast=True)
+
+
+def chunk_text_by_tokens(
+    text: str,
+    max_tokens: int = None,
+    overlap_tokens: int = None,
+    tokenizer=None
+) -> List[TextChunk]:
+    """
+    Split a text into overlapping chunks measured in tokenizer tokens.
+    
+    The text is tokenized once, tokens are assigned to sentences with a single
+    sweep over their offsets, and sentences are packed into chunks of at most
+    `max_tokens` tokens. Sentences longer than that are cut at token
+    boundaries. Chunks are slices of `text`, with their offsets recorded,
+    and the whole pass runs in linear time.
+    
+    Args:
+        text (str): The text to split
+        max_tokens (int): Maximum number of tokens per chunk, excluding special tokens
+        overlap_tokens (int): Maximum number of tokens repeated from the previous chunk
+        tokenizer: A fast Hugging Face tokenizer; defaults to the embeddings model's
+    
+    Returns:
+        List[TextChunk]: Chunks with their character offsets and token counts
+    """
+    if max_tokens is None:
+        max_tokens = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+    if overlap_tokens is None:
+        overlap_tokens = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+    if tokenizer is None:
+        tokenizer = get_chunk_tokenizer()
+    
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        verbose=False
+    )
+    offsets = encoding["offset_mapping"]
+    if not offsets:
+        return [TextChunk(text=text, start=0, end=len(text), token_count=0)]
+    
+    # Sentence spans in the original text
+    sentence_spans = []
+    position = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        sentence_spans.append((position, match.start()))
+        position = match.end()
+    sentence_spans.append((position, len(text)))
+    
+    # Assign tokens to sentences, cutting sentences that would not fit in one chunk
+    pieces: List[Tuple[int, int]] = []  # token index ranges
+    token = 0
+    for _, sentence_end in sentence_spans:
+        first_token = token
+        while token < len(offsets) and offsets[token][0] < sentence_end:
+            token += 1
+        for piece_start in range(first_token, token, max_tokens):
+            pieces.append((piece_start, min(piece_start + max_tokens, token)))
+    
+    sizes = [last - first for first, last in pieces]
+    chunks = []
+    for first, last in _pack_sentences(sizes, max_tokens, overlap_tokens, 0, strict=True):
+        first_token, last_token = pieces[first][0], pieces[last - 1][1]
+        start, end = offsets[first_token][0], offsets[last_token - 1][1]
+        chunks.append(TextChunk(
+            text=text[start:end],
+            start=start,
+            end=end,
+            token_count=last_token - first_token
+        ))
     
     return chunks
 
 
-async def process_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+def split_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    Process a document and split it into chunks.
+    Preprocess a document and split it into chunks.
+    This is pure CPU work, so it can run in a worker process. Like
+    iter_document_chunks, each chunk's extracted_entities are those found in
+    that chunk, so both ingestion paths index the same metadata.
     
     Args:
         document (Dict[str, Any]): Document with content and metadata
@@ -78,9 +211,25 @@ async def process_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
         List[Dict[str, Any]]: List of processed document chunks with metadata
     """
     # Apply text preprocessing
-    preprocessed_doc = preprocess_medical_document(document)
-    content = preprocessed_doc["content"]
-    metadata = preprocessed_doc["metadata"]
+    content = clean_text(document.get("content", ""))
+    metadata = document.get("metadata", {})
+    
+    # Chunks are sized in characters by default, or in embedding model tokens
+    if os.getenv("CHUNK_UNIT", "characters") == "tokens":
+        return [
+            {
+                "page_content": chunk.text,
+                "metadata": {
+                    **metadata,
+                    "chunk": i,
+                    "start_char": chunk.start,
+                    "end_char": chunk.end,
+                    "token_count": chunk.token_count,
+                    "extracted_entities": extract_medical_entities(chunk.text)
+                }
+            }
+            for i, chunk in enumerate(chunk_text_by_tokens(content))
+        ]
     
     # Get chunk size and overlap from environment
     chunk_size = int(os.getenv("CHUNK_SIZE", "500"))
@@ -95,6 +244,7 @@ async def process_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
         # Copy metadata and add chunk info
         chunk_metadata = metadata.copy()
         chunk_metadata["chunk"] = i
+        chunk_metadata["extracted_entities"] = extract_medical_entities(chunk)
         
         processed_docs.append({
             "page_content": chunk,
@@ -102,3 +252,345 @@ async def process_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
         })
     
     return processed_docs
+
+
+def split_documents(documents: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Split a batch of documents; the unit of work sent to a worker process.
+    
+    Args:
+        documents (List[Dict[str, Any]]): Documents with content and metadata
+    
+    Returns:
+        List[List[Dict[str, Any]]]: The chunks of each document, in input order
+    """
+    return [split_document(document) for document in documents]
+
+
+async def process_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Process a document and split it into chunks.
+    Runs in the shared preprocessing process pool when one is configured.
+    
+    Args:
+        document (Dict[str, Any]): Document with content and metadata
+    
+    Returns:
+        List[Dict[str, Any]]: List of processed document chunks with metadata
+    """
+    pool = get_preprocess_pool()
+    if pool is None:
+        return split_document(document)
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, split_document, document)
+
+
+async def process_documents_in_pool(
+    documents: Iterable[Dict[str, Any]],
+    pool: Executor,
+    batch_size: int = 16,
+    max_in_flight: int = 8
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Process many documents on a process pool, yielding results in input order.
+    
+    Documents are submitted in batches of `batch_size` to amortize the cost of
+    sending work to another process, and at most `max_in_flight` batches are
+    outstanding at a time so a lazy input is never read far ahead.
+    
+    Args:
+        documents (Iterable[Dict[str, Any]]): Documents with content and metadata
+        pool (Executor): Executor to run on, usually a ProcessPoolExecutor
+        batch_size (int): Number of documents per submitted task
+        max_in_flight (int): Maximum number of submitted, unfinished tasks
+    
+    Yields:
+        List[Dict[str, Any]]: The chunks of each document, in input order
+    """
+    loop = asyncio.get_running_loop()
+    in_flight: Deque[asyncio.Future] = deque()
+    
+    def submit(batch: List[Dict[str, Any]]) -> None:
+        in_flight.append(loop.run_in_executor(pool, split_documents, batch))
+    
+    try:
+        batch: List[Dict[str, Any]] = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+                
+                # Wait for the oldest batch so results come out in order
+                while len(in_flight) >= max_in_flight:
+                    for chunks in await in_flight.popleft():
+                        yield chunks
+        
+        if batch:
+            submit(batch)
+        
+        while in_flight:
+            for chunks in await in_flight.popleft():
+                yield chunks
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def _iter_text_windows(content: Union[str, Iterable[str]], window_size: int) -> Iterator[str]:
+    """
+    Cut raw text into windows of roughly `window_size` characters.
+    Windows end right after a whitespace character, so cleaning each window on
+    its own gives the same result as cleaning the whole text.
+    
+    Args:
+        content (Union[str, Iterable[str]]): The text, or an iterable of text pieces
+        window_size (int): Approximate number of characters per window
+    
+    Yields:
+        str: Consecutive windows of the raw text
+    """
+    pieces = [content] if isinstance(content, str) else content
+    buffer = ""
+    
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        while len(buffer) - start >= window_size:
+            # Prefer the last whitespace before the window end, else the first one after it
+            match = _LAST_WHITESPACE.search(buffer, start + window_size // 2, start + window_size)
+            if match is None:
+                match = _WHITESPACE.search(buffer, start + window_size)
+            if match is None:
+                # No whitespace to cut at yet, keep reading
+                break
+            yield buffer[start:match.start() + 1]
+            start = match.start() + 1
+        buffer = buffer[start:]
+    
+    if buffer:
+        yield buffer
+
+
+def _iter_clean_sentences(content: Union[str, Iterable[str]], window_size: int) -> Iterator[str]:
+    """
+    Clean text window by window and yield its sentences.
+    Joining the sentences with single spaces gives clean_text() of the whole text,
+    except for the spacing left by URLs removed at the edge of a window.
+    
+    Args:
+        content (Union[str, Iterable[str]]): The text, or an iterable of text pieces
+        window_size (int): Approximate number of characters cleaned at a time
+    
+    Yields:
+        str: Sentences of the cleaned text, in order
+    """
+    carry = None
+    for window in _iter_text_windows(content, window_size):
+        sentences = _SENTENCE_BREAK.split(clean_text(window))
+        if not sentences[0]:
+            continue
+        
+        # The last sentence of the previous window may continue in this one
+        if carry is not None:
+            if _SENTENCE_END.search(carry):
+                yield carry
+            else:
+                sentences[0] = f"{carry} {sentences[0]}"
+        
+        carry = sentences.pop()
+        yield from sentences
+    
+    if carry is not None:
+        yield carry
+
+
+def _iter_packed_sentences(sentences: Iterable[str], chunk_size: int, chunk_overlap: int) -> Iterator[str]:
+    """
+    Streaming counterpart of chunk_text: pack sentences into overlapping
+    chunks as they arrive. Only the sentences of the current chunk are held.
+    
+    Args:
+        sentences (Iterable[str]): Sentences of a cleaned text
+        chunk_size (int): Maximum size of each chunk
+        chunk_overlap (int): Amount of overlap between chunks
+    
+    Yields:
+        str: Text chunks, identical to chunk_text() on the joined sentences
+    """
+    current: Deque[str] = deque()
+    current_length = 0
+    
+    for sentence in sentences:
+        if current_length + len(sentence) > chunk_size and current:
+            yield " ".join(current)
+            
+            # Keep the trailing sentences that fit in the overlap
+            overlap_count = 0
+            overlap_length = 0
+            for previous in reversed(current):
+                if overlap_length + len(previous) > chunk_overlap:
+                    break
+                overlap_count += 1
+                overlap_length += len(previous) + 1
+            
+            while len(current) > overlap_count:
+                current.popleft()
+            current_length = overlap_length
+        
+        current.append(sentence)
+        current_length += len(sentence) + 1
+    
+    if current:
+        yield " ".join(current)
+
+
+def _iter_token_chunks(sentences: Iterable[str], block_size: int) -> Iterator[TextChunk]:
+    """
+    Token-based chunking over a stream of sentences. Sentences are grouped
+    into blocks of about `block_size` characters, each block is chunked with
+    chunk_text_by_tokens, and offsets are shifted to the whole cleaned text.
+    Chunks do not overlap across block boundaries.
+    
+    Args:
+        sentences (Iterable[str]): Sentences of a cleaned text
+        block_size (int): Approximate number of characters tokenized at a time
+    
+    Yields:
+        TextChunk: Chunks with offsets into the cleaned text
+    """
+    block: List[str] = []
+    block_length = 0
+    block_start = 0
+    
+    def flush() -> Iterator[TextChunk]:
+        for chunk in chunk_text_by_tokens(" ".join(block)):
+            chunk.start += block_start
+            chunk.end += block_start
+            yield chunk
+    
+    for sentence in sentences:
+        block.append(sentence)
+        block_length += len(sentence) + 1
+        if block_length >= block_size:
+            yield from flush()
+            block_start += block_length
+            block = []
+            block_length = 0
+    
+    if block:
+        yield from flush()
+
+
+def _iter_section_chunks(content: Union[str, Iterable[str]], window_size: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Chunk one section of a document (the whole text, or one PDF page).
+    
+    Args:
+        content (Union[str, Iterable[str]]): The text, or an iterable of text pieces
+        window_size (int): Approximate number of characters cleaned at a time
+    
+    Yields:
+        Tuple[str, Dict[str, Any]]: Chunk text and its chunk-specific metadata
+    """
+    sentences = _iter_clean_sentences(content, window_size)
+    
+    if os.getenv("CHUNK_UNIT", "characters") == "tokens":
+        for chunk in _iter_token_chunks(sentences, window_size):
+            yield chunk.text, {"start_char": chunk.start, "end_char": chunk.end, "token_count": chunk.token_count}
+        return
+    
+    chunk_size = int(os.getenv("CHUNK_SIZE", "500"))
+    chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "50"))
+    for chunk in _iter_packed_sentences(sentences, chunk_size, chunk_overlap):
+        yield chunk, {}
+
+
+def iter_document_chunks(
+    document: Dict[str, Any],
+    window_size: int = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily preprocess a document and yield its chunks one at a time.
+    
+    Unlike split_document, the cleaned text and the chunk list are never held
+    in memory as a whole. The content may be a string or an iterable of text
+    pieces (e.g. read from a file). A document with "pages", an iterable of
+    (page number, text) pairs such as parse_pdf_stream returns, is chunked
+    page by page instead, and each chunk records its page number. Chunk
+    metadata is a ChainMap over the shared base metadata, which is never
+    copied. As with split_document, extracted_entities are those found in
+    each chunk.
+    
+    Args:
+        document (Dict[str, Any]): Document with content (or pages) and metadata
+        window_size (int): Approximate number of characters cleaned at a time
+    
+    Yields:
+        Dict[str, Any]: Processed document chunks with metadata
+    """
+    if window_size is None:
+        window_size = int(os.getenv("STREAM_WINDOW_CHARS", "65536"))
+    
+    base_metadata = document.get("metadata", {})
+    pages = document.get("pages")
+    sections = pages if pages is not None else [(None, document.get("content", ""))]
+    
+    index = 0
+    try:
+        for page_number, content in sections:
+            for text, chunk_metadata in _iter_section_chunks(content, window_size):
+                chunk_metadata["chunk"] = index
+                if page_number is not None:
+                    chunk_metadata["page"] = page_number
+                chunk_metadata["extracted_entities"] = extract_medical_entities(text)
+                
+                yield {
+                    "page_content": text,
+                    "metadata": ChainMap(chunk_metadata, base_metadata)
+                }
+                index += 1
+    finally:
+        # Lets a page extractor stop its workers and remove temporary files
+        if hasattr(pages, "close"):
+            pages.close()
+
+
+async def stream_document_chunks(
+    document: Dict[str, Any],
+    batch_size: int = 64
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield a document's chunks in batches without blocking the event loop.
+    Each batch is produced in a worker thread only when the consumer asks for it.
+    If the consumer is cancelled mid-batch, the batch is awaited before the
+    chunk generator is closed, and the cancellation propagates.
+    
+    Args:
+        document (Dict[str, Any]): Document with content and metadata
+        batch_size (int): Number of chunks per batch
+    
+    Yields:
+        List[Dict[str, Any]]: Consecutive batches of chunks
+    """
+    chunks = iter_document_chunks(document)
+    
+    def next_batch() -> List[Dict[str, Any]]:
+        return list(itertools.islice(chunks, batch_size))
+    
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            # Shielded, so a cancelled consumer does not leave the thread running unobserved
+            pending = asyncio.ensure_future(asyncio.to_thread(next_batch))
+            batch = await asyncio.shield(pending)
+            if not batch:
+                return
+            yield batch
+    finally:
+        if pending is not None and not pending.done():
+            # The generator cannot be closed while a worker thread is running it
+            await asyncio.wait([pending])
+            pending.exception()
+        chunks.close()
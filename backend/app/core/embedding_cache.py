@@ -0,0 +1,190 @@
+"""
+Content-addressed embedding cache with an in-memory LRU tier and an optional
+SQLite tier on disk.
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_BATCH_SIZE = 500
+
+
+def normalize_for_cache(text: str) -> str:
+    """
+    Normalize text so that trivially different copies share a cache entry.
+    Only runs of whitespace are collapsed, since the tokenizer splits on
+    whitespace anyway; Unicode forms are left alone because folding them
+    (e.g. NFKC) can change the tokens the model sees.
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: Normalized text
+    """
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def make_cache_key(model_name: str, text: str) -> str:
+    """
+    Build the cache key for a text embedded with a given model.
+
+    Args:
+        model_name (str): Name of the embeddings model
+        text (str): Text being embedded
+
+    Returns:
+        str: Hex digest identifying (model, normalized text)
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_for_cache(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    Lookups check the in-memory LRU first and then the SQLite file, promoting
+    disk hits into memory. Writes go to both tiers. Vectors are stored as
+    float32. All methods are thread-safe, since they are called from the
+    embedding pool's worker threads.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_items: int = 10000):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up several keys at once.
+
+        Args:
+            keys (List[str]): Cache keys
+
+        Returns:
+            List[Optional[np.ndarray]]: Cached vector per key, or None on a miss
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            on_disk: Dict[str, List[int]] = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    results[i] = vector
+                else:
+                    on_disk.setdefault(key, []).append(i)
+
+            if on_disk and self._conn is not None:
+                missing = list(on_disk)
+                for start in range(0, len(missing), _SQLITE_BATCH_SIZE):
+                    batch = missing[start:start + _SQLITE_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        for i in on_disk.pop(key):
+                            results[i] = vector
+                            self._disk_hits += 1
+
+            self._misses += sum(len(positions) for positions in on_disk.values())
+
+        return results
+
+    def put_many(self, keys: List[str], vectors: List[np.ndarray]) -> None:
+        """
+        Store vectors under their keys in both tiers.
+
+        Args:
+            keys (List[str]): Cache keys
+            vectors (List[np.ndarray]): Vectors to store, aligned with keys
+        """
+        as_float32 = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock:
+            for key, vector in zip(keys, as_float32):
+                self._remember(key, vector)
+
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in zip(keys, as_float32)]
+                )
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and tier sizes.
+
+        Returns:
+            Dict[str, Any]: Cache counters
+        """
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            disk_items = None
+            if self._conn is not None:
+                disk_items = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "max_memory_items": self.max_memory_items,
+                "disk_items": disk_items,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the shared embedding cache configured from environment variables.
+    The disk tier is only enabled when EMBEDDING_CACHE_PATH is set.
+
+    Returns:
+        EmbeddingCache: The embedding cache
+    """
+    return EmbeddingCache(
+        path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+        max_memory_items=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+    )
@@ -3,6 +3,20 @@ from functools import lru_cache
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
+from app.core.batching import MicroBatcher
+from app.core.embedding_cache import get_embedding_cache, make_cache_key
+from app.core.executors import get_embedding_executor
+from app.core.model_client import get_model_client, use_model_server
+
+def get_embeddings_model_name() -> str:
+    """
+    Return the configured embeddings model name.
+    
+    Returns:
+        str: The model name from the EMBEDDINGS_MODEL environment variable
+    """
+    return os.getenv("EMBEDDINGS_MODEL", "pritamdeka/PubMedBERT-mnli-sts")
+
 @lru_cache(maxsize=1)
 def get_embeddings_model():
     """
@@ -12,12 +26,93 @@ def get_embeddings_model():
     Returns:
         SentenceTransformer: The loaded embeddings model
     """
-    model_name = os.getenv("EMBEDDINGS_MODEL", "pritamdeka/PubMedBERT-mnli-sts")
-    return SentenceTransformer(model_name)
+    return SentenceTransformer(get_embeddings_model_name())
+
+def _encode_cached(texts: list[str]) -> list[np.ndarray]:
+    """
+    Embed texts, reusing cached vectors and encoding only the misses.
+    This blocks, so it must run on the embedding pool.
+    
+    Args:
+        texts (list[str]): Texts to embed
+        
+    Returns:
+        list[np.ndarray]: One embedding vector per text, in order
+    """
+    cache = get_embedding_cache()
+    model_name = get_embeddings_model_name()
+    keys = [make_cache_key(model_name, text) for text in texts]
+    vectors = cache.get_many(keys)
+    
+    # Encode each distinct missing text once
+    missing: dict[str, list[int]] = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(keys[i], []).append(i)
+    
+    if missing:
+        model = get_embeddings_model()
+        first_positions = [positions[0] for positions in missing.values()]
+        
+        # A lone text is encoded as-is, without wrapping it in a batch
+        if len(first_positions) == 1:
+            encoded = [model.encode(texts[first_positions[0]])]
+        else:
+            encoded = list(model.encode([texts[i] for i in first_positions]))
+        
+        cache.put_many(list(missing), encoded)
+        for positions, vector in zip(missing.values(), encoded):
+            for i in positions:
+                vectors[i] = vector
+    
+    return vectors
+
+async def encode_texts(texts: list[str]) -> list[np.ndarray]:
+    """
+    Embed texts with this process's model, on the embedding pool.
+    
+    Args:
+        texts (list[str]): Texts to embed
+        
+    Returns:
+        list[np.ndarray]: One embedding vector per text, in order
+    """
+    return await get_embedding_executor().run(_encode_cached, list(texts))
+
+async def _encode_batch(texts: list[str]) -> list[np.ndarray]:
+    """
+    Encode a batch collected by the embedding batcher in a single model call.
+    The call goes to the model server when MODEL_SERVER_SOCKET is set.
+    
+    Args:
+        texts (list[str]): Texts to embed
+        
+    Returns:
+        list[np.ndarray]: One embedding vector per text, in order
+    """
+    if use_model_server():
+        return await get_model_client().embed(texts)
+    return await encode_texts(texts)
+
+@lru_cache(maxsize=1)
+def get_embedding_batcher() -> MicroBatcher:
+    """
+    Return the shared batcher that coalesces concurrent embed_text calls.
+    
+    Returns:
+        MicroBatcher: The embedding batcher
+    """
+    return MicroBatcher(
+        _encode_batch,
+        max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")),
+        max_wait_ms=float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5")),
+    )
 
 async def embed_text(text: str) -> np.ndarray:
     """
-    Generate embeddings for the given text using the loaded model
+    Generate embeddings for the given text using the loaded model.
+    Concurrent calls are batched into a single encode call, and texts
+    already in the embedding cache are not recomputed.
     
     Args:
         text (str): Text to embed
@@ -25,12 +120,12 @@ async def embed_text(text: str) -> np.ndarray:
     Returns:
         np.ndarray: The embedding vector
     """
-    model = get_embeddings_model()
-    return model.encode(text)
+    return await get_embedding_batcher().submit(text)
 
 async def embed_documents(documents: list[str]) -> list[np.ndarray]:
     """
-    Generate embeddings for multiple documents
+    Generate embeddings for multiple documents.
+    Vectors already in the embedding cache are not recomputed.
     
     Args:
         documents (list[str]): List of documents to embed
@@ -38,5 +133,4 @@ async def embed_documents(documents: list[str]) -> list[np.ndarray]:
     Returns:
         list[np.ndarray]: List of embedding vectors
     """
-    model = get_embeddings_model()
-    return model.encode(documents)
+    return await _encode_batch(list(documents))
@@ -0,0 +1,307 @@
+"""
+Bounded thread pools for running blocking model calls off the event loop.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import threading
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when a pool already has its maximum number of pending tasks"""
+
+
+class ExecutorTimeoutError(TimeoutError):
+    """Raised when a request's timeout expires before its work finishes"""
+
+
+class BoundedExecutor:
+    """
+    A thread pool that refuses new work once too many tasks are pending.
+
+    Pending tasks are the ones running on a worker plus the ones waiting for
+    a free worker. Once that number reaches ``max_workers + max_queue``,
+    new work is rejected with ``ExecutorSaturatedError`` instead of queueing.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """
+        Schedule a blocking callable on the pool without waiting for it.
+        The saturation check happens here, synchronously, so callers can
+        reject a request before they start responding to it.
+
+        Args:
+            func (Callable): The blocking function to call
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            asyncio.Future: Future resolving to the function's return value
+
+        Raises:
+            ExecutorSaturatedError: If the pool has no room for another task
+        """
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise ExecutorSaturatedError(f"The {self.name} pool is saturated, try again later")
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(partial(func, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        # Release the slot when the work itself finishes, not when the caller
+        # stops waiting, so a cancelled request still counts until its thread is free
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the pool and await its result.
+
+        Args:
+            func (Callable): The blocking function to call
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            Any: The function's return value
+
+        Raises:
+            ExecutorSaturatedError: If the pool has no room for another task
+        """
+        return await self.submit(func, *args, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return a snapshot of the pool's counters.
+
+        Returns:
+            Dict[str, int]: Worker count, queue limit, pending, completed and rejected tasks
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class ModelPool(BoundedExecutor):
+    """
+    A bounded pool whose worker threads each own a model instance.
+
+    llama.cpp models cannot be used from several threads at once, so every
+    worker gets its own instance, created by ``factory`` on first use.
+    Requests are served in submission (FIFO) order. With a ``timeout``,
+    every request gets a deadline covering its queue wait and its run: one
+    still queued at the deadline fails without running, and the work is
+    passed the deadline so it can stop early. Queue wait and run time are
+    recorded separately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        max_workers: int,
+        max_queue: int,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(name, max_workers=max_workers, max_queue=max_queue)
+        self.factory = factory
+        self.timeout = timeout
+        self._instances: List[Any] = [None] * max_workers
+        self._instance_locks = [threading.Lock() for _ in range(max_workers)]
+        self._free: "queue.SimpleQueue[int]" = queue.SimpleQueue()
+        for index in range(max_workers):
+            self._free.put(index)
+        self._timeouts = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+        self._runs = 0
+
+    def get_instance(self, index: int = 0) -> Any:
+        """
+        Return a worker's model instance, creating it if needed.
+
+        Args:
+            index (int): Index of the worker
+
+        Returns:
+            Any: The model instance
+        """
+        with self._instance_locks[index]:
+            if self._instances[index] is None:
+                self._instances[index] = self.factory()
+            return self._instances[index]
+
+    def _run_on_instance(self, func: Callable[..., Any], submitted: float, deadline: Optional[float], *args, **kwargs) -> Any:
+        started = time.monotonic()
+        with self._lock:
+            self._queue_wait_total += started - submitted
+            self._queue_wait_max = max(self._queue_wait_max, started - submitted)
+            if deadline is not None and started >= deadline:
+                self._timeouts += 1
+                raise ExecutorTimeoutError(f"The request timed out after {self.timeout} seconds in the {self.name} queue")
+
+        # There are as many instances as workers, so one is always free here
+        index = self._free.get()
+        try:
+            return func(self.get_instance(index), deadline, *args, **kwargs)
+        except ExecutorTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise
+        finally:
+            self._free.put(index)
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._runs += 1
+                self._run_total += elapsed
+                self._run_max = max(self._run_max, elapsed)
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """
+        Schedule work on the next free model instance without waiting for it.
+
+        Args:
+            func (Callable): Called as ``func(model, deadline, *args, **kwargs)``, where
+                ``deadline`` is a time.monotonic() value or None without a timeout
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            asyncio.Future: Future resolving to the function's return value
+
+        Raises:
+            ExecutorSaturatedError: If the pool has no room for another task
+        """
+        submitted = time.monotonic()
+        deadline = submitted + self.timeout if self.timeout else None
+        return super().submit(self._run_on_instance, func, submitted, deadline, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return a snapshot of the pool's counters and timings.
+
+        Returns:
+            Dict[str, Any]: BoundedExecutor counters plus loaded instances,
+                timeouts, and queue wait and run times in milliseconds
+        """
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                "instances_loaded": sum(instance is not None for instance in self._instances),
+                "timeout_seconds": self.timeout,
+                "timeouts": self._timeouts,
+                "avg_queue_wait_ms": self._queue_wait_total / self._runs * 1000 if self._runs else 0.0,
+                "max_queue_wait_ms": self._queue_wait_max * 1000,
+                "avg_run_ms": self._run_total / self._runs * 1000 if self._runs else 0.0,
+                "max_run_ms": self._run_max * 1000,
+            })
+        return stats
+
+
+def _load_generation_model() -> Any:
+    # Imported here because app.core.llm uses this module
+    from app.core.llm import load_llm_model
+    return load_llm_model()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_executor() -> BoundedExecutor:
+    """
+    Return the shared pool used for embedding and retrieval calls.
+
+    Returns:
+        BoundedExecutor: The embedding pool
+    """
+    return BoundedExecutor(
+        "embedding",
+        max_workers=int(os.getenv("EMBEDDING_WORKERS", "2")),
+        max_queue=int(os.getenv("EMBEDDING_QUEUE_SIZE", "32")),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_generation_executor() -> ModelPool:
+    """
+    Return the shared pool of LLM instances used for generation.
+    GENERATION_WORKERS sets the number of model instances, each loaded in
+    full, and GENERATION_TIMEOUT_SECONDS (0 disables) the per-request timeout.
+
+    Returns:
+        ModelPool: The generation pool
+    """
+    timeout = float(os.getenv("GENERATION_TIMEOUT_SECONDS", "120"))
+    return ModelPool(
+        "generation",
+        factory=_load_generation_model,
+        max_workers=int(os.getenv("GENERATION_WORKERS", "1")),
+        max_queue=int(os.getenv("GENERATION_QUEUE_SIZE", "4")),
+        timeout=timeout if timeout > 0 else None,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_preprocess_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Return the shared process pool for CPU-bound preprocessing and chunking.
+    Disabled (None) unless PREPROCESS_WORKERS is set to a positive number.
+
+    Returns:
+        Optional[ProcessPoolExecutor]: The preprocessing pool, if enabled
+    """
+    workers = int(os.getenv("PREPROCESS_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return counters for every model pool.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Stats keyed by pool name
+    """
+    return {
+        "embedding": get_embedding_executor().stats(),
+        "generation": get_generation_executor().stats(),
+    }
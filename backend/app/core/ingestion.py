@@ -0,0 +1,247 @@
+"""
+Pipelined bulk ingestion for large corpora.
+
+Documents flow through three overlapped stages connected by bounded queues:
+preprocessing/chunking, batched embedding and batched vector store upserts.
+Completed documents are recorded in an optional checkpoint file so an
+interrupted run can be resumed without redoing finished work.
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.core.document_processor import process_document, process_documents_in_pool
+from app.core.embeddings import embed_documents
+from app.database.vector_store import (
+    get_vector_backend,
+    key_chunks_by_point_id,
+    find_missing_point_ids,
+    upsert_chunk_vectors,
+    save_search_indexes,
+)
+
+# Marks the end of a stage's output
+_DONE = None
+
+
+@dataclass
+class IngestionStats:
+    """Progress counters for an ingestion run"""
+    documents_processed: int = 0
+    documents_skipped: int = 0
+    chunks_processed: int = 0
+    chunks_written: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def documents_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.documents_processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.chunks_processed / elapsed if elapsed > 0 else 0.0
+
+
+class IngestionCheckpoint:
+    """
+    Append-only record of fully ingested document keys.
+    Each line of the file is one document key.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.completed: Set[str] = set()
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.completed = {line.rstrip("\n") for line in f if line.endswith("\n")}
+
+    def is_done(self, key: str) -> bool:
+        return key in self.completed
+
+    def mark_done(self, keys: List[str]) -> None:
+        """
+        Record documents as fully ingested.
+
+        Args:
+            keys (List[str]): Keys of the completed documents
+        """
+        new_keys = [key for key in keys if key not in self.completed]
+        if not new_keys:
+            return
+
+        self.completed.update(new_keys)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(f"{key}\n" for key in new_keys)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+# A chunk on its way through the pipeline: (document key, chunk dict or None, is last chunk of its document)
+_PipelineItem = Tuple[str, Optional[Dict[str, Any]], bool]
+
+
+async def run_ingestion_pipeline(
+    documents: Iterable[Tuple[str, Dict[str, Any]]],
+    embed_batch_size: int = 64,
+    upsert_batch_size: int = 256,
+    queue_size: int = 4,
+    workers: int = 0,
+    preprocess_batch_size: int = 16,
+    checkpoint_path: Optional[str] = None,
+    progress_callback: Optional[Callable[[IngestionStats], None]] = None,
+) -> IngestionStats:
+    """
+    Ingest documents through the preprocess -> embed -> upsert pipeline.
+
+    Args:
+        documents (Iterable[Tuple[str, Dict[str, Any]]]): (key, document) pairs. Keys
+            must be unique and stable across runs; they are what the checkpoint records.
+        embed_batch_size (int): Number of chunks per embedding call
+        upsert_batch_size (int): Number of chunks per vector store upsert
+        queue_size (int): Maximum number of batches waiting between two stages
+        workers (int): Number of processes for preprocessing and chunking; 0 runs
+            them in this process
+        preprocess_batch_size (int): Number of documents per task sent to a worker process
+        checkpoint_path (Optional[str]): File recording completed documents; documents
+            listed there are skipped
+        progress_callback (Optional[Callable]): Called with the stats after every upsert
+
+    Returns:
+        IngestionStats: Final counters for the run
+    """
+    stats = IngestionStats()
+    checkpoint = IngestionCheckpoint(checkpoint_path)
+    vector_store = get_vector_backend()
+
+    embed_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+    def pending_documents() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for key, document in documents:
+            if checkpoint.is_done(key):
+                stats.documents_skipped += 1
+                continue
+            yield key, document
+
+    async def chunked_documents() -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        if pool is None:
+            for key, document in pending_documents():
+                yield key, await process_document(document)
+            return
+
+        # The pool returns results in submission order, so keys line up
+        keys: Deque[str] = deque()
+
+        def submitted_documents() -> Iterator[Dict[str, Any]]:
+            for key, document in pending_documents():
+                keys.append(key)
+                yield document
+
+        async for chunks in process_documents_in_pool(
+            submitted_documents(),
+            pool,
+            batch_size=preprocess_batch_size,
+            max_in_flight=workers * 2
+        ):
+            yield keys.popleft(), chunks
+
+    async def preprocess_stage() -> None:
+        batch: List[_PipelineItem] = []
+        async for key, chunks in chunked_documents():
+            if not chunks:
+                batch.append((key, None, True))
+            for i, chunk in enumerate(chunks):
+                batch.append((key, chunk, i == len(chunks) - 1))
+                if len(batch) >= embed_batch_size:
+                    await embed_queue.put(batch)
+                    batch = []
+
+        if batch:
+            await embed_queue.put(batch)
+        await embed_queue.put(_DONE)
+
+    async def embed_stage() -> None:
+        while True:
+            batch = await embed_queue.get()
+            if batch is _DONE:
+                await upsert_queue.put(_DONE)
+                return
+
+            chunks = key_chunks_by_point_id([chunk for _, chunk, _ in batch if chunk is not None])
+            new_ids = await find_missing_point_ids(vector_store, list(chunks))
+            vectors = await embed_documents([chunks[point_id][0] for point_id in new_ids]) if new_ids else []
+            await upsert_queue.put((batch, chunks, new_ids, vectors))
+
+    async def upsert_stage() -> None:
+        pending_chunks: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        pending_ids: List[str] = []
+        pending_vectors: List[Any] = []
+        pending_items: List[_PipelineItem] = []
+
+        async def flush() -> None:
+            await upsert_chunk_vectors(vector_store, pending_chunks, pending_ids, pending_vectors)
+
+            # Documents are only checkpointed once their last chunk is stored
+            completed = [key for key, _, is_last in pending_items if is_last]
+            checkpoint.mark_done(completed)
+
+            stats.documents_processed += len(completed)
+            stats.chunks_processed += sum(1 for _, chunk, _ in pending_items if chunk is not None)
+            stats.chunks_written += len(pending_ids)
+            if progress_callback is not None:
+                progress_callback(stats)
+
+            pending_chunks.clear()
+            pending_ids.clear()
+            pending_vectors.clear()
+            pending_items.clear()
+
+        while True:
+            item = await upsert_queue.get()
+            if item is _DONE:
+                if pending_items:
+                    await flush()
+                return
+
+            batch, chunks, new_ids, vectors = item
+            pending_chunks.update(chunks)
+            pending_ids.extend(new_ids)
+            pending_vectors.extend(vectors)
+            pending_items.extend(batch)
+            if len(pending_items) >= upsert_batch_size:
+                await flush()
+
+    tasks = [
+        asyncio.ensure_future(preprocess_stage()),
+        asyncio.ensure_future(embed_stage()),
+        asyncio.ensure_future(upsert_stage()),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+        await save_search_indexes()
+    except BaseException:
+        # A failed stage would leave its neighbours blocked on the queues
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return stats
@@ -0,0 +1,498 @@
+"""
+Background ingestion jobs backed by a SQLite queue.
+
+Submitting a document records a job and returns straight away; a fixed
+number of worker tasks pick queued jobs up and index them through the
+streaming chunking path. Uploaded files are copied into a spool directory
+next to the database, so queued jobs survive a restart.
+
+Every API worker process runs its own queue on the shared database. A job
+is claimed with a compare-and-set on its state, so only one process runs
+it, and the claiming process keeps a heartbeat on the job while it runs.
+Jobs whose heartbeat expired (their process died) are queued again by any
+live process, which is safe because chunk point IDs are deterministic.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import shutil
+import sqlite3
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from app.core.document_processor import stream_document_chunks
+from app.core.executors import ExecutorSaturatedError, get_preprocess_pool
+from app.database.vector_store import index_chunk_stream
+from app.utils.file_parsers import parse_file_stream
+
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Seconds a worker waits before re-checking the queue or retrying a saturated job
+_POLL_INTERVAL = 1.0
+
+_COLUMNS = (
+    "id, kind, state, payload, chunks_processed, chunks_indexed, "
+    "error, created_at, started_at, finished_at"
+)
+
+# Columns added after the first release, created on open if missing
+_LEASE_COLUMNS = {"owner": "TEXT", "heartbeat_at": "REAL"}
+
+
+def make_owner_id() -> str:
+    """
+    Build an ID for this process's job queue.
+
+    Returns:
+        str: Host name, process ID and a random suffix
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@dataclass
+class IngestionJob:
+    """A queued or processed ingestion request"""
+    id: str
+    kind: str  # "text" or "upload"
+    state: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    chunks_processed: int = 0
+    chunks_indexed: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def chunks_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.chunks_processed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the job's public status; the payload itself is not included.
+
+        Returns:
+            Dict[str, Any]: State, progress counters, throughput and timestamps
+        """
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "source": self.payload.get("source"),
+            "chunks_processed": self.chunks_processed,
+            "chunks_indexed": self.chunks_indexed,
+            "chunks_per_second": self.chunks_per_second,
+            "elapsed_seconds": self.elapsed,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """
+    SQLite table of ingestion jobs, shared by the processes of one deployment.
+
+    Running jobs are leased to the store's `owner`: claim_next() takes a job
+    only if it is still queued, and progress and state updates are ignored
+    once another owner has taken the job over. All methods are thread-safe.
+    """
+
+    def __init__(self, path: str, owner: Optional[str] = None):
+        self.path = path
+        self.owner = owner or make_owner_id()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, state TEXT NOT NULL, payload TEXT NOT NULL, "
+            "chunks_processed INTEGER NOT NULL DEFAULT 0, chunks_indexed INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _LEASE_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _to_job(row) -> IngestionJob:
+        return IngestionJob(
+            id=row[0],
+            kind=row[1],
+            state=row[2],
+            payload=json.loads(row[3]),
+            chunks_processed=row[4],
+            chunks_indexed=row[5],
+            error=row[6],
+            created_at=row[7],
+            started_at=row[8],
+            finished_at=row[9],
+        )
+
+    def add(self, job: IngestionJob) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.state, json.dumps(job.payload), job.chunks_processed,
+                 job.chunks_indexed, job.error, job.created_at, job.started_at, job.finished_at)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def claim_next(self) -> Optional[IngestionJob]:
+        """
+        Mark the oldest queued job as running and return it.
+
+        The update only applies while the job is still queued, so when
+        processes race for a job exactly one of them gets it; the others
+        move on to the next one.
+
+        Returns:
+            Optional[IngestionJob]: The claimed job, or None if the queue is empty
+        """
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                started_at = time.time()
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET state = ?, owner = ?, started_at = ?, heartbeat_at = ?, "
+                    "chunks_processed = 0, chunks_indexed = 0 WHERE id = ? AND state = ?",
+                    (JOB_RUNNING, self.owner, started_at, started_at, row[0], JOB_QUEUED)
+                )
+                self._conn.commit()
+                if cursor.rowcount == 1:
+                    break
+
+        job = self._to_job(row)
+        job.state = JOB_RUNNING
+        job.started_at = started_at
+        job.chunks_processed = job.chunks_indexed = 0
+        return job
+
+    def update_progress(self, job_id: str, chunks_processed: int, chunks_indexed: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET chunks_processed = ?, chunks_indexed = ?, heartbeat_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (chunks_processed, chunks_indexed, time.time(), job_id, self.owner)
+            )
+            self._conn.commit()
+
+    def set_state(self, job_id: str, state: str, error: Optional[str] = None) -> None:
+        """
+        Move a job to a new state. Terminal states also record the finish time.
+        Nothing changes if another owner has taken the job over.
+
+        Args:
+            job_id (str): ID of the job
+            state (str): The new state
+            error (Optional[str]): Error message for failed jobs
+        """
+        finished_at = time.time() if state in (JOB_SUCCEEDED, JOB_FAILED) else None
+        # A queued job is free for any process to claim
+        owner = self.owner if state == JOB_RUNNING else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ?, owner = ? "
+                "WHERE id = ? AND (owner IS NULL OR owner = ?)",
+                (state, error, finished_at, owner, job_id, self.owner)
+            )
+            self._conn.commit()
+
+    def heartbeat(self) -> int:
+        """
+        Renew the lease on the jobs this owner is running.
+
+        Returns:
+            int: Number of running jobs of this owner
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE state = ? AND owner = ?",
+                (time.time(), JOB_RUNNING, self.owner)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def requeue_stale(self, heartbeat_timeout: float) -> int:
+        """
+        Queue again the running jobs whose owner stopped sending heartbeats.
+
+        Args:
+            heartbeat_timeout (float): Seconds without a heartbeat after which
+                the owner is considered dead
+
+        Returns:
+            int: Number of requeued jobs
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, started_at = NULL, heartbeat_at = NULL "
+                "WHERE state = ? AND (heartbeat_at IS NULL OR heartbeat_at <= ?)",
+                (JOB_QUEUED, JOB_RUNNING, time.time() - heartbeat_timeout)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def release_running(self) -> int:
+        """
+        Queue again the jobs this owner is running, when it shuts down.
+
+        Returns:
+            int: Number of requeued jobs
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, started_at = NULL, heartbeat_at = NULL "
+                "WHERE state = ? AND owner = ?",
+                (JOB_QUEUED, JOB_RUNNING, self.owner)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Return the number of jobs in each state.
+
+        Returns:
+            Dict[str, int]: Job counts keyed by state
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+
+class IngestionJobQueue:
+    """
+    Persistent queue of ingestion jobs processed by a bounded set of worker tasks.
+    """
+
+    def __init__(self, store: JobStore, spool_dir: str, workers: int = 1, heartbeat_timeout: float = 60.0):
+        self.store = store
+        self.spool_dir = spool_dir
+        self.workers = max(1, workers)
+        self.heartbeat_timeout = heartbeat_timeout
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def submit_text(self, document: Dict[str, Any]) -> IngestionJob:
+        """
+        Queue a text document for ingestion.
+
+        Args:
+            document (Dict[str, Any]): Document with content and metadata
+
+        Returns:
+            IngestionJob: The queued job
+        """
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            kind="text",
+            state=JOB_QUEUED,
+            payload={
+                "source": document.get("metadata", {}).get("source"),
+                "document": document,
+                "replace_sources": False,
+            },
+        )
+        await asyncio.to_thread(self.store.add, job)
+        self._notify()
+        return job
+
+    async def submit_upload(self, file_obj: BinaryIO, file_name: str, metadata: Dict[str, Any]) -> IngestionJob:
+        """
+        Copy an uploaded file into the spool directory and queue it for ingestion.
+
+        Args:
+            file_obj (BinaryIO): The uploaded file
+            file_name (str): Name of the file with extension
+            metadata (Dict[str, Any]): Metadata added to the parsed document
+
+        Returns:
+            IngestionJob: The queued job
+        """
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.spool_dir, job_id)
+
+        def copy() -> None:
+            file_obj.seek(0)
+            with open(file_path, "wb") as f:
+                shutil.copyfileobj(file_obj, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+        await asyncio.to_thread(copy)
+
+        job = IngestionJob(
+            id=job_id,
+            kind="upload",
+            state=JOB_QUEUED,
+            payload={
+                "source": file_name,
+                "file_name": file_name,
+                "file_path": file_path,
+                "metadata": metadata,
+                "replace_sources": True,
+            },
+        )
+        await asyncio.to_thread(self.store.add, job)
+        self._notify()
+        return job
+
+    async def get(self, job_id: str) -> Optional[IngestionJob]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def start(self) -> None:
+        """Start the worker tasks and the heartbeat that also requeues jobs of dead processes"""
+        if self._tasks:
+            return
+
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._heartbeat()))
+
+    async def stop(self) -> None:
+        """Stop the workers and queue the jobs they were running again"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.store.release_running)
+
+    async def _heartbeat(self) -> None:
+        # Store calls run in threads, since SQLite may wait for other processes' locks
+        while True:
+            try:
+                await asyncio.to_thread(self.store.heartbeat)
+                requeued = await asyncio.to_thread(self.store.requeue_stale, self.heartbeat_timeout)
+                if requeued:
+                    logger.info(f"Requeued {requeued} interrupted ingestion jobs")
+                    self._notify()
+            except Exception:
+                # A missed beat is retried; stopping would let other processes take our jobs
+                logger.exception("Ingestion job heartbeat failed")
+            await asyncio.sleep(self.heartbeat_timeout / 4)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+            except Exception:
+                logger.exception("Could not claim an ingestion job")
+                await asyncio.sleep(_POLL_INTERVAL)
+                continue
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), _POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.run_job(job)
+
+    async def run_job(self, job: IngestionJob) -> None:
+        """
+        Index a claimed job and record its outcome.
+
+        Args:
+            job (IngestionJob): A job in the running state
+        """
+        payload = job.payload
+
+        async def progress(chunks_processed: int, chunks_indexed: int) -> None:
+            await asyncio.to_thread(self.store.update_progress, job.id, chunks_processed, chunks_indexed)
+
+        try:
+            if job.kind == "upload":
+                with open(payload["file_path"], "rb") as f:
+                    document = await parse_file_stream(f, payload["file_name"], pool=get_preprocess_pool())
+                    document["metadata"].update(payload["metadata"])
+                    await index_chunk_stream(
+                        stream_document_chunks(document),
+                        replace_sources=payload["replace_sources"],
+                        progress_callback=progress
+                    )
+            else:
+                await index_chunk_stream(
+                    stream_document_chunks(payload["document"]),
+                    replace_sources=payload["replace_sources"],
+                    progress_callback=progress
+                )
+
+        except ExecutorSaturatedError:
+            # The model pools are busy with interactive requests; try again later
+            await asyncio.to_thread(self.store.set_state, job.id, JOB_QUEUED)
+            await asyncio.sleep(_POLL_INTERVAL)
+            return
+
+        except Exception as e:
+            logger.exception(f"Ingestion job {job.id} failed")
+            await asyncio.to_thread(self.store.set_state, job.id, JOB_FAILED, error=f"Error processing document: {str(e)}")
+
+        else:
+            await asyncio.to_thread(self.store.set_state, job.id, JOB_SUCCEEDED)
+
+        # The spooled upload is only needed until the job reaches a final state
+        if job.kind == "upload" and os.path.exists(payload["file_path"]):
+            os.remove(payload["file_path"])
+
+
+@lru_cache(maxsize=1)
+def get_job_queue() -> IngestionJobQueue:
+    """
+    Return the shared ingestion job queue configured from environment variables.
+
+    Returns:
+        IngestionJobQueue: The job queue
+    """
+    path = os.getenv("JOB_DB_PATH", "cache/jobs.sqlite")
+    return IngestionJobQueue(
+        JobStore(path),
+        spool_dir=os.getenv("JOB_SPOOL_DIR") or os.path.join(os.path.dirname(os.path.abspath(path)), "job_files"),
+        workers=int(os.getenv("JOB_WORKERS", "1")),
+        heartbeat_timeout=float(os.getenv("JOB_HEARTBEAT_TIMEOUT_SECONDS", "60")),
+    )
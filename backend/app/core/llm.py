@@ -1,8 +1,16 @@
 import os
+import time
+import asyncio
+import threading
 from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, Optional
 from langchain.llms import LlamaCpp
 from langchain.prompts import PromptTemplate
 
+from app.core.executors import ExecutorTimeoutError, get_generation_executor
+from app.core.prompt_cache import PromptPrefixCache
+from app.core.model_client import get_model_client, use_model_server
+
 # Template for our RAG prompt
 MEDICAL_RAG_TEMPLATE = """You are a medical assistant powered by BioMistral 7B, a specialized model for medical information.
 Use the following context to answer the question. If you don't know the answer or the context doesn't provide the necessary information,
@@ -15,12 +23,14 @@ Question: {question}
 
 Answer:"""
 
+# Everything before the context is the same for every request
+PROMPT_PREFIX = MEDICAL_RAG_TEMPLATE[:MEDICAL_RAG_TEMPLATE.index("{context}")]
 
-@lru_cache(maxsize=1)
-def get_llm_model():
+
+def load_llm_model():
     """
-    Load and return the LLM model using the model path from environment variables.
-    Uses LRU cache to prevent reloading the model on each call.
+    Load a new instance of the LLM model using the model path from environment variables.
+    The generation pool calls this once per instance; use get_llm_model() otherwise.
     
     Returns:
         LlamaCpp: The loaded LLM model
@@ -30,38 +40,235 @@ def get_llm_model():
     max_new_tokens = int(os.getenv("MAX_NEW_TOKENS", "512"))
     temperature = float(os.getenv("TEMPERATURE", "0.1"))
     
+    # Split the cores between the instances unless LLM_THREADS says otherwise
+    instances = max(1, int(os.getenv("GENERATION_WORKERS", "1")))
+    n_threads = int(os.getenv("LLM_THREADS", "0")) or max(1, (os.cpu_count() or 1) // instances)
+    
     # Load the model with specific parameters for medical Q&A
     return LlamaCpp(
         model_path=model_path,
         temperature=temperature,
         max_tokens=max_new_tokens,
         n_ctx=context_window_size,
+        n_threads=n_threads,
         n_gpu_layers=-1,  # Auto-detect number of layers to offload to GPU
         n_batch=512,  # Batch size for prompt processing
         verbose=False,  # Set to True for debugging
     )
 
 
-async def generate_response(query: str, context_documents: list[str]) -> str:
+def get_llm_model():
     """
-    Generate a response to the query using the provided context documents.
+    Return the first model instance of the generation pool, loading it if needed.
+    Use it for tokenizing only; generation must go through the pool, since an
+    instance cannot be used by two threads at once.
+    
+    Returns:
+        LlamaCpp: The loaded LLM model
+    """
+    return get_generation_executor().get_instance(0)
+
+
+class _DeadlineStop:
+    """llama.cpp stopping criterion that ends generation once a request's deadline passes"""
+    
+    def __init__(self, deadline: Optional[float]):
+        self.deadline = deadline
+        self.expired = False
+    
+    def __call__(self, input_ids: Any, logits: Any) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.expired = True
+        return self.expired
+
+
+@lru_cache(maxsize=1)
+def get_prompt_prefix_cache() -> PromptPrefixCache:
+    """
+    Return the shared cache of the evaluated prompt prefix.
+    Setting PROMPT_PREFIX_CACHE to "false" only disables reuse; timings are still recorded.
+    
+    Returns:
+        PromptPrefixCache: The prompt prefix cache
+    """
+    enabled = os.getenv("PROMPT_PREFIX_CACHE", "true").lower() == "true"
+    return PromptPrefixCache(PROMPT_PREFIX, enabled=enabled)
+
+
+@lru_cache(maxsize=1)
+def get_vocab_tokenizer():
+    """
+    Load only the vocabulary of the LLM, for tokenizing without the weights.
+    Used when generation runs in the model server.
+    
+    Returns:
+        llama_cpp.Llama: A vocabulary-only model
+    """
+    from llama_cpp import Llama
+    
+    return Llama(model_path=os.getenv("MODEL_PATH", "/models/biomistral-7b-q4.gguf"), vocab_only=True, verbose=False)
+
+
+def count_prompt_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the generation model's own tokenizer.
+    
+    Args:
+        text (str): Text to tokenize
+        
+    Returns:
+        int: Number of llama.cpp tokens, not counting the BOS token
+    """
+    tokenizer = get_vocab_tokenizer() if use_model_server() else get_llm_model().client
+    return len(tokenizer.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def build_prompt(query: str, context_documents: list[str]) -> str:
+    """
+    Build the RAG prompt for a query and its context documents.
     
     Args:
         query (str): The user's question
         context_documents (list[str]): List of context documents to use for answering
         
     Returns:
-        str: The generated response
+        str: The formatted prompt
     """
     # Join context documents into a single string
     context = "\n\n".join(context_documents)
     
     # Create the prompt
     prompt_template = PromptTemplate.from_template(MEDICAL_RAG_TEMPLATE)
-    prompt = prompt_template.format(context=context, question=query)
+    return prompt_template.format(context=context, question=query)
+
+
+async def generate_response(query: str, context_documents: list[str]) -> str:
+    """
+    Generate a response to the query using the provided context documents.
+    Runs in the model server when MODEL_SERVER_SOCKET is set.
+    
+    Args:
+        query (str): The user's question
+        context_documents (list[str]): List of context documents to use for answering
+        
+    Returns:
+        str: The generated response
+    """
+    prompt = build_prompt(query, context_documents)
+    if use_model_server():
+        return await get_model_client().generate(prompt)
+    return await generate_text(prompt)
+
+
+async def generate_text(prompt: str) -> str:
+    """
+    Generate a completion of a prompt on this process's generation pool.
+    
+    Args:
+        prompt (str): The full prompt
+        
+    Returns:
+        str: The generated text
+    """
+    def generate(model: LlamaCpp, deadline: Optional[float]) -> str:
+        stopping = _DeadlineStop(deadline)
+        
+        # Reuse the evaluated template prefix so only the context and question are evaluated
+        answer = get_prompt_prefix_cache().run(
+            model.client, lambda: model(prompt, stopping_criteria=stopping)
+        )
+        if stopping.expired:
+            raise ExecutorTimeoutError("Generation did not finish before the request timed out")
+        return answer
+    
+    # Generate and return the response on the next free model instance
+    return await get_generation_executor().run(generate)
+
+
+_END_OF_STREAM = object()
+
+
+async def stream_response(query: str, context_documents: list[str]) -> AsyncIterator[str]:
+    """
+    Start generating a response and return an async iterator over its tokens.
     
-    # Get the LLM model
-    model = get_llm_model()
+    Generation runs on the generation pool and hands tokens back to the event
+    loop as llama.cpp produces them. Closing the iterator (for example when
+    the client disconnects) stops generation after the current token. If the
+    request times out, the iterator raises ExecutorTimeoutError.
     
-    # Generate and return the response
-    return model(prompt)
+    When MODEL_SERVER_SOCKET is set, the tokens are streamed from the model
+    server instead; this waits until the server admits the request, so a
+    full server pool is raised here as well.
+    
+    Args:
+        query (str): The user's question
+        context_documents (list[str]): List of context documents to use for answering
+        
+    Returns:
+        AsyncIterator[str]: The generated tokens, in order
+        
+    Raises:
+        ExecutorSaturatedError: If the generation pool is full; raised here,
+            before any token is produced
+    """
+    prompt = build_prompt(query, context_documents)
+    if use_model_server():
+        return await get_model_client().stream_tokens(prompt)
+    return stream_text(prompt)
+
+
+def stream_text(prompt: str) -> AsyncIterator[str]:
+    """
+    Start generating a completion of a prompt on this process's generation pool.
+    
+    Args:
+        prompt (str): The full prompt
+        
+    Returns:
+        AsyncIterator[str]: The generated tokens, in order
+        
+    Raises:
+        ExecutorSaturatedError: If the generation pool is full
+    """
+    loop = asyncio.get_running_loop()
+    tokens: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def pump(model: LlamaCpp, deadline: Optional[float]) -> None:
+        stream: Optional[Iterator[str]] = None
+        try:
+            stream = model.stream(prompt)
+            for token in stream:
+                if stop.is_set():
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise ExecutorTimeoutError("Generation did not finish before the request timed out")
+                loop.call_soon_threadsafe(tokens.put_nowait, token)
+        finally:
+            # Closing the generator makes llama.cpp stop sampling
+            if hasattr(stream, "close"):
+                stream.close()
+    
+    def produce(model: LlamaCpp, deadline: Optional[float]) -> None:
+        get_prompt_prefix_cache().run(model.client, lambda: pump(model, deadline))
+    
+    future = get_generation_executor().submit(produce)
+    # Also ends the iteration when the request times out before it starts;
+    # the future completes after every token it produced has been queued
+    future.add_done_callback(lambda _: tokens.put_nowait(_END_OF_STREAM))
+    return _iterate_tokens(tokens, future, stop)
+
+
+async def _iterate_tokens(tokens: asyncio.Queue, future: asyncio.Future, stop: threading.Event) -> AsyncIterator[str]:
+    try:
+        while True:
+            token = await tokens.get()
+            if token is _END_OF_STREAM:
+                break
+            yield token
+        
+        # Surface any exception raised while generating
+        await future
+    finally:
+        stop.set()
@@ -0,0 +1,384 @@
+"""
+Client for the local model server (app.model_server) and its wire protocol.
+
+With MODEL_SERVER_SOCKET set, API processes send embedding and generation
+requests to a model server over a Unix socket instead of loading the
+models themselves, so any number of API workers share one copy of each.
+
+Every message is a frame: two big-endian uint32 lengths, a JSON header and
+an optional binary payload (embeddings travel as raw float32 arrays).
+A streaming request is answered with an {"accepted": true} frame (or an
+error) once the server's pool admits it, then its results and a final
+{"done": true} frame.
+"""
+
+import os
+import json
+import struct
+import asyncio
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.executors import ExecutorSaturatedError, ExecutorTimeoutError
+
+_FRAME_PREFIX = struct.Struct(">II")
+
+
+class ModelServerError(RuntimeError):
+    """Raised when the model server reports an error or cannot be reached"""
+
+
+async def write_frame(writer: asyncio.StreamWriter, header: Dict[str, Any], payload: bytes = b"") -> None:
+    """
+    Send one frame.
+
+    Args:
+        writer (asyncio.StreamWriter): The connection
+        header (Dict[str, Any]): JSON-serializable message
+        payload (bytes): Binary data sent after the header
+    """
+    encoded = json.dumps(header).encode("utf-8")
+    writer.write(_FRAME_PREFIX.pack(len(encoded), len(payload)) + encoded + payload)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Receive one frame.
+
+    Args:
+        reader (asyncio.StreamReader): The connection
+
+    Returns:
+        Tuple[Dict[str, Any], bytes]: The header and the binary payload
+
+    Raises:
+        asyncio.IncompleteReadError: If the connection closes mid-frame or before one
+    """
+    header_size, payload_size = _FRAME_PREFIX.unpack(await reader.readexactly(_FRAME_PREFIX.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+
+def pack_vectors(vectors: List[np.ndarray]) -> Tuple[List[int], bytes]:
+    """
+    Serialize embeddings for a frame payload.
+
+    Args:
+        vectors (List[np.ndarray]): Vectors of equal length
+
+    Returns:
+        Tuple[List[int], bytes]: The array shape and its float32 bytes
+    """
+    array = np.asarray(np.stack(vectors) if len(vectors) else np.zeros((0, 0)), dtype=np.float32)
+    return list(array.shape), array.tobytes()
+
+
+def unpack_vectors(shape: List[int], payload: bytes) -> List[np.ndarray]:
+    """
+    Deserialize embeddings sent with pack_vectors().
+
+    Args:
+        shape (List[int]): The array shape
+        payload (bytes): The float32 bytes
+
+    Returns:
+        List[np.ndarray]: One vector per row
+    """
+    return list(np.frombuffer(payload, dtype=np.float32).reshape(shape).copy())
+
+
+def error_header(error: BaseException) -> Dict[str, Any]:
+    """
+    Describe an exception so the client can re-raise an equivalent one.
+
+    Args:
+        error (BaseException): The exception raised while serving a request
+
+    Returns:
+        Dict[str, Any]: Error response header
+    """
+    if isinstance(error, ExecutorSaturatedError):
+        kind = "saturated"
+    elif isinstance(error, ExecutorTimeoutError):
+        kind = "timeout"
+    else:
+        kind = "error"
+    return {"error": str(error), "kind": kind}
+
+
+def _raise_for_error(header: Dict[str, Any]) -> None:
+    if "error" not in header:
+        return
+    if header.get("kind") == "saturated":
+        raise ExecutorSaturatedError(header["error"])
+    if header.get("kind") == "timeout":
+        raise ExecutorTimeoutError(header["error"])
+    raise ModelServerError(header["error"])
+
+
+class ModelServerClient:
+    """
+    Async client with a pool of connections to the model server.
+
+    Each connection carries one request at a time, so up to
+    ``max_connections`` requests of this process are in flight at once;
+    admission, queueing and timeouts are then handled by the server's pools.
+    A connection is reused only after its request completed cleanly.
+    """
+
+    def __init__(self, path: str, max_connections: int = 16):
+        self.path = path
+        self.max_connections = max_connections
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        try:
+            return await asyncio.open_unix_connection(self.path)
+        except OSError as e:
+            raise ModelServerError(f"Cannot reach the model server at {self.path}: {e}") from e
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._slots
+
+    async def request(self, header: Dict[str, Any], payload: bytes = b"") -> Tuple[Dict[str, Any], bytes]:
+        """
+        Send a request and wait for its single response frame.
+
+        Args:
+            header (Dict[str, Any]): The request, with an "op" field
+            payload (bytes): Binary data of the request
+
+        Returns:
+            Tuple[Dict[str, Any], bytes]: The response header and payload
+
+        Raises:
+            ExecutorSaturatedError: If the server's pool is full
+            ExecutorTimeoutError: If the request timed out on the server
+            ModelServerError: On any other server or connection error
+        """
+        async with self._get_slots():
+            reader, writer = await self._connect()
+            try:
+                await write_frame(writer, header, payload)
+                response, data = await read_frame(reader)
+            except asyncio.IncompleteReadError as e:
+                writer.close()
+                raise ModelServerError("The model server closed the connection") from e
+            except BaseException:
+                writer.close()
+                raise
+            self._idle.append((reader, writer))
+        _raise_for_error(response)
+        return response, data
+
+    async def open_stream(self, header: Dict[str, Any], key: Optional[str] = None) -> "ModelServerStream":
+        """
+        Send a streaming request and wait until the server admits it.
+
+        The server answers a streaming request with an acknowledgement (or an
+        error) before its first result, so a full pool is raised here rather
+        than from the middle of the stream.
+
+        Args:
+            header (Dict[str, Any]): The request, with an "op" field
+            key (Optional[str]): Field of each response frame to yield, or
+                None for the whole frame
+
+        Returns:
+            ModelServerStream: Iterator over the response frames
+
+        Raises:
+            ExecutorSaturatedError: If the server's pool is full
+            ModelServerError: On any other server or connection error
+        """
+        slots = self._get_slots()
+        await slots.acquire()
+        try:
+            reader, writer = await self._connect()
+        except BaseException:
+            slots.release()
+            raise
+        stream = ModelServerStream(self, reader, writer, slots, key)
+        try:
+            await write_frame(writer, header)
+            _raise_for_error(await stream._read())
+        except BaseException:
+            await stream.aclose()
+            raise
+        return stream
+
+    async def close(self) -> None:
+        """Close the idle connections"""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            await writer.wait_closed()
+
+    async def embed(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed texts on the server.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[np.ndarray]: One embedding vector per text, in order
+        """
+        response, payload = await self.request({"op": "embed", "texts": list(texts)})
+        return unpack_vectors(response["shape"], payload)
+
+    async def rerank(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        Score (query, chunk) pairs with the server's cross-encoder.
+
+        Args:
+            pairs (List[Tuple[str, str]]): (query, chunk content) pairs
+
+        Returns:
+            List[float]: Relevance score per pair, in order
+        """
+        response, _ = await self.request({"op": "rerank", "pairs": [list(pair) for pair in pairs]})
+        return response["scores"]
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Generate a completion on the server.
+
+        Args:
+            prompt (str): The full prompt
+
+        Returns:
+            str: The generated text
+        """
+        response, _ = await self.request({"op": "generate", "prompt": prompt})
+        return response["text"]
+
+    async def stream_tokens(self, prompt: str) -> "ModelServerStream":
+        """
+        Start generating a completion on the server, token by token.
+
+        Args:
+            prompt (str): The full prompt
+
+        Returns:
+            ModelServerStream: Iterator over the generated tokens, in order
+
+        Raises:
+            ExecutorSaturatedError: If the server's generation pool is full
+        """
+        return await self.open_stream({"op": "stream", "prompt": prompt}, key="token")
+
+    async def stats(self) -> Dict[str, Any]:
+        """
+        Return the server's pool and cache counters.
+
+        Returns:
+            Dict[str, Any]: Stats reported by the server
+        """
+        response, _ = await self.request({"op": "stats"})
+        return response["stats"]
+
+
+class ModelServerStream:
+    """
+    Response frames of a streaming request admitted by the model server.
+
+    Holds one of the client's connections until the server is done; closing
+    the stream early, even before iterating it, closes the connection, which
+    stops the work on the server.
+    """
+
+    def __init__(
+        self,
+        client: ModelServerClient,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        slots: asyncio.Semaphore,
+        key: Optional[str] = None
+    ):
+        self._client = client
+        self._reader = reader
+        self._writer = writer
+        self._slots = slots
+        self._key = key
+        self._closed = False
+
+    async def _read(self) -> Dict[str, Any]:
+        try:
+            response, _ = await read_frame(self._reader)
+        except asyncio.IncompleteReadError as e:
+            raise ModelServerError("The model server closed the connection") from e
+        return response
+
+    def _release(self, reusable: bool) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if reusable:
+            self._client._idle.append((self._reader, self._writer))
+        else:
+            self._writer.close()
+        self._slots.release()
+
+    def __aiter__(self) -> "ModelServerStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._closed:
+            raise StopAsyncIteration
+        try:
+            response = await self._read()
+            if response.get("done"):
+                self._release(reusable=True)
+                raise StopAsyncIteration
+            _raise_for_error(response)
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            self._release(reusable=False)
+            raise
+        return response[self._key] if self._key else response
+
+    async def aclose(self) -> None:
+        """Stop the stream, unless it already finished"""
+        self._release(reusable=False)
+
+
+def get_model_server_socket() -> str:
+    """
+    Return the model server's socket path, or "" when models run in-process.
+
+    Returns:
+        str: Value of MODEL_SERVER_SOCKET
+    """
+    return os.getenv("MODEL_SERVER_SOCKET", "")
+
+
+def use_model_server() -> bool:
+    return bool(get_model_server_socket())
+
+
+@lru_cache(maxsize=1)
+def get_model_client() -> ModelServerClient:
+    """
+    Return the shared model server client configured from environment variables.
+
+    Returns:
+        ModelServerClient: The model server client
+    """
+    return ModelServerClient(
+        get_model_server_socket(),
+        max_connections=int(os.getenv("MODEL_SERVER_CONNECTIONS", "16")),
+    )
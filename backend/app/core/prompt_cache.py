@@ -0,0 +1,139 @@
+"""
+Reuse of llama.cpp's evaluated state for the static start of the RAG prompt.
+"""
+
+import time
+import weakref
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def _reset_timings(llama: Any) -> bool:
+    try:
+        import llama_cpp
+        llama_cpp.llama_reset_timings(llama.ctx)
+        return True
+    except Exception:
+        return False
+
+
+def _read_timings(llama: Any) -> Optional[Tuple[float, int]]:
+    # (prompt eval milliseconds, prompt tokens evaluated) since the last reset
+    try:
+        import llama_cpp
+        timings = llama_cpp.llama_get_timings(llama.ctx)
+        return float(timings.t_p_eval_ms), int(timings.n_p_eval)
+    except Exception:
+        return None
+
+
+class PromptPrefixCache:
+    """
+    Keeps each model's state after evaluating the fixed prompt prefix.
+
+    Before a completion, the model's KV cache is made to start with the
+    prefix: it is left alone if it already does, otherwise the saved state
+    is loaded, or on first use the prefix is evaluated and saved. llama.cpp
+    then matches the prompt against its evaluated tokens and only evaluates
+    the context and question. Prompt-eval timings are recorded whether or
+    not the cache is enabled, so both modes can be compared.
+    """
+
+    def __init__(self, prefix: str, enabled: bool = True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._states: "weakref.WeakKeyDictionary[Any, Tuple[List[int], Any]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._prefix_tokens = 0
+        self._warmups = 0
+        self._resident = 0
+        self._restores = 0
+        self._restore_ms = 0.0
+        self._requests = 0
+        self._timed_requests = 0
+        self._prompt_eval_ms = 0.0
+        self._prompt_tokens_evaluated = 0
+
+    def prepare(self, llama: Any) -> None:
+        """
+        Make the model's evaluated tokens start with the prompt prefix.
+        Must run on the thread that runs the model's next completion.
+
+        Args:
+            llama (Any): The llama_cpp.Llama instance (LlamaCpp.client)
+        """
+        entry = self._states.get(llama)
+        if entry is None:
+            # Tokenized like llama-cpp-python tokenizes completion prompts
+            tokens = llama.tokenize(self.prefix.encode("utf-8"), special=True)
+            llama.reset()
+            llama.eval(tokens)
+            self._states[llama] = (tokens, llama.save_state())
+            with self._lock:
+                self._prefix_tokens = len(tokens)
+                self._warmups += 1
+            return
+
+        tokens, state = entry
+        if llama.n_tokens >= len(tokens) and llama.input_ids[:len(tokens)].tolist() == tokens:
+            with self._lock:
+                self._resident += 1
+            return
+
+        started = time.perf_counter()
+        llama.load_state(state)
+        with self._lock:
+            self._restores += 1
+            self._restore_ms += (time.perf_counter() - started) * 1000
+
+    def run(self, llama: Any, generate: Callable[[], T]) -> T:
+        """
+        Run a completion with the prefix state in place and record its prompt-eval time.
+
+        Args:
+            llama (Any): The llama_cpp.Llama instance the completion runs on
+            generate (Callable[[], T]): Runs the completion
+
+        Returns:
+            T: The return value of `generate`
+        """
+        if self.enabled:
+            self.prepare(llama)
+
+        timed = _reset_timings(llama)
+        try:
+            return generate()
+        finally:
+            timings = _read_timings(llama) if timed else None
+            with self._lock:
+                self._requests += 1
+                if timings is not None:
+                    self._timed_requests += 1
+                    self._prompt_eval_ms += timings[0]
+                    self._prompt_tokens_evaluated += timings[1]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return prefix reuse counters and prompt-eval timings.
+
+        Returns:
+            Dict[str, Any]: Cache counters and average timings
+        """
+        with self._lock:
+            timed = self._timed_requests
+            return {
+                "enabled": self.enabled,
+                "prefix_tokens": self._prefix_tokens,
+                "warmups": self._warmups,
+                "resident": self._resident,
+                "restores": self._restores,
+                "avg_restore_ms": self._restore_ms / self._restores if self._restores else 0.0,
+                "requests": self._requests,
+                "avg_prompt_eval_ms": self._prompt_eval_ms / timed if timed else 0.0,
+                "avg_prompt_tokens_evaluated": self._prompt_tokens_evaluated / timed if timed else 0.0,
+                "prompt_eval_ms_per_token": (
+                    self._prompt_eval_ms / self._prompt_tokens_evaluated if self._prompt_tokens_evaluated else 0.0
+                ),
+            }
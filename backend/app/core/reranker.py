@@ -0,0 +1,268 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+
+The vector search is cheap but coarse, so answering well used to mean
+putting many chunks into the prompt. With RERANK_ENABLED, queries over-fetch
+RERANK_CANDIDATES chunks, a cross-encoder scores every (query, chunk) pair
+and only the best `max_documents` chunks reach the LLM, which keeps prompts
+(and prompt evaluation time) short.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sentence_transformers import CrossEncoder
+
+from app.core.embedding_cache import normalize_for_cache
+from app.core.executors import get_embedding_executor
+from app.core.model_client import get_model_client, use_model_server
+from app.database.vector_store import SearchHit
+
+
+def is_rerank_enabled() -> bool:
+    """
+    Tell whether retrieved chunks are reranked before generation.
+
+    Returns:
+        bool: True when RERANK_ENABLED is set
+    """
+    return os.getenv("RERANK_ENABLED", "false").lower() == "true"
+
+
+def get_reranker_model_name() -> str:
+    """
+    Return the configured cross-encoder model name.
+
+    Returns:
+        str: The model name from the RERANK_MODEL environment variable
+    """
+    return os.getenv("RERANK_MODEL", "ncbi/MedCPT-Cross-Encoder")
+
+
+def get_rerank_candidates(max_documents: int) -> int:
+    """
+    Return how many chunks to retrieve for reranking.
+
+    Args:
+        max_documents (int): Number of chunks passed to the LLM
+
+    Returns:
+        int: RERANK_CANDIDATES, and never fewer than `max_documents`
+    """
+    return max(max_documents, int(os.getenv("RERANK_CANDIDATES", "20")))
+
+
+@lru_cache(maxsize=1)
+def get_reranker_model():
+    """
+    Load and return the cross-encoder.
+    Uses LRU cache to prevent reloading the model on each call.
+
+    Returns:
+        CrossEncoder: The loaded cross-encoder
+    """
+    return CrossEncoder(get_reranker_model_name(), max_length=int(os.getenv("RERANK_MAX_LENGTH", "512")))
+
+
+def make_pair_key(model_name: str, query: str, content: str) -> str:
+    """
+    Build the cache key of a (query, chunk) pair scored with a given model.
+
+    Args:
+        model_name (str): Name of the cross-encoder
+        query (str): The query
+        content (str): Text of the chunk
+
+    Returns:
+        str: Hex digest identifying (model, normalized query, chunk)
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, normalize_for_cache(query), content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class PairScoreCache:
+    """
+    LRU cache of cross-encoder scores.
+
+    A pair's score only depends on the model, the query and the chunk text,
+    so entries never go stale. All methods are thread-safe, since they are
+    called from the embedding pool's worker threads.
+    """
+
+    def __init__(self, max_items: int = 50000):
+        self.max_items = max_items
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(self, keys: List[str]) -> List[Optional[float]]:
+        """
+        Look up several pair keys at once.
+
+        Args:
+            keys (List[str]): make_pair_key() of the pairs
+
+        Returns:
+            List[Optional[float]]: Cached score per key, or None on a miss
+        """
+        results: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self._misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self._hits += 1
+                results.append(score)
+        return results
+
+    def put_many(self, keys: List[str], scores: List[float]) -> None:
+        """
+        Store the scores of several pairs.
+
+        Args:
+            keys (List[str]): make_pair_key() of the pairs
+            scores (List[float]): Score per pair
+        """
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = float(score)
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_items:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and the cache size.
+
+        Returns:
+            Dict[str, Any]: Cache statistics
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "size": len(self._scores)}
+
+
+@lru_cache(maxsize=1)
+def get_pair_score_cache() -> PairScoreCache:
+    """
+    Return the shared pair score cache, sized by RERANK_CACHE_SIZE.
+
+    Returns:
+        PairScoreCache: The score cache
+    """
+    return PairScoreCache(max_items=int(os.getenv("RERANK_CACHE_SIZE", "50000")))
+
+
+def _score_pairs_cached(pairs: List[Tuple[str, str]]) -> List[float]:
+    """
+    Score (query, chunk) pairs, running the model only on cache misses.
+    This blocks, so it must run on the embedding pool.
+
+    Args:
+        pairs (List[Tuple[str, str]]): (query, chunk content) pairs
+
+    Returns:
+        List[float]: Relevance score per pair, in order
+    """
+    cache = get_pair_score_cache()
+    model_name = get_reranker_model_name()
+    keys = [make_pair_key(model_name, query, content) for query, content in pairs]
+    scores = cache.get_many(keys)
+
+    # Score each distinct missing pair once
+    missing: Dict[str, List[int]] = {}
+    for i, score in enumerate(scores):
+        if score is None:
+            missing.setdefault(keys[i], []).append(i)
+
+    if missing:
+        first_positions = [positions[0] for positions in missing.values()]
+        predicted = get_reranker_model().predict(
+            [list(pairs[i]) for i in first_positions],
+            batch_size=int(os.getenv("RERANK_BATCH_SIZE", "64")),
+            show_progress_bar=False
+        )
+        predicted = [float(score) for score in predicted]
+        cache.put_many(list(missing), predicted)
+        for positions, score in zip(missing.values(), predicted):
+            for i in positions:
+                scores[i] = score
+
+    return scores
+
+
+async def score_pairs(pairs: List[Tuple[str, str]]) -> List[float]:
+    """
+    Score (query, chunk) pairs with this process's cross-encoder, on the embedding pool.
+
+    Args:
+        pairs (List[Tuple[str, str]]): (query, chunk content) pairs
+
+    Returns:
+        List[float]: Relevance score per pair, in order
+    """
+    return await get_embedding_executor().run(_score_pairs_cached, [tuple(pair) for pair in pairs])
+
+
+async def rerank_batch(
+    queries: Sequence[str],
+    hit_lists: Sequence[List[SearchHit]],
+    top_n: int
+) -> List[List[SearchHit]]:
+    """
+    Rerank the hits of several queries, scoring all pairs in one model call.
+    The call goes to the model server when MODEL_SERVER_SOCKET is set.
+
+    Args:
+        queries (Sequence[str]): The queries
+        hit_lists (Sequence[List[SearchHit]]): Retrieved hits per query
+        top_n (int): Number of hits to keep per query
+
+    Returns:
+        List[List[SearchHit]]: The best `top_n` hits per query, carrying
+            their cross-encoder score in `rerank_score`, best first
+    """
+    pairs = [(query, hit.content) for query, hits in zip(queries, hit_lists) for hit in hits]
+    if not pairs:
+        return [[] for _ in hit_lists]
+
+    if use_model_server():
+        scores = await get_model_client().rerank(pairs)
+    else:
+        scores = await score_pairs(pairs)
+
+    reranked = []
+    position = 0
+    for hits in hit_lists:
+        scored = [replace(hit, rerank_score=score) for hit, score in zip(hits, scores[position:position + len(hits)])]
+        position += len(hits)
+        # Stable sort keeps the retrieval order between equal scores
+        reranked.append(sorted(scored, key=lambda hit: hit.rerank_score, reverse=True)[:top_n])
+    return reranked
+
+
+async def rerank(query: str, hits: List[SearchHit], top_n: int) -> List[SearchHit]:
+    """
+    Rerank retrieved hits with the cross-encoder.
+
+    Args:
+        query (str): The query
+        hits (List[SearchHit]): Retrieved hits
+        top_n (int): Number of hits to keep
+
+    Returns:
+        List[SearchHit]: The best `top_n` hits, carrying their cross-encoder score in `rerank_score`
+    """
+    return (await rerank_batch([query], [hits], top_n))[0]
@@ -0,0 +1,117 @@
+"""
+Change counter of each collection, shared by all processes on the host.
+
+Caches derived from a collection (retrieved hits, generated answers, the
+lexical index) compare the counter on every lookup. Writers bump it in a
+SQLite file, so a change made by the ingestion script or by another API
+worker invalidates the caches of every process, not just its own.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+
+class CollectionVersionStore:
+    """
+    Monotonic version counter per collection, kept in SQLite.
+
+    Without a path the counter lives in an in-memory database and is only
+    seen by this process. Versions read or written by this process are
+    remembered for `ttl` seconds, so peek() can answer from memory; a
+    version bumped by another process is seen at most `ttl` seconds late.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 0.0):
+        self.path = path
+        # Nothing else writes an in-memory database, so its versions never go stale
+        self.ttl = ttl if path else float("inf")
+        self._known: Dict[str, Tuple[int, float]] = {}
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=30)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions (collection TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, collection: str) -> int:
+        """
+        Return the current version of a collection.
+
+        Args:
+            collection (str): Name of the collection
+
+        Returns:
+            int: The version, 0 if the collection never changed
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM versions WHERE collection = ?", (collection,)).fetchone()
+            version = row[0] if row else 0
+            self._known[collection] = (version, time.monotonic())
+        return version
+
+    def peek(self, collection: str) -> Optional[int]:
+        """
+        Return the version of a collection if it was read or written in the last `ttl` seconds.
+        Never touches the database, so it can be called from the event loop.
+
+        Args:
+            collection (str): Name of the collection
+
+        Returns:
+            Optional[int]: The remembered version, or None if get() must be called
+        """
+        known = self._known.get(collection)
+        if known is None or time.monotonic() - known[1] > self.ttl:
+            return None
+        return known[0]
+
+    def bump(self, collection: str) -> int:
+        """
+        Record that a collection changed.
+
+        Args:
+            collection (str): Name of the collection
+
+        Returns:
+            int: The new version
+        """
+        with self._lock:
+            # The write lock is held from the upsert to the commit, so the
+            # version read back is the one this call wrote
+            self._conn.execute(
+                "INSERT INTO versions (collection, version) VALUES (?, 1) "
+                "ON CONFLICT (collection) DO UPDATE SET version = version + 1",
+                (collection,)
+            )
+            version = self._conn.execute(
+                "SELECT version FROM versions WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+            self._conn.commit()
+            self._known[collection] = (version, time.monotonic())
+        return version
+
+
+@lru_cache(maxsize=1)
+def get_collection_version_store() -> CollectionVersionStore:
+    """
+    Return the version store at COLLECTION_VERSION_PATH.
+    An empty path keeps the versions in this process only. Versions are
+    re-read from the file at most every COLLECTION_VERSION_TTL_SECONDS.
+
+    Returns:
+        CollectionVersionStore: The version store
+    """
+    return CollectionVersionStore(
+        path=os.getenv("COLLECTION_VERSION_PATH", "cache/collection_versions.sqlite") or None,
+        ttl=float(os.getenv("COLLECTION_VERSION_TTL_SECONDS", "0.5"))
+    )
@@ -0,0 +1,451 @@
+"""
+In-process BM25 index over the ingested chunks, for hybrid retrieval.
+
+Exact drug names, dosages and codes are often missed by dense retrieval,
+so chunks are also indexed lexically and both rankings are fused at query
+time. Postings are kept as typed arrays (document numbers and term
+frequencies) and persisted as one compact .npz snapshot.
+
+Each process holds its own copy of the index and updates it with the
+chunks it writes. Saving merges the changes into the snapshot on disk, and
+other processes reload the snapshot once the shared collection version
+tells them the collection changed, so chunks ingested by the ingestion
+script or another API worker become searchable everywhere. An index for
+an existing collection is built with scripts/rebuild_lexical_index.py.
+"""
+
+import os
+import re
+import fcntl
+import json
+import math
+import time
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+# Very frequent words that only bloat the postings
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were which with".split()
+)
+
+
+def tokenize_for_index(text: str) -> List[str]:
+    """
+    Split text into index terms.
+
+    Compound tokens such as "e11.9", "500mg/day" or "ace-inhibitor" are kept
+    whole, so codes and dosages match exactly, and are also indexed by their
+    parts.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Lowercased terms, stopwords removed
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[.\-/]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+def _join(values: List[str]) -> np.ndarray:
+    return np.frombuffer(json.dumps(values).encode("utf-8"), dtype=np.uint8)
+
+
+def _split(data: np.ndarray) -> List[str]:
+    return json.loads(data.tobytes().decode("utf-8"))
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index keyed by chunk point IDs.
+
+    Documents are numbered in insertion order. Removed documents are marked
+    dead and dropped from the postings when the index is saved. All methods
+    are thread-safe.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75, save_interval: float = 30.0):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._clear()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        # Changes since the snapshot was last loaded or saved, replayed over
+        # a newer snapshot written by another process
+        self._pending: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._replaces_snapshot = False
+        self._snapshot_mtime: Optional[int] = None
+        self._seen_version: Optional[int] = None
+        if path and os.path.exists(path):
+            self._load(path)
+            self._snapshot_mtime = os.stat(path).st_mtime_ns
+
+    def _clear(self) -> None:
+        self._point_ids: List[str] = []
+        self._sources: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._live = bytearray()
+        self._live_count = 0
+        self._live_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def add(self, chunks: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Index chunks that are not indexed yet.
+
+        Args:
+            chunks (Iterable[Tuple[str, str, str]]): (point ID, content, source) per chunk
+
+        Returns:
+            int: Number of chunks added
+        """
+        with self._lock:
+            return self._add(chunks, record=True)
+
+    def _add(self, chunks: Iterable[Tuple[str, str, str]], record: bool) -> int:
+        added = 0
+        for point_id, content, source in chunks:
+            number = self._doc_numbers.get(point_id)
+            if number is not None and self._live[number]:
+                continue
+            if record:
+                self._record("add", point_id, content, source)
+
+            terms = Counter(tokenize_for_index(content))
+            number = len(self._point_ids)
+            self._point_ids.append(point_id)
+            self._sources.append(source)
+            self._doc_numbers[point_id] = number
+            length = sum(terms.values())
+            self._lengths.append(length)
+            self._live.append(1)
+            self._live_count += 1
+            self._live_length += length
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("I"))
+                postings[0].append(number)
+                postings[1].append(frequency)
+            added += 1
+        self._dirty = self._dirty or added > 0
+        return added
+
+    def _record(self, op: str, *args: Any) -> None:
+        # After clear() the next save replaces the snapshot, so nothing is replayed
+        if self.path and not self._replaces_snapshot:
+            self._pending.append((op, args))
+
+    def _replay(self) -> None:
+        for op, args in self._pending:
+            if op == "add":
+                self._add([args], record=False)
+            elif op == "remove":
+                self._remove(*args)
+            else:
+                self._remove_stale(*args)
+
+    def _kill(self, number: int) -> None:
+        if self._live[number]:
+            self._live[number] = 0
+            self._live_count -= 1
+            self._live_length -= self._lengths[number]
+            del self._doc_numbers[self._point_ids[number]]
+            self._dirty = True
+
+    def remove(self, point_ids: Iterable[str]) -> None:
+        """
+        Remove chunks from the index.
+
+        Args:
+            point_ids (Iterable[str]): Point IDs of the chunks
+        """
+        point_ids = list(point_ids)
+        with self._lock:
+            self._record("remove", point_ids)
+            self._remove(point_ids)
+
+    def _remove(self, point_ids: List[str]) -> None:
+        for point_id in point_ids:
+            number = self._doc_numbers.get(point_id)
+            if number is not None:
+                self._kill(number)
+
+    def remove_stale(self, sources: Iterable[str], keep_ids: Iterable[str]) -> None:
+        """
+        Remove the chunks of the given sources whose IDs are not in `keep_ids`.
+        Mirrors delete_stale_points() in the vector store.
+
+        Args:
+            sources (Iterable[str]): Sources whose chunks are being replaced
+            keep_ids (Iterable[str]): IDs of the current chunks of those sources
+        """
+        sources, keep_ids = set(sources), set(keep_ids)
+        with self._lock:
+            self._record("remove_stale", sources, keep_ids)
+            self._remove_stale(sources, keep_ids)
+
+    def _remove_stale(self, sources: Set[str], keep_ids: Set[str]) -> None:
+        for number, source in enumerate(self._sources):
+            if source in sources and self._point_ids[number] not in keep_ids:
+                self._kill(number)
+
+    def _score(self, terms: List[str]) -> np.ndarray:
+        # Runs under the lock: the array views below must not outlive it
+        doc_count = len(self._point_ids)
+        scores = np.zeros(doc_count, dtype=np.float32)
+        average_length = self._live_length / self._live_count
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+        normalizer = self.k1 * (1 - self.b + self.b * lengths / average_length)
+
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+            # Dead documents still count towards df until the next save
+            df = len(docs)
+            idf = math.log(1 + (self._live_count - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * frequencies * (self.k1 + 1) / (frequencies + normalizer[docs])
+
+        scores *= np.frombuffer(self._live, dtype=np.uint8)
+        return scores
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Return the best matching chunks for a query.
+
+        Args:
+            query (str): The query text
+            k (int): Maximum number of results
+
+        Returns:
+            List[Tuple[str, float]]: (point ID, BM25 score), best first
+        """
+        terms = tokenize_for_index(query)
+        with self._lock:
+            if not terms or not self._live_count:
+                return []
+            scores = self._score(terms)
+            matches = np.flatnonzero(scores > 0)
+            if len(matches) > k:
+                matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+            matches = matches[np.argsort(-scores[matches], kind="stable")]
+            return [(self._point_ids[number], float(scores[number])) for number in matches]
+
+    def _compact(self) -> None:
+        # Renumber the live documents and drop the dead ones from the postings
+        live = [number for number in range(len(self._point_ids)) if self._live[number]]
+        renumber = np.full(len(self._point_ids), -1, dtype=np.int64)
+        renumber[live] = np.arange(len(live))
+
+        postings = {}
+        for term, (docs, frequencies) in self._postings.items():
+            docs_view = np.frombuffer(docs, dtype=np.uint32)
+            keep = renumber[docs_view] >= 0
+            if keep.any():
+                postings[term] = (
+                    array("I", renumber[docs_view][keep].astype(np.uint32).tobytes()),
+                    array("I", np.frombuffer(frequencies, dtype=np.uint32)[keep].tobytes()),
+                )
+            del docs_view
+
+        self._point_ids = [self._point_ids[number] for number in live]
+        self._sources = [self._sources[number] for number in live]
+        self._lengths = array("I", [self._lengths[number] for number in live])
+        self._live = bytearray([1]) * len(live)
+        self._doc_numbers = {point_id: number for number, point_id in enumerate(self._point_ids)}
+        self._postings = postings
+
+    def _reload_if_newer(self) -> bool:
+        # Runs under the lock
+        if not self.path or self._replaces_snapshot:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._snapshot_mtime:
+            return False
+
+        self._clear()
+        self._load(self.path)
+        self._snapshot_mtime = mtime
+        self._replay()
+        self._dirty = bool(self._pending)
+        return True
+
+    def refresh(self, collection_version: int) -> bool:
+        """
+        Reload the snapshot if another process saved a newer one.
+
+        The file is only checked once per collection version. Changes of this
+        process that are not saved yet are applied again on top.
+
+        Args:
+            collection_version (int): Current collection version
+
+        Returns:
+            bool: True if the snapshot was reloaded
+        """
+        if not self.path or collection_version == self._seen_version:
+            return False
+        with self._lock:
+            self._seen_version = collection_version
+            return self._reload_if_newer()
+
+    def save(self) -> bool:
+        """
+        Write the index to its path, dropping removed documents, if it changed.
+
+        Snapshots saved by other processes since this one last loaded are
+        merged first, and the file is locked while saving, so concurrent
+        writers do not lose each other's chunks.
+
+        Returns:
+            bool: True if a snapshot was written
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._reload_if_newer()
+                self._write()
+                self._snapshot_mtime = os.stat(self.path).st_mtime_ns
+
+            self._pending = []
+            self._replaces_snapshot = False
+            self._dirty = False
+            self._last_save = time.monotonic()
+            return True
+
+    def _write(self) -> None:
+        # Runs under the lock and the file lock
+        if self._live_count < len(self._point_ids):
+            self._compact()
+
+        terms = sorted(self._postings)
+        sizes = np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        docs = array("I")
+        frequencies = array("I")
+        for term in terms:
+            docs.extend(self._postings[term][0])
+            frequencies.extend(self._postings[term][1])
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez(
+                f,
+                terms=_join(terms),
+                offsets=offsets,
+                docs=np.frombuffer(docs, dtype=np.uint32),
+                frequencies=np.frombuffer(frequencies, dtype=np.uint32),
+                point_ids=_join(self._point_ids),
+                sources=_join(self._sources),
+                lengths=np.frombuffer(self._lengths, dtype=np.uint32),
+            )
+        os.replace(temporary, self.path)
+
+    def save_if_due(self) -> bool:
+        """
+        Save the index if it changed and was last saved over `save_interval` seconds ago.
+
+        Returns:
+            bool: True if a snapshot was written
+        """
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            return self.save()
+        return False
+
+    def _load(self, path: str) -> None:
+        with np.load(path) as data:
+            terms = _split(data["terms"])
+            offsets = data["offsets"]
+            docs = data["docs"]
+            frequencies = data["frequencies"]
+            self._point_ids = _split(data["point_ids"])
+            self._sources = _split(data["sources"])
+            self._lengths = array("I", data["lengths"].astype(np.uint32).tobytes())
+
+        self._doc_numbers = {point_id: number for number, point_id in enumerate(self._point_ids)}
+        self._live = bytearray([1]) * len(self._point_ids)
+        self._live_count = len(self._point_ids)
+        self._live_length = int(sum(self._lengths))
+        self._postings = {
+            term: (
+                array("I", docs[offsets[i]:offsets[i + 1]].tobytes()),
+                array("I", frequencies[offsets[i]:offsets[i + 1]].tobytes()),
+            )
+            for i, term in enumerate(terms)
+        }
+
+    def clear(self) -> None:
+        """Remove every chunk; the next save replaces the snapshot instead of merging with it"""
+        with self._lock:
+            self._clear()
+            self._pending = []
+            self._replaces_snapshot = True
+            self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size of the index.
+
+        Returns:
+            Dict[str, Any]: Document, term and postings counts
+        """
+        with self._lock:
+            return {
+                "documents": self._live_count,
+                "removed": len(self._point_ids) - self._live_count,
+                "terms": len(self._postings),
+                "postings": sum(len(docs) for docs, _ in self._postings.values()),
+            }
+
+
+def is_hybrid_enabled() -> bool:
+    return os.getenv("HYBRID_RETRIEVAL", "false").lower() == "true"
+
+
+@lru_cache(maxsize=1)
+def get_lexical_index() -> LexicalIndex:
+    """
+    Return the shared lexical index, loaded from LEXICAL_INDEX_PATH.
+
+    Returns:
+        LexicalIndex: The lexical index
+    """
+    return LexicalIndex(
+        path=os.getenv("LEXICAL_INDEX_PATH", "cache/lexical_index.npz") or None,
+        save_interval=float(os.getenv("LEXICAL_INDEX_SAVE_SECONDS", "30")),
+    )
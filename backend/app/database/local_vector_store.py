@@ -0,0 +1,386 @@
+"""
+Embedded vector store for deployments without a Qdrant server.
+
+Vectors live in a memory-mapped float32 matrix (one L2-normalized row per
+point), so cosine top-k is a single matrix-vector product. Chunk content and
+metadata are kept in SQLite next to it. For large collections an HNSW graph
+(the optional `hnswlib` package) replaces the exhaustive scan once the
+collection reaches LOCAL_VECTOR_HNSW_MIN_POINTS.
+
+The store is owned by one process: other processes writing to the same
+directory are not seen until restart.
+"""
+
+import os
+import json
+import sqlite3
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.database.vector_backend import Chunk, VectorBackend
+
+# SQLite limits the number of bound parameters per statement
+_SQLITE_BATCH_SIZE = 500
+
+# Rows allocated when the matrix is first created
+_MIN_CAPACITY = 1024
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _matches(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    return not filters or all(metadata.get(key) == value for key, value in filters.items())
+
+
+class LocalVectorStore(VectorBackend):
+    """
+    In-process vector collection stored in a directory.
+
+    Points are stored as matrix rows; a re-written ID reuses its row, and the
+    rows of deleted points are kept on a free list and given to the next new
+    points, so re-ingesting documents does not grow the matrix. All methods
+    are thread-safe and the blocking work runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        hnsw: bool = False,
+        hnsw_min_points: int = 20000,
+        hnsw_ef: int = 64
+    ):
+        self.path = path
+        self.hnsw = hnsw
+        self.hnsw_min_points = hnsw_min_points
+        self.hnsw_ef = hnsw_ef
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._dimension: Optional[int] = None
+        self._count = 0
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._live = np.zeros(0, dtype=bool)
+        self._graph = None
+        self._graph_dirty = False
+        self._searches = 0
+        self._graph_searches = 0
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, "chunks.sqlite") if path else ":memory:", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS points "
+            "(row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    @property
+    def _matrix_path(self) -> Optional[str]:
+        return os.path.join(self.path, "vectors.f32") if self.path else None
+
+    @property
+    def _graph_path(self) -> Optional[str]:
+        return os.path.join(self.path, "hnsw.bin") if self.path else None
+
+    def _load(self) -> None:
+        row = self._conn.execute("SELECT value FROM settings WHERE key = 'dimension'").fetchone()
+        if row is None:
+            return
+        self._dimension = int(row[0])
+
+        capacity = os.path.getsize(self._matrix_path) // (4 * self._dimension)
+        self._vectors = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self._dimension))
+
+        rows = self._conn.execute("SELECT row, id, metadata FROM points ORDER BY row").fetchall()
+        self._count = rows[-1][0] + 1 if rows else 0
+        self._ids = [None] * self._count
+        self._metadata = [{}] * self._count
+        self._live = np.zeros(capacity, dtype=bool)
+        for number, point_id, metadata in rows:
+            self._ids[number] = point_id
+            self._rows[point_id] = number
+            self._metadata[number] = json.loads(metadata)
+            self._live[number] = True
+        self._free = [int(number) for number in np.flatnonzero(~self._live[:self._count])]
+
+        if self.hnsw and os.path.exists(self._graph_path):
+            graph = self._new_graph()
+            graph.load_index(self._graph_path, max_elements=capacity)
+            graph.set_ef(self.hnsw_ef)
+            # A graph saved before the last writes is rebuilt on first use
+            if graph.get_current_count() == self._count:
+                self._graph = graph
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = len(self._vectors) if self._vectors is not None else 0
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, _MIN_CAPACITY)
+
+        if self.path is None:
+            vectors = np.zeros((capacity, self._dimension), dtype=np.float32)
+            if self._vectors is not None:
+                vectors[:len(self._vectors)] = self._vectors
+            self._vectors = vectors
+        else:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            with open(self._matrix_path, "ab") as f:
+                f.truncate(capacity * self._dimension * 4)
+            self._vectors = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self._dimension))
+
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+        if self._graph is not None:
+            self._graph.resize_index(capacity)
+
+    def _new_graph(self):
+        # Optional dependency, only needed with LOCAL_VECTOR_HNSW=true
+        import hnswlib
+
+        return hnswlib.Index(space="ip", dim=self._dimension)
+
+    def _build_graph(self) -> None:
+        graph = self._new_graph()
+        graph.init_index(max_elements=len(self._vectors), ef_construction=200, M=16)
+        graph.set_ef(self.hnsw_ef)
+        graph.add_items(self._vectors[:self._count], np.arange(self._count))
+        for number in np.flatnonzero(~self._live[:self._count]):
+            graph.mark_deleted(int(number))
+        self._graph = graph
+        self._graph_dirty = True
+
+    def _upsert(self, point_ids: List[str], vectors: List[np.ndarray], chunks: List[Chunk]) -> None:
+        if not point_ids:
+            return
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = matrix.shape[1]
+                self._conn.execute("INSERT INTO settings VALUES ('dimension', ?)", (str(self._dimension),))
+            elif matrix.shape[1] != self._dimension:
+                raise ValueError(f"Expected {self._dimension}-dimensional vectors, got {matrix.shape[1]}")
+
+            numbers = []
+            for point_id in point_ids:
+                number = self._rows.get(point_id)
+                if number is None:
+                    if self._free:
+                        number = self._free.pop()
+                        self._ids[number] = point_id
+                    else:
+                        number = self._count
+                        self._count += 1
+                        self._ids.append(point_id)
+                        self._metadata.append({})
+                    self._rows[point_id] = number
+                numbers.append(number)
+            self._ensure_capacity(self._count)
+
+            self._vectors[numbers] = matrix
+            self._live[numbers] = True
+            for number, (_, metadata) in zip(numbers, chunks):
+                self._metadata[number] = dict(metadata)
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (row, id, content, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (number, point_id, content, json.dumps(self._metadata[number]))
+                    for number, point_id, (content, _) in zip(numbers, point_ids, chunks)
+                ]
+            )
+            self._conn.commit()
+
+            if self._graph is not None:
+                # Re-adding a deleted label replaces its vector and unmarks it
+                self._graph.add_items(matrix, np.asarray(numbers))
+                self._graph_dirty = True
+
+    def _delete_stale(self, sources: List[str], keep_ids: List[str]) -> None:
+        sources, keep_ids = set(sources), set(keep_ids)
+        with self._lock:
+            stale = [
+                number for number in np.flatnonzero(self._live[:self._count])
+                if self._metadata[number].get("source") in sources and self._ids[number] not in keep_ids
+            ]
+            for number in stale:
+                del self._rows[self._ids[number]]
+                self._ids[number] = None
+                self._metadata[number] = {}
+                self._live[number] = False
+                self._free.append(int(number))
+                if self._graph is not None:
+                    self._graph.mark_deleted(int(number))
+                    self._graph_dirty = True
+            self._conn.executemany("DELETE FROM points WHERE row = ?", [(int(number),) for number in stale])
+            self._conn.commit()
+
+    def _rank_exhaustive(self, query: np.ndarray, k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        scores = self._vectors[:self._count] @ query
+        scores[~self._live[:self._count]] = -np.inf
+        if filters:
+            # Walk down the ranking until enough rows match the filters
+            order = np.argsort(-scores, kind="stable")
+        else:
+            order = np.argpartition(-scores, k - 1)[:k] if self._count > k else np.arange(self._count)
+            order = order[np.argsort(-scores[order], kind="stable")]
+
+        ranked = []
+        for number in order:
+            if len(ranked) == k or scores[number] == -np.inf:
+                break
+            if _matches(self._metadata[number], filters):
+                ranked.append((int(number), float(scores[number])))
+        return ranked
+
+    def _rank_graph(self, query: np.ndarray, k: int, filters: Optional[Dict[str, Any]]) -> Optional[List[Tuple[int, float]]]:
+        live = int(self._live[:self._count].sum())
+        # Over-fetch when filters apply, since the graph cannot filter by metadata
+        limit = min(live, k * 4 if filters else k)
+        labels, distances = self._graph.knn_query(query, k=limit)
+        ranked = [
+            (int(number), 1.0 - float(distance))
+            for number, distance in zip(labels[0], distances[0])
+            if _matches(self._metadata[number], filters)
+        ][:k]
+        # Too few hits passed the filters: fall back to the exhaustive scan
+        return ranked if len(ranked) == min(k, live) or limit == live else None
+
+    def _search(self, vector: np.ndarray, k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any], float]]:
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            if not self._count or k <= 0:
+                return []
+            self._searches += 1
+
+            ranked = None
+            if self.hnsw and int(self._live[:self._count].sum()) >= self.hnsw_min_points:
+                if self._graph is None:
+                    self._build_graph()
+                ranked = self._rank_graph(query, k, filters)
+                if ranked is not None:
+                    self._graph_searches += 1
+            if ranked is None:
+                ranked = self._rank_exhaustive(query, k, filters)
+
+            contents = self._select_contents([self._ids[number] for number, _ in ranked])
+            return [
+                (contents[self._ids[number]], self._metadata[number], score)
+                for number, score in ranked
+            ]
+
+    def _select_contents(self, point_ids: List[str]) -> Dict[str, str]:
+        contents = {}
+        for start in range(0, len(point_ids), _SQLITE_BATCH_SIZE):
+            batch = point_ids[start:start + _SQLITE_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            contents.update(self._conn.execute(
+                f"SELECT id, content FROM points WHERE id IN ({placeholders})", batch
+            ).fetchall())
+        return contents
+
+    def _get_chunks(self, point_ids: List[str]) -> Dict[str, Chunk]:
+        with self._lock:
+            contents = self._select_contents([point_id for point_id in point_ids if point_id in self._rows])
+            return {
+                point_id: (content, self._metadata[self._rows[point_id]])
+                for point_id, content in contents.items()
+            }
+
+    def _get_vectors(self, point_ids: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            return {
+                point_id: np.array(self._vectors[self._rows[point_id]])
+                for point_id in point_ids if point_id in self._rows
+            }
+
+    def _save(self) -> None:
+        with self._lock:
+            if self._graph is not None and self._graph_dirty and self._graph_path:
+                self._graph.save_index(self._graph_path)
+                self._graph_dirty = False
+
+    def _existing_ids(self, point_ids: List[str]) -> Set[str]:
+        with self._lock:
+            return {point_id for point_id in point_ids if point_id in self._rows}
+
+    async def existing_ids(self, point_ids: List[str]) -> Set[str]:
+        return await asyncio.to_thread(self._existing_ids, point_ids)
+
+    async def get_chunks(self, point_ids: List[str]) -> Dict[str, Chunk]:
+        return await asyncio.to_thread(self._get_chunks, point_ids)
+
+    async def get_vectors(self, point_ids: List[str]) -> Dict[str, np.ndarray]:
+        return await asyncio.to_thread(self._get_vectors, point_ids)
+
+    async def upsert(self, point_ids: List[str], vectors: List[np.ndarray], chunks: List[Chunk]) -> None:
+        await asyncio.to_thread(self._upsert, point_ids, vectors, chunks)
+
+    async def delete_stale(self, sources: List[str], keep_ids: List[str]) -> None:
+        await asyncio.to_thread(self._delete_stale, sources, keep_ids)
+
+    async def search(
+        self,
+        vector: np.ndarray,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        return await asyncio.to_thread(self._search, vector, k, filters)
+
+    async def search_batch(
+        self,
+        vectors: List[np.ndarray],
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[str, Dict[str, Any], float]]]:
+        # One thread hop for the whole batch
+        return await asyncio.to_thread(lambda: [self._search(vector, k, filters) for vector in vectors])
+
+    async def scroll(self, batch_size: int = 256) -> AsyncIterator[List[Tuple[str, str, Dict[str, Any]]]]:
+        last_row = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row, id, content, metadata FROM points WHERE row > ? ORDER BY row LIMIT ?",
+                    (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_row = rows[-1][0]
+            yield [(point_id, content, json.loads(metadata)) for _, point_id, content, metadata in rows]
+
+    async def save(self) -> None:
+        await asyncio.to_thread(self._save)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size of the store and how searches were served.
+
+        Returns:
+            Dict[str, Any]: Point counts and search counters
+        """
+        with self._lock:
+            live = int(self._live[:self._count].sum())
+            return {
+                "points": live,
+                "dead_rows": self._count - live,
+                "dimension": self._dimension,
+                "hnsw": self._graph is not None,
+                "searches": self._searches,
+                "graph_searches": self._graph_searches,
+            }
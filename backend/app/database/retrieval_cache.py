@@ -0,0 +1,207 @@
+"""
+Cache of ranked retrieval results, invalidated when the collection changes.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.embedding_cache import normalize_for_cache
+
+
+def make_retrieval_key(
+    query: str,
+    k: int,
+    filters: Optional[Dict[str, Any]] = None,
+    index: str = "vector"
+) -> str:
+    """
+    Build the cache key for a search.
+
+    Args:
+        query (str): The query text
+        k (int): Number of results requested
+        filters (Optional[Dict[str, Any]]): Metadata filters of the search
+        index (str): Index the search runs against ("vector" or "lexical")
+
+    Returns:
+        str: Hex digest identifying (normalized query, k, filters, index)
+    """
+    digest = hashlib.sha256()
+    digest.update(index.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_for_cache(query).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(k).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(filters or {}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RetrievalCache:
+    """
+    LRU cache of search results tagged with the collection version.
+
+    Results are only served for the collection version they were computed
+    at; the first lookup at a newer version drops everything. The version
+    is shared by all processes on the host, so writes made by the ingestion
+    script or another API worker invalidate this cache too. Concurrent
+    misses for the same key share a single search. The TTL is only a
+    backstop against writers that bypass the version counter.
+    """
+
+    def __init__(self, max_items: int = 1024, ttl_seconds: float = 300):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[Any, ...]]]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._in_flight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._invalidations = 0
+
+    def _check_version(self, collection_version: int) -> bool:
+        # Returns False for results computed at an older version
+        if self._version is None or collection_version > self._version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._version = collection_version
+        return collection_version == self._version
+
+    def get(self, key: str, collection_version: int) -> Optional[List[Any]]:
+        """
+        Return cached results for a key, or None on a miss.
+
+        Args:
+            key (str): make_retrieval_key() of the search
+            collection_version (int): Current collection version
+
+        Returns:
+            Optional[List[Any]]: The ranked results
+        """
+        with self._lock:
+            self._check_version(collection_version)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return list(entry[1])
+            return None
+
+    def put(self, key: str, collection_version: int, results: List[Any]) -> None:
+        """
+        Cache the results of a search made at a given collection version.
+
+        Args:
+            key (str): make_retrieval_key() of the search
+            collection_version (int): Collection version the search ran at
+            results (List[Any]): The ranked results
+        """
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            if not self._check_version(collection_version):
+                return
+            self._entries[key] = (time.monotonic(), tuple(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    async def get_or_load(
+        self,
+        key: str,
+        collection_version: int,
+        load: Callable[[], Awaitable[List[Any]]]
+    ) -> List[Any]:
+        """
+        Return cached results, or run the search once for all concurrent callers.
+
+        Args:
+            key (str): make_retrieval_key() of the search
+            collection_version (int): Current collection version
+            load (Callable[[], Awaitable[List[Any]]]): Runs the search
+
+        Returns:
+            List[Any]: The ranked results
+        """
+        results = self.get(key, collection_version)
+        if results is not None:
+            return results
+
+        flight_key = (key, collection_version)
+        future = self._in_flight.get(flight_key)
+        if future is not None:
+            with self._lock:
+                self._coalesced += 1
+            try:
+                return list(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                # The caller running the search was cancelled, not this one
+                if future.cancelled():
+                    return await load()
+                raise
+
+        with self._lock:
+            self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        try:
+            results = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters get the error; mark it retrieved for when there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(results)
+            self.put(key, collection_version, results)
+            return results
+        finally:
+            del self._in_flight[flight_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters and the cache size.
+
+        Returns:
+            Dict[str, Any]: Cache counters and settings
+        """
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "hit_rate": (self._hits + self._coalesced) / lookups if lookups else 0.0,
+                "items": len(self._entries),
+                "max_items": self.max_items,
+                "invalidations": self._invalidations,
+                "collection_version": self._version,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_cache() -> RetrievalCache:
+    """
+    Return the shared retrieval cache configured from environment variables.
+    Setting RETRIEVAL_CACHE_SIZE to 0 disables caching.
+
+    Returns:
+        RetrievalCache: The retrieval cache
+    """
+    return RetrievalCache(
+        max_items=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+        ttl_seconds=float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300")),
+    )
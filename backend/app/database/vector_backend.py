@@ -0,0 +1,392 @@
+"""
+Storage interface of the vector store, with the Qdrant implementation.
+
+The ingestion and search code in app.database.vector_store only talks to a
+VectorBackend, so the collection can live in a Qdrant server or in the
+embedded LocalVectorStore (app.database.local_vector_store).
+"""
+
+import random
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import grpc
+import httpx
+import numpy as np
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models as rest
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+# (content, metadata) of a stored chunk
+Chunk = Tuple[str, Dict[str, Any]]
+
+
+class VectorBackend(ABC):
+    """
+    A collection of chunk vectors with their content and metadata.
+
+    Points are keyed by the deterministic IDs of make_point_id(). Scores are
+    cosine similarities and filters match metadata fields by equality.
+    """
+
+    @abstractmethod
+    async def existing_ids(self, point_ids: List[str]) -> Set[str]:
+        """
+        Return which of the given point IDs are stored.
+
+        Args:
+            point_ids (List[str]): Candidate point IDs
+
+        Returns:
+            Set[str]: The stored IDs
+        """
+
+    @abstractmethod
+    async def get_chunks(self, point_ids: List[str]) -> Dict[str, Chunk]:
+        """
+        Load stored chunks by point ID; unknown IDs are left out.
+
+        Args:
+            point_ids (List[str]): Point IDs to load
+
+        Returns:
+            Dict[str, Chunk]: (content, metadata) keyed by point ID
+        """
+
+    @abstractmethod
+    async def get_vectors(self, point_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Load stored embeddings by point ID; unknown IDs are left out.
+
+        Args:
+            point_ids (List[str]): Point IDs to load
+
+        Returns:
+            Dict[str, np.ndarray]: Stored vector keyed by point ID
+        """
+
+    @abstractmethod
+    async def upsert(self, point_ids: List[str], vectors: List[np.ndarray], chunks: List[Chunk]) -> None:
+        """
+        Write points, replacing stored points with the same IDs.
+
+        Args:
+            point_ids (List[str]): IDs of the points
+            vectors (List[np.ndarray]): Embedding per point
+            chunks (List[Chunk]): (content, metadata) per point
+        """
+
+    @abstractmethod
+    async def delete_stale(self, sources: List[str], keep_ids: List[str]) -> None:
+        """
+        Delete points of the given sources whose IDs are not in `keep_ids`.
+
+        Args:
+            sources (List[str]): Sources whose points are being replaced
+            keep_ids (List[str]): IDs of the current chunks of those sources
+        """
+
+    @abstractmethod
+    async def search(
+        self,
+        vector: np.ndarray,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        """
+        Return the points most similar to a query vector.
+
+        Args:
+            vector (np.ndarray): The query embedding
+            k (int): Maximum number of points to return
+            filters (Optional[Dict[str, Any]]): Metadata fields the points must match
+
+        Returns:
+            List[Tuple[str, Dict[str, Any], float]]: (content, metadata, score), best first
+        """
+
+    async def search_batch(
+        self,
+        vectors: List[np.ndarray],
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[str, Dict[str, Any], float]]]:
+        """
+        Run one search per query vector; backends override this to search in one round trip.
+
+        Args:
+            vectors (List[np.ndarray]): The query embeddings
+            k (int): Maximum number of points per query
+            filters (Optional[Dict[str, Any]]): Metadata fields the points must match
+
+        Returns:
+            List[List[Tuple[str, Dict[str, Any], float]]]: The results of search() per vector
+        """
+        return list(await asyncio.gather(*(self.search(vector, k, filters) for vector in vectors)))
+
+    @abstractmethod
+    def scroll(self, batch_size: int = 256) -> AsyncIterator[List[Tuple[str, str, Dict[str, Any]]]]:
+        """
+        Iterate over every stored point.
+
+        Args:
+            batch_size (int): Number of points per batch
+
+        Yields:
+            List[Tuple[str, str, Dict[str, Any]]]: (point ID, content, metadata) per point
+        """
+
+    async def save(self) -> None:
+        """Persist state that is not written immediately (nothing by default)"""
+
+    async def close(self) -> None:
+        """Release connections (nothing by default)"""
+
+
+# HTTP statuses and gRPC codes worth retrying: the server is overloaded or restarting
+_RETRY_STATUSES = {429, 502, 503, 504}
+_RETRY_GRPC_CODES = {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.RESOURCE_EXHAUSTED}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Tell whether a failed Qdrant call may succeed when retried.
+
+    Args:
+        error (BaseException): The exception raised by the client
+
+    Returns:
+        bool: True for timeouts, connection errors and overload responses
+    """
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in _RETRY_STATUSES
+    if isinstance(error, grpc.aio.AioRpcError):
+        return error.code() in _RETRY_GRPC_CODES
+    return isinstance(error, (ResponseHandlingException, httpx.TransportError, ConnectionError, asyncio.TimeoutError))
+
+
+class QdrantBackend(VectorBackend):
+    """
+    Collection in a Qdrant server, accessed through the async client.
+
+    Calls never block the event loop, so searches overlap with the embedding
+    and generation work of other requests. Every operation is idempotent
+    (point IDs are deterministic), so calls failing with a transient error
+    are retried with jittered exponential backoff. Payloads use the layout
+    of the langchain Qdrant wrapper, so existing collections stay readable.
+    """
+
+    def __init__(
+        self,
+        client: AsyncQdrantClient,
+        collection_name: str,
+        vector_size: int = 768,
+        retries: int = 3,
+        retry_backoff: float = 0.1,
+        content_payload_key: str = "page_content",
+        metadata_payload_key: str = "metadata"
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.content_payload_key = content_payload_key
+        self.metadata_payload_key = metadata_payload_key
+        self._collection_ready = False
+        self._calls = 0
+        self._retried = 0
+        self._failures = 0
+
+    async def _call(self, method: Callable[..., Awaitable[Any]], **kwargs: Any) -> Any:
+        self._calls += 1
+        for attempt in range(self.retries + 1):
+            try:
+                return await method(**kwargs)
+            except Exception as e:
+                if attempt == self.retries or not is_transient_error(e):
+                    self._failures += 1
+                    raise
+                self._retried += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+
+    async def _has_collection(self) -> bool:
+        response = await self._call(self.client.get_collections)
+        return self.collection_name in {collection.name for collection in response.collections}
+
+    async def _ensure_collection(self) -> None:
+        if self._collection_ready:
+            return
+        if not await self._has_collection():
+            try:
+                await self._call(
+                    self.client.create_collection,
+                    collection_name=self.collection_name,
+                    vectors_config=rest.VectorParams(size=self.vector_size, distance=rest.Distance.COSINE)
+                )
+            except Exception:
+                # Fine if another process created it first
+                if not await self._has_collection():
+                    raise
+        self._collection_ready = True
+
+    def _to_chunk(self, payload: Optional[Dict[str, Any]]) -> Chunk:
+        payload = payload or {}
+        return payload.get(self.content_payload_key) or "", payload.get(self.metadata_payload_key) or {}
+
+    def _to_filter(self, filters: Optional[Dict[str, Any]]) -> Optional[rest.Filter]:
+        if not filters:
+            return None
+        return rest.Filter(must=[
+            rest.FieldCondition(
+                key=f"{self.metadata_payload_key}.{key}",
+                match=rest.MatchAny(any=value) if isinstance(value, list) else rest.MatchValue(value=value)
+            )
+            for key, value in filters.items()
+        ])
+
+    async def existing_ids(self, point_ids: List[str]) -> Set[str]:
+        if not point_ids:
+            return set()
+        await self._ensure_collection()
+        records = await self._call(
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=False,
+            with_vectors=False
+        )
+        return {str(record.id) for record in records}
+
+    async def get_chunks(self, point_ids: List[str]) -> Dict[str, Chunk]:
+        if not point_ids:
+            return {}
+        await self._ensure_collection()
+        records = await self._call(
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=True,
+            with_vectors=False
+        )
+        return {str(record.id): self._to_chunk(record.payload) for record in records}
+
+    async def get_vectors(self, point_ids: List[str]) -> Dict[str, np.ndarray]:
+        if not point_ids:
+            return {}
+        await self._ensure_collection()
+        records = await self._call(
+            self.client.retrieve,
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=False,
+            with_vectors=True
+        )
+        return {str(record.id): np.asarray(record.vector, dtype=np.float32) for record in records}
+
+    async def upsert(self, point_ids: List[str], vectors: List[np.ndarray], chunks: List[Chunk]) -> None:
+        await self._ensure_collection()
+        points = [
+            rest.PointStruct(
+                id=point_id,
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
+                payload={
+                    self.content_payload_key: content,
+                    # Metadata may be a ChainMap over shared document metadata
+                    self.metadata_payload_key: dict(metadata)
+                }
+            )
+            for point_id, vector, (content, metadata) in zip(point_ids, vectors, chunks)
+        ]
+        await self._call(self.client.upsert, collection_name=self.collection_name, points=points)
+
+    async def delete_stale(self, sources: List[str], keep_ids: List[str]) -> None:
+        await self._ensure_collection()
+        await self._call(
+            self.client.delete,
+            collection_name=self.collection_name,
+            points_selector=rest.FilterSelector(
+                filter=rest.Filter(
+                    must=[rest.FieldCondition(
+                        key=f"{self.metadata_payload_key}.source",
+                        match=rest.MatchAny(any=sources)
+                    )],
+                    must_not=[rest.HasIdCondition(has_id=keep_ids)]
+                )
+            )
+        )
+
+    async def search(
+        self,
+        vector: np.ndarray,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, Dict[str, Any], float]]:
+        await self._ensure_collection()
+        points = await self._call(
+            self.client.search,
+            collection_name=self.collection_name,
+            query_vector=np.asarray(vector, dtype=np.float32).tolist(),
+            query_filter=self._to_filter(filters),
+            limit=k,
+            with_payload=True
+        )
+        return [(*self._to_chunk(point.payload), float(point.score)) for point in points]
+
+    async def search_batch(
+        self,
+        vectors: List[np.ndarray],
+        k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[str, Dict[str, Any], float]]]:
+        if not vectors:
+            return []
+        await self._ensure_collection()
+        query_filter = self._to_filter(filters)
+        batches = await self._call(
+            self.client.search_batch,
+            collection_name=self.collection_name,
+            requests=[
+                rest.SearchRequest(
+                    vector=np.asarray(vector, dtype=np.float32).tolist(),
+                    filter=query_filter,
+                    limit=k,
+                    with_payload=True
+                )
+                for vector in vectors
+            ]
+        )
+        return [
+            [(*self._to_chunk(point.payload), float(point.score)) for point in points]
+            for points in batches
+        ]
+
+    async def scroll(self, batch_size: int = 256) -> AsyncIterator[List[Tuple[str, str, Dict[str, Any]]]]:
+        await self._ensure_collection()
+        offset = None
+        while True:
+            records, offset = await self._call(
+                self.client.scroll,
+                collection_name=self.collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            yield [(str(record.id), *self._to_chunk(record.payload)) for record in records]
+            if offset is None:
+                return
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return call counters.
+
+        Returns:
+            Dict[str, Any]: Calls made, retries and calls that failed for good
+        """
+        return {"calls": self._calls, "retries": self._retried, "failures": self._failures}
@@ -1,101 +1,675 @@
 import os
+import uuid
+import hashlib
+import asyncio
+from dataclasses import dataclass, asdict, replace
 from functools import lru_cache
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, AsyncIterable, Awaitable, Callable, Optional, Tuple
 
-from qdrant_client import QdrantClient
-from qdrant_client.http import models as rest
-from langchain_community.vectorstores import Qdrant
-from langchain_community.docstore.document import Document
+import httpx
+import numpy as np
 
-from app.core.embeddings import get_embeddings_model
+from qdrant_client import AsyncQdrantClient
+
+from app.core.embeddings import embed_text, embed_documents
+from app.database.collection_version import get_collection_version_store
+from app.database.retrieval_cache import get_retrieval_cache, make_retrieval_key
+from app.database.lexical_index import get_lexical_index, is_hybrid_enabled
+from app.database.vector_backend import QdrantBackend, VectorBackend
+from app.database.local_vector_store import LocalVectorStore
 
 
 @lru_cache(maxsize=1)
-def get_vector_store():
+def get_qdrant_backend() -> QdrantBackend:
     """
-    Initialize and return the Qdrant vector store client.
-    Uses LRU cache to prevent recreating the client on each call.
+    Initialize and return the backend for the Qdrant server.
+    Uses LRU cache so all requests share the client and its connections.
+    
+    With QDRANT_PREFER_GRPC=true, calls are multiplexed over one gRPC channel;
+    over REST, up to QDRANT_MAX_CONNECTIONS HTTP connections are kept alive.
     
     Returns:
-        Qdrant: The configured vector store
+        QdrantBackend: The configured Qdrant backend
+    """
+    max_connections = int(os.getenv("QDRANT_MAX_CONNECTIONS", "32"))
+    client = AsyncQdrantClient(
+        host=os.getenv("QDRANT_HOST", "localhost"),
+        port=int(os.getenv("QDRANT_PORT", "6333")),
+        grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+        prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true",
+        timeout=int(os.getenv("QDRANT_TIMEOUT_SECONDS", "10")),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+    
+    # The collection is created with the PubMedBERT embedding size (768) on first use
+    return QdrantBackend(
+        client,
+        collection_name=os.getenv("COLLECTION_NAME", "medical_documents"),
+        vector_size=768,
+        retries=int(os.getenv("QDRANT_RETRIES", "3")),
+        retry_backoff=float(os.getenv("QDRANT_RETRY_BACKOFF_SECONDS", "0.1"))
+    )
+
+
+@lru_cache(maxsize=1)
+def get_local_vector_store() -> LocalVectorStore:
+    """
+    Return the embedded vector store of the configured collection.
+    
+    Returns:
+        LocalVectorStore: The store under LOCAL_VECTOR_PATH/COLLECTION_NAME
     """
-    # Get environment variables
-    qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port = int(os.getenv("QDRANT_PORT", "6333"))
     collection_name = os.getenv("COLLECTION_NAME", "medical_documents")
+    return LocalVectorStore(
+        path=os.path.join(os.getenv("LOCAL_VECTOR_PATH", "cache/vectors"), collection_name),
+        hnsw=os.getenv("LOCAL_VECTOR_HNSW", "false").lower() == "true",
+        hnsw_min_points=int(os.getenv("LOCAL_VECTOR_HNSW_MIN_POINTS", "20000")),
+        hnsw_ef=int(os.getenv("LOCAL_VECTOR_HNSW_EF", "64"))
+    )
+
+
+def use_local_vector_store() -> bool:
+    return os.getenv("VECTOR_BACKEND", "qdrant").lower() == "local"
+
+
+def get_vector_backend() -> VectorBackend:
+    """
+    Return the vector backend selected by VECTOR_BACKEND.
     
-    # Initialize Qdrant client
-    client = QdrantClient(host=qdrant_host, port=qdrant_port)
+    "qdrant" (the default) uses the Qdrant server from get_qdrant_backend(),
+    "local" the embedded store from get_local_vector_store().
     
-    # Get embeddings model
-    embeddings_model = get_embeddings_model()
+    Returns:
+        VectorBackend: The vector backend
+    """
+    if use_local_vector_store():
+        return get_local_vector_store()
+    return get_qdrant_backend()
+
+
+async def get_collection_version() -> int:
+    """
+    Return the current version of the collection's contents.
     
-    # Check if collection exists, if not create it
-    collections = client.get_collections().collections
-    collection_names = [collection.name for collection in collections]
+    The version is shared by all processes on the host (see
+    app.database.collection_version), so writes made elsewhere are seen here
+    within COLLECTION_VERSION_TTL_SECONDS. A recently read version is
+    answered from memory; otherwise the file is read in a worker thread,
+    since it may be locked by another process.
     
-    if collection_name not in collection_names:
-        # Create a new collection with the PubMedBERT embedding size (768)
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=rest.VectorParams(
-                size=768,
-                distance=rest.Distance.COSINE
-            )
-        )
+    Returns:
+        int: A counter that changes whenever points are written or deleted
+    """
+    store = get_collection_version_store()
+    collection = os.getenv("COLLECTION_NAME", "medical_documents")
+    version = store.peek(collection)
+    if version is None:
+        version = await asyncio.to_thread(store.get, collection)
+    return version
+
+
+async def bump_collection_version() -> int:
+    """
+    Record that the collection's contents changed.
     
-    # Return the Qdrant vector store
-    return Qdrant(
-        client=client,
-        collection_name=collection_name,
-        embeddings=embeddings_model
-    )
+    Returns:
+        int: The new collection version
+    """
+    store = get_collection_version_store()
+    return await asyncio.to_thread(store.bump, os.getenv("COLLECTION_NAME", "medical_documents"))
+
+
+# Namespace for deterministic chunk point IDs
+POINT_ID_NAMESPACE = uuid.UUID("6f1d9b2e-4c1a-5e0b-9a53-2d7c8e4f1b60")
 
 
-async def init_vector_store(documents: List[Dict[str, Any]]) -> None:
+def make_point_id(source: str, chunk_index: int, content: str) -> str:
     """
-    Initialize the vector store with documents.
+    Derive a deterministic point ID for a chunk.
+    The same chunk of the same source with the same text always maps to the
+    same ID, so re-ingesting it overwrites rather than duplicates.
     
     Args:
-        documents (List[Dict[str, Any]]): List of documents to add to the vector store
+        source (str): The document source (file name, dataset name, ...)
+        chunk_index (int): Position of the chunk within the document
+        content (str): The chunk text
+        
+    Returns:
+        str: A UUID string usable as a Qdrant point ID
     """
-    vector_store = get_vector_store()
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source}\0{chunk_index}\0{content_hash}"))
+
+
+def key_chunks_by_point_id(documents: List[Any]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    Map chunks to their deterministic point IDs.
+    Duplicate chunks collapse onto a single entry.
     
-    # Convert to Document objects if needed
-    doc_objects = []
+    Args:
+        documents (List[Any]): Chunk dicts (page_content/metadata) or Document objects
+        
+    Returns:
+        Dict[str, Tuple[str, Dict[str, Any]]]: (content, metadata) keyed by point ID
+    """
+    chunks: Dict[str, Tuple[str, Dict[str, Any]]] = {}
     for doc in documents:
         if isinstance(doc, dict):
-            doc_objects.append(
-                Document(
-                    page_content=doc["page_content"],
-                    metadata=doc["metadata"]
-                )
-            )
+            content, metadata = doc["page_content"], doc["metadata"]
         else:
-            doc_objects.append(doc)
+            content, metadata = doc.page_content, doc.metadata
+        point_id = make_point_id(str(metadata.get("source", "")), metadata.get("chunk", 0), content)
+        chunks[point_id] = (content, metadata)
+    return chunks
+
+
+async def find_missing_point_ids(vector_store: VectorBackend, point_ids: List[str]) -> List[str]:
+    """
+    Return the point IDs that are not yet stored in the collection.
+    
+    Args:
+        vector_store (VectorBackend): The backend from get_vector_backend()
+        point_ids (List[str]): Candidate point IDs
+        
+    Returns:
+        List[str]: The IDs without a stored point, in input order
+    """
+    if not point_ids:
+        return []
+    
+    existing_ids = await vector_store.existing_ids(point_ids)
+    return [point_id for point_id in point_ids if point_id not in existing_ids]
+
+
+async def upsert_chunk_vectors(
+    vector_store: VectorBackend,
+    chunks: Dict[str, Tuple[str, Dict[str, Any]]],
+    point_ids: List[str],
+    vectors: List[np.ndarray]
+) -> None:
+    """
+    Write already-embedded chunks to the collection.
+    
+    Args:
+        vector_store (VectorBackend): The backend from get_vector_backend()
+        chunks (Dict[str, Tuple[str, Dict[str, Any]]]): (content, metadata) keyed by point ID
+        point_ids (List[str]): IDs of the chunks to write
+        vectors (List[np.ndarray]): Embedding per point ID, in the same order
+    """
+    if not point_ids:
+        return
+    
+    await vector_store.upsert(point_ids, vectors, [chunks[point_id] for point_id in point_ids])
+    
+    if is_hybrid_enabled():
+        await asyncio.to_thread(_add_to_lexical_index, chunks, point_ids)
+    # Bumped last, so searches at the new version also see the lexical changes,
+    # and other processes reload the snapshot if the write saved one
+    await bump_collection_version()
+
+
+async def delete_stale_points(vector_store: VectorBackend, sources: List[str], keep_ids: List[str]) -> None:
+    """
+    Delete points of the given sources whose IDs are not in `keep_ids`.
+    
+    Args:
+        vector_store (VectorBackend): The backend from get_vector_backend()
+        sources (List[str]): Sources whose points are being replaced
+        keep_ids (List[str]): IDs of the current chunks of those sources
+    """
+    await vector_store.delete_stale(sources, keep_ids)
+    
+    if is_hybrid_enabled():
+        await asyncio.to_thread(_remove_from_lexical_index, sources, keep_ids)
+    await bump_collection_version()
+
+
+def _add_to_lexical_index(chunks: Dict[str, Tuple[str, Dict[str, Any]]], point_ids: List[str]) -> None:
+    index = get_lexical_index()
+    index.add(
+        (point_id, chunks[point_id][0], str(chunks[point_id][1].get("source", "")))
+        for point_id in point_ids
+    )
+    index.save_if_due()
+
+
+def _remove_from_lexical_index(sources: List[str], keep_ids: List[str]) -> None:
+    index = get_lexical_index()
+    index.remove_stale(sources, keep_ids)
+    index.save_if_due()
+
+
+async def flush_lexical_index() -> bool:
+    """
+    Save the lexical index if it has unsaved changes and its save interval passed.
+    Writes already do this; call it periodically so the last changes of a
+    burst of writes also reach the other processes.
+    
+    Returns:
+        bool: True if a snapshot was written
+    """
+    if not is_hybrid_enabled() or not await asyncio.to_thread(get_lexical_index().save_if_due):
+        return False
+    # Tells the other processes to reload the lexical index
+    await bump_collection_version()
+    return True
+
+
+async def save_search_indexes() -> None:
+    """
+    Persist all pending changes of the lexical index and the local vector store.
+    This rewrites whole snapshots, so call it only when an ingestion run or
+    the application finishes; writes save the lexical index at most every
+    LEXICAL_INDEX_SAVE_SECONDS.
+    """
+    if use_local_vector_store():
+        await get_local_vector_store().save()
+    if is_hybrid_enabled() and await asyncio.to_thread(get_lexical_index().save):
+        # Tells the other processes to reload the lexical index
+        await bump_collection_version()
+
+
+async def close_vector_backend() -> None:
+    """Close the Qdrant client's connections, if it was created"""
+    if get_qdrant_backend.cache_info().currsize:
+        await get_qdrant_backend().close()
+        get_qdrant_backend.cache_clear()
+
+
+async def rebuild_lexical_index(batch_size: int = 256) -> int:
+    """
+    Rebuild the lexical index from every point stored in the collection.
+    
+    Args:
+        batch_size (int): Number of points fetched per scroll request
+        
+    Returns:
+        int: Number of chunks indexed
+    """
+    vector_store = get_vector_backend()
+    index = get_lexical_index()
+    await asyncio.to_thread(index.clear)
+    
+    indexed = 0
+    async for points in vector_store.scroll(batch_size):
+        entries = [(point_id, content, str(metadata.get("source", ""))) for point_id, content, metadata in points]
+        indexed += await asyncio.to_thread(index.add, entries)
+    
+    await asyncio.to_thread(index.save)
+    await bump_collection_version()
+    return indexed
+
+
+async def init_vector_store(documents: List[Dict[str, Any]], replace_sources: bool = False) -> int:
+    """
+    Incrementally upsert documents into the existing vector store collection.
+    
+    Chunks get deterministic IDs from (source, chunk index, content hash).
+    Chunks already present in the collection are skipped, so re-ingesting a
+    document only embeds and writes the chunks that changed.
+    
+    Args:
+        documents (List[Dict[str, Any]]): List of documents to add to the vector store
+        replace_sources (bool): Also delete points of the same sources that are not
+            part of this call. Use this when `documents` holds every chunk of its
+            sources, e.g. a re-uploaded file.
+        
+    Returns:
+        int: Number of chunks that were embedded and written
+    """
+    vector_store = get_vector_backend()
+    
+    chunks = key_chunks_by_point_id(documents)
+    if not chunks:
+        return 0
+    
+    new_ids = await find_missing_point_ids(vector_store, list(chunks))
+    
+    if new_ids:
+        # Embed through the shared (cached) embedding path
+        vectors = await embed_documents([chunks[point_id][0] for point_id in new_ids])
+        await upsert_chunk_vectors(vector_store, chunks, new_ids, vectors)
+    
+    if replace_sources:
+        sources = sorted({str(metadata.get("source", "")) for _, metadata in chunks.values()})
+        await delete_stale_points(vector_store, sources, list(chunks))
+    
+    return len(new_ids)
+
+
+async def index_chunk_stream(
+    chunk_batches: AsyncIterable[List[Dict[str, Any]]],
+    replace_sources: bool = False,
+    progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
+) -> Tuple[int, int]:
+    """
+    Incrementally upsert chunks as they are produced, one batch at a time.
+    
+    Works like init_vector_store, but only the current batch and the IDs of
+    the chunks seen so far are held in memory, so a very large document can
+    be indexed while it is still being chunked.
+    
+    Args:
+        chunk_batches (AsyncIterable[List[Dict[str, Any]]]): Batches of chunks,
+            e.g. from stream_document_chunks()
+        replace_sources (bool): Once all batches are written, delete points of the
+            same sources that were not part of the stream
+        progress_callback (Optional[Callable[[int, int], Awaitable[None]]]): Awaited after
+            every batch with the chunks received and written so far
+        
+    Returns:
+        Tuple[int, int]: Number of chunks received and number of chunks embedded and written
+    """
+    vector_store = get_vector_backend()
+    
+    seen_ids: Dict[str, None] = {}
+    sources = set()
+    chunks_received = 0
+    chunks_written = 0
+    
+    async for batch in chunk_batches:
+        chunks = key_chunks_by_point_id(batch)
+        chunks_received += len(batch)
+        seen_ids.update(dict.fromkeys(chunks))
+        sources.update(str(metadata.get("source", "")) for _, metadata in chunks.values())
+        
+        new_ids = await find_missing_point_ids(vector_store, list(chunks))
+        if new_ids:
+            vectors = await embed_documents([chunks[point_id][0] for point_id in new_ids])
+            await upsert_chunk_vectors(vector_store, chunks, new_ids, vectors)
+            chunks_written += len(new_ids)
+        
+        if progress_callback is not None:
+            await progress_callback(chunks_received, chunks_written)
+    
+    if replace_sources and seen_ids:
+        await delete_stale_points(vector_store, sorted(sources), list(seen_ids))
+    
+    return chunks_received, chunks_written
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """
+    A retrieved chunk with its provenance.
     
-    # Add documents to the vector store
-    vector_store.from_documents(
-        documents=doc_objects,
-        embedding=get_embeddings_model()
+    `score` is always the cosine similarity to the query. The scores of
+    later ranking stages are kept separately: the reciprocal rank fusion
+    score of hybrid retrieval in `rrf_score` and the cross-encoder score of
+    reranking in `rerank_score`.
+    """
+    content: str
+    score: float
+    source: Optional[str] = None
+    chunk: Optional[int] = None
+    title: Optional[str] = None
+    page: Optional[int] = None
+    rrf_score: Optional[float] = None
+    rerank_score: Optional[float] = None
+    
+    @property
+    def ranking_score(self) -> float:
+        """The score of the last stage that ranked the hit"""
+        if self.rerank_score is not None:
+            return self.rerank_score
+        return self.rrf_score if self.rrf_score is not None else self.score
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def get_min_score() -> Optional[float]:
+    """
+    Return the default minimum similarity score of search results.
+    
+    Returns:
+        Optional[float]: Value of RETRIEVAL_MIN_SCORE, or None when unset (no cutoff)
+    """
+    min_score = os.getenv("RETRIEVAL_MIN_SCORE", "")
+    return float(min_score) if min_score else None
+
+
+# Rank offset of reciprocal rank fusion; larger values flatten the weight of top ranks
+RRF_K = 60
+
+# Lexical candidates fetched per requested result when metadata filters apply,
+# since the lexical index cannot filter by metadata itself
+LEXICAL_FILTER_OVERFETCH = 4
+
+
+def fuse_rankings(rankings: List[List[SearchHit]], k: int, rrf_k: int = RRF_K) -> List[SearchHit]:
+    """
+    Merge ranked hit lists with reciprocal rank fusion.
+    
+    A chunk scores sum(1 / (rrf_k + rank)) over the lists it appears in, so
+    the fused order does not depend on the lists' score scales.
+    
+    Args:
+        rankings (List[List[SearchHit]]): Hit lists, each best first
+        k (int): Maximum number of hits to return
+        rrf_k (int): Rank offset
+        
+    Returns:
+        List[SearchHit]: The fused hits, with their fusion score in `rrf_score`, best first
+    """
+    fused: Dict[str, Tuple[float, SearchHit]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            point_id = make_point_id(hit.source or "", hit.chunk or 0, hit.content)
+            score, first_seen = fused.get(point_id, (0.0, hit))
+            fused[point_id] = (score + 1 / (rrf_k + rank), first_seen)
+    
+    ranked = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)[:k]
+    return [replace(hit, rrf_score=score) for score, hit in ranked]
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    norm = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b)) / norm if norm else 0.0
+
+
+def _hit_from_payload(content: str, metadata: Dict[str, Any], score: float) -> SearchHit:
+    return SearchHit(
+        content=content,
+        score=float(score),
+        source=metadata.get("source"),
+        chunk=metadata.get("chunk"),
+        title=metadata.get("title"),
+        page=metadata.get("page")
     )
 
 
-async def search_similar_documents(query: str, k: int = 5) -> List[str]:
+def _search_lexical_index(query: str, limit: int, collection_version: int) -> List[Tuple[str, float]]:
+    index = get_lexical_index()
+    # Picks up the chunks other processes indexed since the collection last changed
+    index.refresh(collection_version)
+    return index.search(query, limit)
+
+
+async def search_lexical(query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[SearchHit]:
+    """
+    Search the lexical (BM25) index and load the matching chunks from the collection.
+    
+    Hits are ranked by BM25 but carry the cosine similarity of their chunk
+    to the query, like vector hits, so the same score cutoff applies to
+    both. The similarity is computed from the chunk vectors stored in the
+    collection; chunk text is never embedded on the query path.
+    
+    Args:
+        query (str): The query to search for
+        k (int): Maximum number of documents to return
+        filters (Optional[Dict[str, Any]]): Metadata fields the documents must match
+        
+    Returns:
+        List[SearchHit]: Hits with their cosine similarity, best BM25 match first
+    """
+    limit = k * LEXICAL_FILTER_OVERFETCH if filters else k
+    collection_version = await get_collection_version()
+    matches = await asyncio.to_thread(_search_lexical_index, query, limit, collection_version)
+    if not matches:
+        return []
+    
+    vector_store = get_vector_backend()
+    point_ids = [point_id for point_id, _ in matches]
+    chunks, vectors, query_embedding = await asyncio.gather(
+        vector_store.get_chunks(point_ids),
+        vector_store.get_vectors(point_ids),
+        embed_text(query)
+    )
+    
+    hits = []
+    for point_id, score in matches:
+        # Points deleted by another process may still be in this process's index
+        if point_id not in chunks or point_id not in vectors:
+            continue
+        content, metadata = chunks[point_id]
+        if filters and any(metadata.get(key) != value for key, value in filters.items()):
+            continue
+        hits.append(_hit_from_payload(content, metadata, _cosine(query_embedding, vectors[point_id])))
+    return hits[:k]
+
+
+async def search_similar_documents(
+    query: str,
+    k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+    min_score: Optional[float] = None
+) -> List[SearchHit]:
     """
     Search for documents similar to the query.
     
+    Results are cached per (query, k, filters) until the collection changes,
+    so repeated searches skip both the query embedding and the vector search.
+    The score cutoff is applied to the cached results, so searches that only
+    differ in `min_score` share a cache entry.
+    
+    With HYBRID_RETRIEVAL enabled, the vector and lexical searches run
+    concurrently and their rankings are merged with reciprocal rank fusion.
+    The cutoff applies to the cosine similarity of the hits of both searches
+    before fusion. Hits keep their cosine similarity in `score` and carry
+    the fusion score in `rrf_score`.
+    
     Args:
         query (str): The query to search for
-        k (int): Number of documents to return
+        k (int): Maximum number of documents to return
+        filters (Optional[Dict[str, Any]]): Metadata fields the documents must match
+        min_score (Optional[float]): Drop hits with a lower cosine similarity.
+            Defaults to RETRIEVAL_MIN_SCORE.
         
     Returns:
-        List[str]: List of similar document contents
+        List[SearchHit]: Hits ordered by descending score
     """
-    vector_store = get_vector_store()
+    async def search() -> List[SearchHit]:
+        vector_store = get_vector_backend()
+        
+        # Embed the query through the shared batcher so concurrent queries share one encode call
+        query_embedding = await embed_text(query)
+        
+        results = await vector_store.search(query_embedding, k, filters)
+        return [_hit_from_payload(content, metadata, score) for content, metadata, score in results]
+    
+    cache = get_retrieval_cache()
+    collection_version = await get_collection_version()
+    dense_search = cache.get_or_load(make_retrieval_key(query, k, filters), collection_version, search)
+    
+    if is_hybrid_enabled():
+        hits, lexical_hits = await asyncio.gather(
+            dense_search,
+            cache.get_or_load(
+                make_retrieval_key(query, k, filters, index="lexical"),
+                collection_version,
+                lambda: search_lexical(query, k, filters)
+            )
+        )
+    else:
+        hits, lexical_hits = await dense_search, None
+    
+    return _finish_hits(hits, lexical_hits, k, min_score)
+
+
+def _finish_hits(
+    hits: List[SearchHit],
+    lexical_hits: Optional[List[SearchHit]],
+    k: int,
+    min_score: Optional[float]
+) -> List[SearchHit]:
+    # Score cutoff on both rankings, then fusion
+    if min_score is None:
+        min_score = get_min_score()
+    if min_score is not None:
+        hits = [hit for hit in hits if hit.score >= min_score]
+        if lexical_hits is not None:
+            lexical_hits = [hit for hit in lexical_hits if hit.score >= min_score]
+    
+    if lexical_hits is not None:
+        hits = fuse_rankings([hits, lexical_hits], k)
+    return hits
+
+
+async def search_similar_documents_batch(
+    queries: List[str],
+    k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+    min_score: Optional[float] = None
+) -> List[List[SearchHit]]:
+    """
+    Search for documents similar to each of several queries.
+    
+    Queries missing from the retrieval cache are embedded in one encode call
+    and searched in one batched request to the vector backend, instead of one
+    round trip per query. Results match search_similar_documents().
+    
+    Args:
+        queries (List[str]): The queries to search for
+        k (int): Maximum number of documents per query
+        filters (Optional[Dict[str, Any]]): Metadata fields the documents must match
+        min_score (Optional[float]): Drop hits with a lower cosine similarity.
+            Defaults to RETRIEVAL_MIN_SCORE.
+        
+    Returns:
+        List[List[SearchHit]]: Hits per query, in the order of `queries`
+    """
+    cache = get_retrieval_cache()
+    collection_version = await get_collection_version()
+    keys = [make_retrieval_key(query, k, filters) for query in queries]
+    
+    dense_hits: Dict[str, List[SearchHit]] = {}
+    for key in keys:
+        if key not in dense_hits:
+            cached = cache.get(key, collection_version)
+            if cached is not None:
+                dense_hits[key] = cached
+    
+    # Each distinct uncached query is embedded and searched once
+    missing = {key: query for key, query in zip(keys, queries) if key not in dense_hits}
     
-    # Get similar documents with their similarity scores
-    docs_and_scores = vector_store.similarity_search_with_score(query, k=k)
+    async def search_missing() -> None:
+        if not missing:
+            return
+        vectors = await embed_documents(list(missing.values()))
+        results = await get_vector_backend().search_batch(vectors, k, filters)
+        for key, points in zip(missing, results):
+            hits = [_hit_from_payload(content, metadata, score) for content, metadata, score in points]
+            cache.put(key, collection_version, hits)
+            dense_hits[key] = hits
+    
+    if is_hybrid_enabled():
+        _, lexical_hits = await asyncio.gather(
+            search_missing(),
+            asyncio.gather(*(
+                cache.get_or_load(
+                    make_retrieval_key(query, k, filters, index="lexical"),
+                    collection_version,
+                    lambda query=query: search_lexical(query, k, filters)
+                )
+                for query in queries
+            ))
+        )
+    else:
+        await search_missing()
+        lexical_hits = [None] * len(queries)
     
-    # Extract document content
-    return [doc.page_content for doc, _ in docs_and_scores]
+    return [
+        _finish_hits(dense_hits[key], lexical, k, min_score)
+        for key, lexical in zip(keys, lexical_hits)
+    ]
@@ -1,15 +1,49 @@
 import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.api.routes import router as api_router
+from app.api.upload_limits import UploadSizeLimitMiddleware, get_max_upload_bytes
+from app.core.jobs import get_job_queue
+from app.database.vector_store import close_vector_backend, flush_lexical_index, save_search_indexes
+
+logger = logging.getLogger(__name__)
+
+
+async def flush_search_indexes_periodically() -> None:
+    # Saves lexical index changes left unsaved by the save interval once writes stop
+    interval = float(os.getenv("LEXICAL_INDEX_SAVE_SECONDS", "30"))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_lexical_index()
+        except Exception:
+            logger.exception("Could not save the lexical index")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Run queued ingestion jobs in the background while the app is up
+    job_queue = get_job_queue()
+    job_queue.start()
+    flusher = asyncio.create_task(flush_search_indexes_periodically())
+    yield
+    flusher.cancel()
+    await job_queue.stop()
+    await save_search_indexes()
+    await close_vector_backend()
+
 
 # Create FastAPI application
 app = FastAPI(
     title="Medical RAG API",
     description="A medical RAG API using Bio-Mistral 7B, PubMedBERT, and Qdrant",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -21,6 +55,13 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Refuse oversized uploads while they are being received
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=get_max_upload_bytes(),
+    paths=["/api/documents"],
+)
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
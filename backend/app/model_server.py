@@ -0,0 +1,156 @@
+"""
+Local model server: runs embedding, reranking and generation for API workers.
+
+Run it next to the API with the same environment and socket path:
+
+    python -m app.model_server --socket /tmp/notethat-models.sock
+    MODEL_SERVER_SOCKET=/tmp/notethat-models.sock uvicorn app.main:app --workers 4
+
+The server holds the only copy of the models and the embedding cache; its
+pools (EMBEDDING_*, GENERATION_*) bound the work across all API workers.
+"""
+
+import os
+import argparse
+import asyncio
+import logging
+from typing import Any, Dict, Tuple
+
+from app.core.executors import get_executor_stats, get_generation_executor
+from app.core.embeddings import encode_texts, get_embeddings_model
+from app.core.embedding_cache import get_embedding_cache
+from app.core.llm import generate_text, get_prompt_prefix_cache, stream_text
+from app.core.reranker import get_pair_score_cache, score_pairs
+from app.core.model_client import error_header, get_model_server_socket, pack_vectors, read_frame, write_frame
+
+logger = logging.getLogger(__name__)
+
+
+async def _embed(header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    shape, payload = pack_vectors(await encode_texts(header["texts"]))
+    return {"shape": shape}, payload
+
+
+async def _rerank(header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    return {"scores": await score_pairs(header["pairs"])}, b""
+
+
+async def _generate(header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    return {"text": await generate_text(header["prompt"])}, b""
+
+
+async def _stats(header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    stats = {
+        "executors": get_executor_stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "prompt_cache": get_prompt_prefix_cache().stats(),
+        "rerank_cache": get_pair_score_cache().stats(),
+    }
+    return {"stats": stats}, b""
+
+
+_HANDLERS = {"embed": _embed, "rerank": _rerank, "generate": _generate, "stats": _stats}
+
+
+async def _stream(header: Dict[str, Any], reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        tokens = stream_text(header["prompt"])
+    except Exception as e:
+        await write_frame(writer, error_header(e))
+        return
+
+    try:
+        # Tell the client the request was admitted before the first token,
+        # which may take a while, so it can still refuse the request cleanly
+        await write_frame(writer, {"accepted": True})
+        async for token in tokens:
+            # The client closes the connection to stop generation
+            if reader.at_eof():
+                return
+            await write_frame(writer, {"token": token})
+        await write_frame(writer, {"done": True})
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return
+    except Exception as e:
+        await write_frame(writer, error_header(e))
+    finally:
+        await tokens.aclose()
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Serve the requests of one client connection, one at a time.
+
+    Args:
+        reader (asyncio.StreamReader): The connection's reader
+        writer (asyncio.StreamWriter): The connection's writer
+    """
+    try:
+        while True:
+            try:
+                header, _ = await read_frame(reader)
+            except asyncio.IncompleteReadError:
+                break
+
+            op = header.get("op")
+            if op == "stream":
+                await _stream(header, reader, writer)
+                continue
+
+            try:
+                handler = _HANDLERS.get(op)
+                if handler is None:
+                    raise ValueError(f"Unknown operation: {op}")
+                response, payload = await handler(header)
+            except Exception as e:
+                response, payload = error_header(e), b""
+            await write_frame(writer, response, payload)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(path: str, preload: bool = True) -> None:
+    """
+    Listen on a Unix socket and serve model requests until cancelled.
+
+    Args:
+        path (str): Socket path; a stale socket file is replaced
+        preload (bool): Load the embedding model and the first LLM instance
+            before accepting connections
+    """
+    if preload:
+        await asyncio.to_thread(get_embeddings_model)
+        await asyncio.to_thread(get_generation_executor().get_instance, 0)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle_connection, path=path)
+    # Only processes of the same user may send requests
+    os.chmod(path, 0o600)
+    logger.info("Model server listening on %s", path)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve embedding and generation requests over a Unix socket")
+    parser.add_argument("--socket", default=get_model_server_socket() or "/tmp/notethat-models.sock", help="Socket path")
+    parser.add_argument("--no-preload", action="store_true", help="Load models on first use instead of at startup")
+    args = parser.parse_args()
+
+    # This process runs the models itself, even with MODEL_SERVER_SOCKET in the environment
+    os.environ["MODEL_SERVER_SOCKET"] = ""
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.socket, preload=not args.no_preload))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,12 +17,44 @@ class QueryRequest(BaseModel):
     """Model for query request"""
     query: str = Field(..., description="The user's query text")
     max_documents: Optional[int] = Field(5, description="Maximum number of documents to retrieve")
+    min_score: Optional[float] = Field(None, description="Minimum similarity score of retrieved documents (defaults to RETRIEVAL_MIN_SCORE)")
+
+
+class SourceDocument(BaseModel):
+    """Model for a retrieved chunk used as context"""
+    content: str = Field(..., description="Text of the chunk")
+    score: float = Field(..., description="Cosine similarity to the query")
+    source: Optional[str] = Field(None, description="Source of the document (file name, dataset, ...)")
+    chunk: Optional[int] = Field(None, description="Position of the chunk within the document")
+    title: Optional[str] = Field(None, description="Title of the document")
+    page: Optional[int] = Field(None, description="Page of the chunk, for paged documents")
+    rrf_score: Optional[float] = Field(None, description="Reciprocal rank fusion score the chunk was ranked by, with hybrid retrieval")
+    rerank_score: Optional[float] = Field(None, description="Cross-encoder relevance score, with reranking")
 
 
 class QueryResponse(BaseModel):
     """Model for query response"""
     answer: str = Field(..., description="The generated answer")
-    sources: List[str] = Field(default_factory=list, description="Sources used for the answer")
+    sources: List[SourceDocument] = Field(default_factory=list, description="Sources used for the answer")
+    cached: bool = Field(False, description="Whether the answer was served from the answer cache")
+
+
+class BatchQueryRequest(BaseModel):
+    """Model for a batch of queries answered with the same settings"""
+    queries: List[str] = Field(..., min_length=1, description="The query texts")
+    max_documents: Optional[int] = Field(5, description="Maximum number of documents to retrieve per query")
+    min_score: Optional[float] = Field(None, description="Minimum similarity score of retrieved documents (defaults to RETRIEVAL_MIN_SCORE)")
+
+
+class BatchQueryResult(BaseModel):
+    """Model for one line of a batch query response"""
+    index: int = Field(..., description="Position of the query in the request")
+    query: str = Field(..., description="The query text")
+    answer: Optional[str] = Field(None, description="The generated answer, unless the query failed")
+    sources: List[SourceDocument] = Field(default_factory=list, description="Sources used for the answer")
+    cached: bool = Field(False, description="Whether the answer was served from the answer cache")
+    status: int = Field(200, description="HTTP status the query would have had on its own")
+    error: Optional[str] = Field(None, description="Error message if the query failed")
 
 
 class HealthResponse(BaseModel):
@@ -30,3 +62,19 @@ class HealthResponse(BaseModel):
     status: str = Field(..., description="Service status")
     models_loaded: bool = Field(..., description="Whether all models are loaded")
     vector_db_connected: bool = Field(..., description="Whether connected to vector database")
+
+
+class JobStatusResponse(BaseModel):
+    """Model for an ingestion job's status"""
+    job_id: str = Field(..., description="ID of the job")
+    kind: str = Field(..., description="Type of job: text or upload")
+    state: str = Field(..., description="queued, running, succeeded or failed")
+    source: Optional[str] = Field(None, description="Source of the document being ingested")
+    chunks_processed: int = Field(0, description="Chunks processed so far")
+    chunks_indexed: int = Field(0, description="Chunks embedded and written so far")
+    chunks_per_second: float = Field(0.0, description="Processing throughput")
+    elapsed_seconds: float = Field(0.0, description="Time spent running so far")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: float = Field(..., description="Submission time (Unix timestamp)")
+    started_at: Optional[float] = Field(None, description="Start time (Unix timestamp)")
+    finished_at: Optional[float] = Field(None, description="Completion time (Unix timestamp)")
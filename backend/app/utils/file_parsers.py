@@ -2,9 +2,24 @@
 File parser utilities for handling different file types in the Medical RAG system.
 """
 
+import io
 import os
+import codecs
+import shutil
+import asyncio
+import tempfile
 import mimetypes
-from typing import Dict, Any, Optional
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Dict, Any, BinaryIO, Deque, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+# Bytes read from a spooled upload at a time
+DECODE_BLOCK_SIZE = 64 * 1024
+
+# Pages extracted per task sent to a worker process
+PDF_PAGES_PER_TASK = 8
 
 
 async def parse_file(file_content: bytes, file_name: str) -> Dict[str, Any]:
@@ -27,17 +42,9 @@ async def parse_file(file_content: bytes, file_name: str) -> Dict[str, Any]:
     if file_extension in ['.txt', '.md'] or mime_type == 'text/plain':
         return await parse_text_file(file_content, file_name)
     
-    # PDF files - in a real implementation, we'd use a PDF parsing library
-    # For demonstration purposes, we'll just return placeholder content
+    # PDF files
     elif file_extension == '.pdf' or mime_type == 'application/pdf':
-        return {
-            "content": f"This is placeholder content for PDF file: {file_name}. In a real implementation, this would use a PDF parser.",
-            "metadata": {
-                "source": file_name,
-                "file_type": "pdf",
-                "mime_type": mime_type
-            }
-        }
+        return await parse_pdf_file(file_content, file_name)
     
     # Default case - try to decode as text
     else:
@@ -97,8 +104,262 @@ async def parse_text_file(file_content: bytes, file_name: str) -> Dict[str, Any]
     }
 
 
+def count_decoded_chars(file_obj: BinaryIO, encoding: str, block_size: int = DECODE_BLOCK_SIZE) -> Optional[int]:
+    """
+    Check that a file decodes cleanly, reading it block by block.
+    
+    Args:
+        file_obj (BinaryIO): Seekable binary file
+        encoding (str): Encoding to check
+        block_size (int): Bytes read at a time
+        
+    Returns:
+        Optional[int]: Number of decoded characters, or None if the file does not decode
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    char_count = 0
+    file_obj.seek(0)
+    try:
+        while True:
+            block = file_obj.read(block_size)
+            char_count += len(decoder.decode(block, final=not block))
+            if not block:
+                return char_count
+    except UnicodeDecodeError:
+        return None
+
+
+def iter_decoded_text(file_obj: BinaryIO, encoding: str, block_size: int = DECODE_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Lazily decode a file with an incremental decoder, so multi-byte characters
+    split across blocks are handled and only one block is in memory at a time.
+    
+    Args:
+        file_obj (BinaryIO): Seekable binary file
+        encoding (str): Encoding of the file
+        block_size (int): Bytes read at a time
+        
+    Yields:
+        str: Consecutive pieces of the decoded text
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    file_obj.seek(0)
+    while True:
+        block = file_obj.read(block_size)
+        text = decoder.decode(block, final=not block)
+        if text:
+            yield text
+        if not block:
+            return
+
+
+async def parse_file_stream(file_obj: BinaryIO, file_name: str, pool: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Parse a file that is spooled to disk without loading it into memory.
+    
+    Works like parse_file, except that the returned content is a lazy iterator
+    of text pieces decoded from `file_obj` as it is consumed, e.g. by
+    iter_document_chunks. PDFs are returned with lazy "pages" instead (see
+    parse_pdf_stream). The file must stay open until the content is consumed.
+    
+    Args:
+        file_obj (BinaryIO): Seekable binary file holding the upload
+        file_name (str): Name of the file with extension
+        pool (Optional[Executor]): Process pool for extracting PDF pages in parallel
+        
+    Returns:
+        Dict[str, Any]: Dictionary with lazily decoded content and metadata
+    """
+    file_extension = os.path.splitext(file_name.lower())[1]
+    mime_type, _ = mimetypes.guess_type(file_name)
+    is_text = file_extension in ['.txt', '.md'] or mime_type == 'text/plain'
+    
+    if not is_text and (file_extension == '.pdf' or mime_type == 'application/pdf'):
+        return await parse_pdf_stream(file_obj, file_name, pool=pool)
+    
+    # Validate the encoding in a first pass, since the content cannot be
+    # re-decoded once the chunker has consumed part of it
+    encoding = 'utf-8'
+    char_count = await asyncio.to_thread(count_decoded_chars, file_obj, encoding)
+    
+    if char_count is None and is_text:
+        # Latin-1 decodes any byte sequence, one character per byte
+        encoding = 'latin-1'
+        file_obj.seek(0, os.SEEK_END)
+        char_count = file_obj.tell()
+    
+    if char_count is None:
+        return {
+            "content": f"Unable to extract text from {file_name}. File type not supported.",
+            "metadata": {
+                "source": file_name,
+                "file_type": file_extension.replace('.', ''),
+                "mime_type": mime_type or "application/octet-stream",
+                "error": "Unable to decode file content"
+            }
+        }
+    
+    if is_text:
+        metadata = {
+            "source": file_name,
+            "file_type": "text",
+            "mime_type": "text/plain",
+            "char_count": char_count
+        }
+    else:
+        metadata = {
+            "source": file_name,
+            "file_type": file_extension.replace('.', ''),
+            "mime_type": mime_type or "application/octet-stream"
+        }
+    
+    return {
+        "content": iter_decoded_text(file_obj, encoding),
+        "metadata": metadata
+    }
+
+
+def extract_pdf_page_texts(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of a range of PDF pages; the unit of work sent to a worker process.
+    
+    Args:
+        file_path (str): Path of the PDF file
+        start (int): Index of the first page
+        stop (int): Index after the last page
+        
+    Returns:
+        List[str]: Text of each page in the range
+    """
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages(
+    file_obj: BinaryIO,
+    pool: Optional[Executor] = None,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+    max_in_flight: int = 8
+) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily extract the text of every page of a PDF, in page order.
+    
+    Without a pool, pages are extracted one at a time in the calling thread.
+    With a pool, ranges of `pages_per_task` pages are extracted in worker
+    processes, with at most `max_in_flight` ranges outstanding so pages are
+    never extracted far ahead of the consumer. Workers read the PDF from a
+    path, so a file object without one is first copied to a temporary file.
+    
+    Args:
+        file_obj (BinaryIO): Seekable binary PDF file
+        pool (Optional[Executor]): Process pool for parallel extraction
+        pages_per_task (int): Number of pages per task sent to a worker
+        max_in_flight (int): Maximum number of submitted, unfinished tasks
+        
+    Yields:
+        Tuple[int, str]: 1-based page number and the page's text
+    """
+    file_obj.seek(0)
+    reader = PdfReader(file_obj)
+    page_count = len(reader.pages)
+    
+    if pool is None:
+        for i in range(page_count):
+            yield i + 1, reader.pages[i].extract_text() or ""
+        return
+    
+    file_path = getattr(file_obj, "name", None)
+    temporary_path = None
+    if not isinstance(file_path, str) or not os.path.exists(file_path):
+        file_obj.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            shutil.copyfileobj(file_obj, f)
+        file_path = temporary_path = f.name
+    
+    in_flight: Deque[Tuple[int, Future]] = deque()
+    try:
+        for start in range(0, page_count, pages_per_task):
+            stop = min(start + pages_per_task, page_count)
+            in_flight.append((start, pool.submit(extract_pdf_page_texts, file_path, start, stop)))
+            
+            # Wait for the oldest range so pages come out in order
+            while len(in_flight) >= max_in_flight:
+                first_page, future = in_flight.popleft()
+                for offset, text in enumerate(future.result()):
+                    yield first_page + offset + 1, text
+        
+        while in_flight:
+            first_page, future = in_flight.popleft()
+            for offset, text in enumerate(future.result()):
+                yield first_page + offset + 1, text
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        if temporary_path is not None:
+            os.remove(temporary_path)
+
+
+async def parse_pdf_stream(file_obj: BinaryIO, file_name: str, pool: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Parse a PDF without extracting it up front.
+    
+    The returned document has empty content and a lazy "pages" iterator of
+    (page number, text) pairs, which iter_document_chunks chunks page by page
+    so every chunk records its page number.
+    
+    Args:
+        file_obj (BinaryIO): Seekable binary PDF file
+        file_name (str): Name of the file
+        pool (Optional[Executor]): Process pool for parallel page extraction
+        
+    Returns:
+        Dict[str, Any]: Dictionary with lazy pages and metadata
+    """
+    def count_pages() -> int:
+        file_obj.seek(0)
+        return len(PdfReader(file_obj).pages)
+    
+    page_count = await asyncio.to_thread(count_pages)
+    
+    return {
+        "content": "",
+        "pages": iter_pdf_pages(file_obj, pool=pool),
+        "metadata": {
+            "source": file_name,
+            "file_type": "pdf",
+            "mime_type": "application/pdf",
+            "page_count": page_count
+        }
+    }
+
+
+async def parse_pdf_file(file_content: bytes, file_name: str) -> Dict[str, Any]:
+    """
+    Parse a PDF file held in memory and extract the text of every page.
+    
+    Args:
+        file_content (bytes): Raw file content
+        file_name (str): Name of the file
+        
+    Returns:
+        Dict[str, Any]: Dictionary with the pages' text, joined by blank lines, and metadata
+    """
+    pages = await asyncio.to_thread(lambda: list(iter_pdf_pages(io.BytesIO(file_content))))
+    content = "\n\n".join(text for _, text in pages)
+    
+    return {
+        "content": content,
+        "metadata": {
+            "source": file_name,
+            "file_type": "pdf",
+            "mime_type": "application/pdf",
+            "page_count": len(pages),
+            "char_count": len(content)
+        }
+    }
+
+
 # Note: In a real implementation, you would include parsers for other file types:
-# - parse_pdf_file: using PyPDF2, pdfminer, or similar
 # - parse_docx_file: using python-docx
 # - parse_image_file: using OCR with pytesseract
 # These are omitted here to keep dependencies minimal
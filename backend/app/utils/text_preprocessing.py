@@ -3,9 +3,133 @@ Text preprocessing utilities for the Medical RAG system.
 These functions help clean and normalize medical text data before indexing.
 """
 
+import os
 import re
 import unicodedata
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict
+
+
+# Dosing abbreviations expanded by default
+DOSING_ABBREVIATIONS: Dict[str, str] = {
+    "b.i.d": "twice daily",
+    "t.i.d": "three times daily",
+    "q.i.d": "four times daily",
+}
+
+# Larger opt-in table of common prescription and route abbreviations
+MEDICAL_ABBREVIATIONS: Dict[str, str] = {
+    **DOSING_ABBREVIATIONS,
+    "b.d": "twice daily",
+    "t.d.s": "three times daily",
+    "q.d.s": "four times daily",
+    "q.d": "once daily",
+    "q.o.d": "every other day",
+    "q.a.m": "every morning",
+    "q.p.m": "every evening",
+    "q.h.s": "at bedtime",
+    "h.s": "at bedtime",
+    "o.n": "every night",
+    "q.h": "every hour",
+    "q2h": "every 2 hours",
+    "q4h": "every 4 hours",
+    "q6h": "every 6 hours",
+    "q8h": "every 8 hours",
+    "q12h": "every 12 hours",
+    "q24h": "every 24 hours",
+    "q.w": "once weekly",
+    "t.i.w": "three times a week",
+    "p.r.n": "as needed",
+    "a.c": "before meals",
+    "p.c": "after meals",
+    "p.o": "by mouth",
+    "n.p.o": "nothing by mouth",
+    "s.l": "sublingually",
+    "i.v": "intravenously",
+    "i.m": "intramuscularly",
+    "s.c": "subcutaneously",
+    "s.q": "subcutaneously",
+    "p.r": "rectally",
+    "p.v": "vaginally",
+    "i.n": "intranasally",
+}
+
+_URL_PATTERN = re.compile(r'https?://\S+')
+
+
+class TextCleaner:
+    """
+    Precompiled text cleaner.
+    
+    Performs the same steps as the original chain of regex passes, in the same
+    order, with the fewest scans possible: ASCII text skips unicode
+    normalization, whitespace is collapsed with str.split/str.join, all
+    abbreviations are expanded by a single table-driven regex, and the URL
+    pattern only runs when the text contains "://".
+    """
+    
+    def __init__(self, abbreviations: Dict[str, str]):
+        self.abbreviations = dict(abbreviations)
+        
+        # One named group per abbreviation, so a match maps straight to its expansion
+        # even for case-insensitive matches that do not lowercase back to the key
+        keys = sorted(self.abbreviations, key=len, reverse=True)
+        self._expansions = {f"a{i}": self.abbreviations[key] for i, key in enumerate(keys)}
+        alternatives = "|".join(f"(?P<a{i}>{re.escape(key)})" for i, key in enumerate(keys))
+        self._abbreviation_pattern = re.compile(rf'(?<!\w)(?:{alternatives})(?!\w)', re.IGNORECASE) if keys else None
+    
+    def _expand(self, match: re.Match) -> str:
+        return self._expansions[match.lastgroup]
+    
+    def clean(self, text: str) -> str:
+        """
+        Clean text by removing extra whitespace, normalizing unicode characters,
+        and fixing common OCR issues in medical texts.
+        
+        Args:
+            text (str): Text to clean
+            
+        Returns:
+            str: Cleaned text
+        """
+        if not text:
+            return ""
+        
+        # Normalize unicode (ASCII is already in NFKC form)
+        if not text.isascii():
+            text = unicodedata.normalize('NFKC', text)
+        
+        # Fix common OCR errors in medical text
+        text = text.replace("rn", "m")  # Common OCR mistake
+        
+        # Replace runs of whitespace with a single space; leading and trailing
+        # whitespace would be stripped at the end anyway
+        text = " ".join(text.split())
+        
+        # Expand medical abbreviations
+        if self._abbreviation_pattern is not None:
+            text = self._abbreviation_pattern.sub(self._expand, text)
+        
+        # Remove URLs (often not useful in medical context)
+        if "://" in text:
+            text = _URL_PATTERN.sub('', text)
+        
+        return text.strip()
+
+
+@lru_cache(maxsize=1)
+def get_text_cleaner() -> TextCleaner:
+    """
+    Return the shared text cleaner.
+    Set ABBREVIATION_TABLE=extended to expand the full MEDICAL_ABBREVIATIONS table
+    instead of only the dosing abbreviations.
+    
+    Returns:
+        TextCleaner: The configured cleaner
+    """
+    if os.getenv("ABBREVIATION_TABLE", "dosing") == "extended":
+        return TextCleaner(MEDICAL_ABBREVIATIONS)
+    return TextCleaner(DOSING_ABBREVIATIONS)
 
 
 def clean_text(text: str) -> str:
@@ -19,28 +143,7 @@ def clean_text(text: str) -> str:
     Returns:
         str: Cleaned text
     """
-    if not text:
-        return ""
-    
-    # Normalize unicode
-    text = unicodedata.normalize('NFKC', text)
-    
-    # Fix common OCR errors in medical text
-    text = text.replace("rn", "m")  # Common OCR mistake
-    text = re.sub(r'(\d)l', r'\1l', text)  # Fix 1l -> 11 issue
-    
-    # Replace multiple spaces with single space
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Fix common medical abbreviations
-    text = re.sub(r'\bb\.i\.d\b', 'twice daily', text, flags=re.IGNORECASE)
-    text = re.sub(r'\bt\.i\.d\b', 'three times daily', text, flags=re.IGNORECASE)
-    text = re.sub(r'\bq\.i\.d\b', 'four times daily', text, flags=re.IGNORECASE)
-    
-    # Remove URLs (often not useful in medical context)
-    text = re.sub(r'https?://\S+', '', text)
-    
-    return text.strip()
+    return get_text_cleaner().clean(text)
 
 
 def extract_medical_entities(text: str) -> Dict[str, List[str]]:
@@ -73,31 +176,3 @@ def extract_medical_entities(text: str) -> Dict[str, List[str]]:
         entities["measurements"] = measurement_matches
     
     return entities
-
-
-def preprocess_medical_document(document: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Preprocess a medical document by cleaning the text and extracting entities.
-    
-    Args:
-        document (Dict[str, Any]): Document with content and metadata
-        
-    Returns:
-        Dict[str, Any]: Preprocessed document with cleaned content and extracted entities
-    """
-    content = document.get("content", "")
-    metadata = document.get("metadata", {})
-    
-    # Clean the text
-    cleaned_content = clean_text(content)
-    
-    # Extract medical entities
-    entities = extract_medical_entities(cleaned_content)
-    
-    # Add extracted entities to metadata
-    metadata["extracted_entities"] = entities
-    
-    return {
-        "content": cleaned_content,
-        "metadata": metadata
-    }
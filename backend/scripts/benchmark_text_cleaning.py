@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark comparing the precompiled text cleaner with the original
+chained-regex implementation of clean_text on the sample medical data.
+"""
+
+import os
+import re
+import sys
+import json
+import timeit
+import argparse
+import logging
+import unicodedata
+
+# Add parent directory to path to allow importing app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.text_preprocessing import clean_text
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('text_cleaning_benchmark')
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'sample_medical_data.json')
+
+
+def legacy_clean_text(text: str) -> str:
+    """The original clean_text implementation, kept as the reference"""
+    if not text:
+        return ""
+
+    text = unicodedata.normalize('NFKC', text)
+    text = text.replace("rn", "m")
+    text = re.sub(r'(\d)l', r'\1l', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\bb\.i\.d\b', 'twice daily', text, flags=re.IGNORECASE)
+    text = re.sub(r'\bt\.i\.d\b', 'three times daily', text, flags=re.IGNORECASE)
+    text = re.sub(r'\bq\.i\.d\b', 'four times daily', text, flags=re.IGNORECASE)
+    text = re.sub(r'https?://\S+', '', text)
+    return text.strip()
+
+
+def load_texts(file_path):
+    """
+    Load document texts from a JSON file in the sample data format.
+
+    Args:
+        file_path (str): Path to the JSON file
+    """
+    with open(file_path, 'r') as f:
+        return [item["text"] for item in json.load(f) if isinstance(item, dict) and "text" in item]
+
+
+def benchmark(func, texts, repeat, number):
+    """
+    Return the best time, in seconds, to clean every text `number` times.
+
+    Args:
+        func (callable): Cleaning function
+        texts (list): Texts to clean
+        repeat (int): Number of timing runs
+        number (int): Passes over the texts per run
+    """
+    return min(timeit.repeat(lambda: [func(text) for text in texts], repeat=repeat, number=number))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark clean_text against the original implementation')
+    parser.add_argument('--data', default=DEFAULT_DATA, help='JSON file with a "text" field per item')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timing runs (best is reported)')
+    parser.add_argument('--number', type=int, default=2000, help='Passes over the data per run')
+    args = parser.parse_args()
+
+    texts = load_texts(args.data)
+    total_chars = sum(len(text) for text in texts)
+    logger.info(f"Loaded {len(texts)} documents ({total_chars} characters) from {args.data}")
+
+    # The new cleaner must be a drop-in replacement
+    for i, text in enumerate(texts):
+        if clean_text(text) != legacy_clean_text(text):
+            logger.error(f"Output differs from the original implementation for document {i}")
+            sys.exit(1)
+    logger.info("Outputs are identical to the original implementation")
+
+    legacy_time = benchmark(legacy_clean_text, texts, args.repeat, args.number)
+    new_time = benchmark(clean_text, texts, args.repeat, args.number)
+    megabytes = total_chars * args.number / 1e6
+
+    logger.info(f"original: {legacy_time:.3f}s ({megabytes / legacy_time:.1f} MB/s)")
+    logger.info(f"compiled: {new_time:.3f}s ({megabytes / new_time:.1f} MB/s)")
+    logger.info(f"speedup:  {legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,14 @@ import sys
 import json
 import argparse
 import logging
+import itertools
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterator, Tuple
 
 # Add parent directory to path to allow importing app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.core.document_processor import process_document
-from app.database.vector_store import init_vector_store
-from app.utils.text_preprocessing import preprocess_medical_document
+from app.core.ingestion import IngestionStats, run_ingestion_pipeline
 
 # Configure logging
 logging.basicConfig(
@@ -26,16 +25,16 @@ logging.basicConfig(
 logger = logging.getLogger('data_ingestion')
 
 
-async def ingest_json_data(file_path: str, category: str = "general") -> List[Dict[str, Any]]:
+def iter_json_documents(file_path: str, category: str = "general") -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    Ingest data from a JSON file with medical information.
+    Read documents from a JSON file with medical information.
     
     Args:
         file_path (str): Path to the JSON file
         category (str): Category to assign to the documents
         
-    Returns:
-        List[Dict[str, Any]]: List of processed documents
+    Yields:
+        Tuple[str, Dict[str, Any]]: A stable document key and the raw document
     """
     logger.info(f"Ingesting data from {file_path}")
     
@@ -44,92 +43,73 @@ async def ingest_json_data(file_path: str, category: str = "general") -> List[Di
             data = json.load(f)
     except Exception as e:
         logger.error(f"Error reading JSON file: {e}")
-        return []
+        return
     
-    processed_docs = []
+    source = os.path.basename(file_path)
     
-    # Process each item in the JSON data
     for i, item in enumerate(data):
         # Check if the item has the required fields
         if not isinstance(item, dict) or "text" not in item:
             logger.warning(f"Skipping item {i}: missing required fields")
             continue
-            
-        # Create a document with metadata
-        document = {
+        
+        item_id = item.get("id", f"item_{i}")
+        
+        # Create a document with metadata; preprocessing happens in the pipeline
+        yield f"{source}:{item_id}", {
             "content": item["text"],
             "metadata": {
-                "source": os.path.basename(file_path),
-                "id": item.get("id", f"item_{i}"),
+                "source": source,
+                "id": item_id,
                 "category": category,
                 "tags": item.get("tags", []),
                 "title": item.get("title", f"Medical Document {i}")
             }
         }
-        
-        # Preprocess the document
-        preprocessed = preprocess_medical_document(document)
-        
-        # Process document into chunks
-        try:
-            docs = await process_document(preprocessed)
-            processed_docs.extend(docs)
-            logger.info(f"Processed item {i} into {len(docs)} chunks")
-        except Exception as e:
-            logger.error(f"Error processing item {i}: {e}")
-    
-    return processed_docs
 
 
-async def ingest_text_directory(directory_path: str, category: str = "general") -> List[Dict[str, Any]]:
+def iter_text_documents(directory_path: str, category: str = "general") -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    Ingest all text files from a directory.
+    Read all text files from a directory, one at a time.
     
     Args:
         directory_path (str): Path to the directory containing text files
         category (str): Category to assign to the documents
         
-    Returns:
-        List[Dict[str, Any]]: List of processed documents
+    Yields:
+        Tuple[str, Dict[str, Any]]: A stable document key and the raw document
     """
     logger.info(f"Ingesting text files from {directory_path}")
     
     dir_path = Path(directory_path)
     if not dir_path.is_dir():
         logger.error(f"Directory not found: {directory_path}")
-        return []
-    
-    processed_docs = []
+        return
     
-    # Process each text file in the directory
-    for file_path in dir_path.glob("*.txt"):
+    for file_path in sorted(dir_path.glob("*.txt")):
         try:
-            # Read the file content
             with open(file_path, 'r') as f:
                 content = f.read()
-                
-            # Create a document with metadata
-            document = {
-                "content": content,
-                "metadata": {
-                    "source": file_path.name,
-                    "category": category,
-                    "title": file_path.stem
-                }
-            }
-            
-            # Preprocess the document
-            preprocessed = preprocess_medical_document(document)
-            
-            # Process document into chunks
-            docs = await process_document(preprocessed)
-            processed_docs.extend(docs)
-            logger.info(f"Processed {file_path.name} into {len(docs)} chunks")
-            
         except Exception as e:
-            logger.error(f"Error processing {file_path.name}: {e}")
-    
-    return processed_docs
+            logger.error(f"Error reading {file_path.name}: {e}")
+            continue
+        
+        yield f"{dir_path.name}/{file_path.name}", {
+            "content": content,
+            "metadata": {
+                "source": file_path.name,
+                "category": category,
+                "title": file_path.stem
+            }
+        }
+
+
+def log_progress(stats: IngestionStats) -> None:
+    """Log pipeline progress after each upsert batch"""
+    logger.info(
+        f"Indexed {stats.documents_processed} documents ({stats.chunks_processed} chunks, "
+        f"{stats.chunks_written} new) - {stats.documents_per_second:.1f} docs/sec"
+    )
 
 
 async def main():
@@ -141,32 +121,52 @@ async def main():
     parser.add_argument("--category", default="general", help="Category for the documents")
     parser.add_argument("--collection", default="medical_documents", 
                       help="Name of the collection to add documents to")
+    parser.add_argument("--batch-size", type=int, default=64,
+                      help="Number of chunks per embedding batch")
+    parser.add_argument("--upsert-batch-size", type=int, default=256,
+                      help="Number of chunks per vector store upsert")
+    parser.add_argument("--queue-size", type=int, default=4,
+                      help="Maximum number of batches buffered between pipeline stages")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PREPROCESS_WORKERS", "0")),
+                      help="Number of processes for preprocessing and chunking "
+                           "(default: PREPROCESS_WORKERS, 0 = in-process)")
+    parser.add_argument("--checkpoint",
+                      help="Checkpoint file; documents recorded there are skipped, so a crashed run can be resumed")
     
     args = parser.parse_args()
     
     # Set the collection name environment variable
     os.environ["COLLECTION_NAME"] = args.collection
     
-    processed_docs = []
-    
-    # Process JSON data if provided
+    sources = []
     if args.json:
-        json_docs = await ingest_json_data(args.json, args.category)
-        processed_docs.extend(json_docs)
-    
-    # Process text files if directory is provided
+        sources.append(iter_json_documents(args.json, args.category))
     if args.text_dir:
-        text_docs = await ingest_text_directory(args.text_dir, args.category)
-        processed_docs.extend(text_docs)
+        sources.append(iter_text_documents(args.text_dir, args.category))
+    
+    if not sources:
+        logger.error("No input provided. Please pass --json and/or --text-dir.")
+        return
     
-    if not processed_docs:
+    stats = await run_ingestion_pipeline(
+        itertools.chain(*sources),
+        embed_batch_size=args.batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        queue_size=args.queue_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        progress_callback=log_progress
+    )
+    
+    if stats.documents_processed == 0 and stats.documents_skipped == 0:
         logger.error("No documents were processed. Please provide valid input data.")
         return
     
-    # Add documents to vector store
-    logger.info(f"Adding {len(processed_docs)} documents to vector store collection '{args.collection}'")
-    await init_vector_store(processed_docs)
-    logger.info("Ingestion complete")
+    logger.info(
+        f"Ingestion complete: {stats.documents_processed} documents, {stats.chunks_written} chunks written "
+        f"to collection '{args.collection}', {stats.documents_skipped} skipped from checkpoint "
+        f"({stats.elapsed:.1f}s, {stats.documents_per_second:.1f} docs/sec)"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the lexical (BM25) index from the chunks stored in the vector store.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add parent directory to path to allow importing app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.vector_store import rebuild_lexical_index
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('lexical_index')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rebuild the lexical index from the vector store")
+    parser.add_argument("--collection", default="medical_documents",
+                      help="Name of the collection to index")
+    parser.add_argument("--output", default=os.getenv("LEXICAL_INDEX_PATH", "cache/lexical_index.npz"),
+                      help="Path of the index file")
+    parser.add_argument("--batch-size", type=int, default=256,
+                      help="Number of points fetched per request")
+
+    args = parser.parse_args()
+
+    os.environ["COLLECTION_NAME"] = args.collection
+    os.environ["LEXICAL_INDEX_PATH"] = args.output
+
+    indexed = await rebuild_lexical_index(batch_size=args.batch_size)
+    logger.info(f"Indexed {indexed} chunks of collection '{args.collection}' into {args.output}")
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(main())
@@ -1,7 +1,7 @@
 import os
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Set test environment variables
 os.environ["EMBEDDINGS_MODEL"] = "test-embedding-model"
@@ -9,12 +9,14 @@ os.environ["MODEL_PATH"] = "test-model-path"
 os.environ["QDRANT_HOST"] = "localhost"
 os.environ["QDRANT_PORT"] = "6333"
 os.environ["COLLECTION_NAME"] = "test_collection"
+# Collection versions stay in the test process
+os.environ["COLLECTION_VERSION_PATH"] = ""
 
 # Import after environment variables are set
 from app.main import app
 from app.core.embeddings import get_embeddings_model
 from app.core.llm import get_llm_model
-from app.database.vector_store import get_vector_store
+from app.database.vector_store import get_qdrant_backend
 
 
 @pytest.fixture
@@ -42,16 +44,38 @@ def mock_llm():
 
 @pytest.fixture
 def mock_vector_store():
-    with patch("app.database.vector_store.get_vector_store") as mock:
+    with patch("app.database.vector_store.get_qdrant_backend") as mock:
         store = MagicMock()
-        store.similarity_search_with_score.return_value = [
-            (
-                MagicMock(
-                    page_content="Mock document content",
-                    metadata={"source": "test.pdf", "page": 1}
-                ),
-                0.95
-            )
-        ]
+        store.search = AsyncMock(return_value=[
+            ("Mock document content", {"source": "test.pdf", "page": 1}, 0.95)
+        ])
         mock.return_value = store
         yield mock
+
+
+@pytest.fixture
+def make_pdf():
+    """Return a builder for small text PDFs"""
+    def make_pdf(page_texts):
+        """Build a minimal PDF with one line of Helvetica text per page"""
+        objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+        kids = []
+        for text in page_texts:
+            stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+            objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+            objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+            kids.append(f"{len(objects)} 0 R")
+        objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+        
+        pdf = b"%PDF-1.4\n"
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(pdf))
+            pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+        xref = len(pdf)
+        pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+        pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        return pdf
+    
+    return make_pdf
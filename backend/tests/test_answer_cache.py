@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core.answer_cache import SemanticAnswerCache, answer_with_cache, make_source_key
+from app.database.collection_version import CollectionVersionStore
+
+
+def vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_exact_and_semantic_hits():
+    """Test exact matches, near-identical queries and the source set requirement"""
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    sources = make_source_key(["Doc A", "Doc B"])
+    cache.store("What is metformin?", vector(1, 0, 0), sources, 0, "A biguanide.")
+    
+    # Normalized exact match, even with a different embedding
+    assert cache.lookup("What is  metformin?", vector(0, 1, 0), sources, 0) == "A biguanide."
+    
+    # Similar embedding over the same (reordered) documents
+    assert cache.lookup("Explain metformin", vector(0.99, 0.1, 0), make_source_key(["Doc B", "Doc A"]), 0) == "A biguanide."
+    
+    # Similar embedding but different documents
+    assert cache.lookup("Explain metformin", vector(0.99, 0.1, 0), make_source_key(["Doc C"]), 0) is None
+    
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_ttl_lru_and_invalidation():
+    """Test that entries expire, the least recently used entry is evicted and a new collection version clears the cache"""
+    sources = make_source_key(["Doc"])
+    
+    expiring = SemanticAnswerCache(ttl_seconds=-1)
+    expiring.store("q", vector(1, 0), sources, 0, "answer")
+    assert expiring.lookup("q", vector(1, 0), sources, 0) is None
+    
+    cache = SemanticAnswerCache(max_items=2)
+    cache.store("first", vector(1, 0), sources, 0, "1")
+    cache.store("second", vector(0, 1), sources, 0, "2")
+    assert cache.lookup("first", vector(1, 0), sources, 0) == "1"
+    cache.store("third", vector(-1, 0), sources, 0, "3")
+    assert cache.lookup("second", vector(0, 1), sources, 0) is None
+    assert cache.lookup("first", vector(1, 0), sources, 0) == "1"
+    
+    # Answers generated before the collection changed are not reused, or stored
+    assert cache.lookup("first", vector(1, 0), sources, 1) is None
+    cache.store("stale", vector(1, 0), sources, 0, "old")
+    assert cache.stats()["items"] == 0
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_answer_with_cache_skips_generation_on_hit():
+    """Test that a repeated question is answered without generating"""
+    generate = AsyncMock(return_value="Generated answer")
+    
+    with patch.dict(os.environ, {"ANSWER_CACHE_ENABLED": "true"}), \
+         patch("app.core.answer_cache.get_answer_cache", return_value=SemanticAnswerCache()), \
+         patch("app.core.answer_cache.embed_text", AsyncMock(return_value=vector(0.3, 0.4))):
+        first = await answer_with_cache("Dose of aspirin?", ["Doc"], generate)
+        second = await answer_with_cache("Dose of aspirin?", ["Doc"], generate)
+    
+    assert first == ("Generated answer", False)
+    assert second == ("Generated answer", True)
+    generate.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_answers_are_dropped_when_another_process_changes_the_collection(tmp_path):
+    """Test that a version bump from another process and changed chunk text both miss"""
+    generate = AsyncMock(return_value="Generated answer")
+    path = str(tmp_path / "versions.sqlite")
+    other_process = CollectionVersionStore(path)
+    
+    with patch.dict(os.environ, {"ANSWER_CACHE_ENABLED": "true"}), \
+         patch("app.database.vector_store.get_collection_version_store", return_value=CollectionVersionStore(path)), \
+         patch("app.core.answer_cache.get_answer_cache", return_value=SemanticAnswerCache()), \
+         patch("app.core.answer_cache.embed_text", AsyncMock(return_value=vector(0.3, 0.4))):
+        await answer_with_cache("Dose of aspirin?", ["Aspirin 75mg daily."], generate)
+        assert (await answer_with_cache("Dose of aspirin?", ["Aspirin 75mg daily."], generate))[1] is True
+        
+        other_process.bump("test_collection")
+        assert (await answer_with_cache("Dose of aspirin?", ["Aspirin 75mg daily."], generate))[1] is False
+        
+        # Same chunk, new text
+        assert (await answer_with_cache("Dose of aspirin?", ["Aspirin 100mg daily."], generate))[1] is False
+    
+    assert generate.await_count == 3
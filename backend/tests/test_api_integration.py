@@ -1,10 +1,17 @@
+import asyncio
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 import json
 import os
+from dataclasses import replace
 from unittest.mock import patch, MagicMock
 
 from app.main import app
+from app.api.routes import router
+from app.api.upload_limits import UploadSizeLimitMiddleware
+from app.core.jobs import IngestionJobQueue, JobStore
+from app.database.vector_store import SearchHit
 
 
 @pytest.fixture
@@ -23,18 +30,31 @@ async def test_health_endpoint(client):
     assert "vector_db_connected" in data
 
 
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client):
+    """Test that metrics endpoint reports pool and batcher counters"""
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["executors"]) == {"embedding", "generation"}
+    assert "batch_size_histogram" in data["embedding_batcher"]
+
+
 @pytest.mark.asyncio
 async def test_query_endpoint(client):
     """Test query endpoint with mocked functions"""
     with patch("app.api.routes.search_similar_documents") as mock_search, \
-         patch("app.api.routes.generate_response") as mock_generate:
+         patch("app.api.routes.generate_response") as mock_generate, \
+         patch("app.core.context_builder.count_prompt_tokens", side_effect=lambda text: len(text.split())):
         
         # Mock the search and generation functions
-        mock_search.return_value = ["Diabetes symptoms include increased thirst and frequent urination."]
+        mock_search.return_value = [
+            SearchHit("Diabetes symptoms include increased thirst and frequent urination.", 0.82, "diabetes.txt", 0, "Diabetes")
+        ]
         mock_generate.return_value = "Symptoms of diabetes include increased thirst and frequent urination."
         
         # Make the request
-        query = {"query": "What are the symptoms of diabetes?", "max_documents": 3}
+        query = {"query": "What are the symptoms of diabetes?", "max_documents": 3, "min_score": 0.5}
         response = client.post("/api/query", json=query)
         
         # Check response
@@ -43,7 +63,180 @@ async def test_query_endpoint(client):
         assert "answer" in data
         assert "sources" in data
         assert data["answer"] == "Symptoms of diabetes include increased thirst and frequent urination."
-        assert len(data["sources"]) > 0
+        assert data["sources"] == [{
+            "content": "Diabetes symptoms include increased thirst and frequent urination.",
+            "score": 0.82,
+            "source": "diabetes.txt",
+            "chunk": 0,
+            "title": "Diabetes",
+            "page": None,
+            "rrf_score": None,
+            "rerank_score": None
+        }]
+        mock_search.assert_called_once_with("What are the symptoms of diabetes?", k=3, min_score=0.5)
+        mock_generate.assert_called_once_with(
+            "What are the symptoms of diabetes?",
+            ["Diabetes symptoms include increased thirst and frequent urination."]
+        )
+
+
+@pytest.mark.asyncio
+async def test_query_endpoint_only_reports_packed_sources(client, monkeypatch):
+    """Test that chunks left out of the prompt are not reported as sources"""
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "8")
+    hits = [
+        SearchHit("Gout is caused by uric acid crystals.", 0.9, "gout.txt", 0),
+        SearchHit("Uric acid crystals form in the joints when blood levels stay high.", 0.8, "gout.txt", 1),
+        SearchHit("Gout is caused by uric acid crystals.", 0.7, "copy.txt", 0),
+    ]
+    
+    with patch("app.api.routes.search_similar_documents", return_value=hits), \
+         patch("app.api.routes.generate_response", return_value="Uric acid crystals.") as mock_generate, \
+         patch("app.core.context_builder.count_prompt_tokens", side_effect=lambda text: len(text.split())):
+        
+        response = client.post("/api/query", json={"query": "What causes gout?"})
+        
+        assert response.status_code == 200
+        # The second chunk does not fit the budget and the third repeats the first
+        assert [source["source"] for source in response.json()["sources"]] == ["gout.txt"]
+        assert mock_generate.call_args.args[1] == ["Gout is caused by uric acid crystals."]
+
+
+@pytest.mark.asyncio
+async def test_query_endpoint_returns_503_when_saturated(client):
+    """Test that a saturated model pool is reported as 503"""
+    from app.core.executors import ExecutorSaturatedError
+    
+    with patch("app.api.routes.search_similar_documents") as mock_search:
+        mock_search.side_effect = ExecutorSaturatedError("The embedding pool is saturated, try again later")
+        
+        response = client.post("/api/query", json={"query": "What is hypertension?"})
+        
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_query_batch_endpoint(client, monkeypatch):
+    """Test that batch answers are streamed as NDJSON in completion order"""
+    from app.core.executors import ExecutorSaturatedError
+    monkeypatch.setenv("BATCH_QUERY_CONCURRENCY", "3")
+    
+    async def fake_answer(query, docs, generate):
+        if query == "What is gout?":
+            await asyncio.sleep(0.05)
+        if query == "What is asthma?":
+            raise ExecutorSaturatedError("The generation pool is saturated, try again later")
+        return f"Answer to {query}", False
+    
+    with patch("app.api.routes.search_similar_documents_batch") as mock_search, \
+         patch("app.api.routes.answer_with_cache", side_effect=fake_answer), \
+         patch("app.core.context_builder.count_prompt_tokens", side_effect=lambda text: len(text.split())):
+        
+        mock_search.return_value = [
+            [SearchHit("Gout causes joint pain.", 0.9, "gout.txt", 0)],
+            [],
+            [SearchHit("Diabetes raises blood sugar.", 0.8, "diabetes.txt", 1)],
+        ]
+        
+        queries = ["What is gout?", "What is asthma?", "What is diabetes?"]
+        response = client.post("/api/query/batch", json={"queries": queries, "max_documents": 2})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.strip().split("\n")]
+        # The slow first query finishes last
+        assert [line["index"] for line in lines][-1] == 0
+        results = {line["index"]: line for line in lines}
+        assert results[0]["answer"] == "Answer to What is gout?"
+        assert results[0]["sources"][0]["source"] == "gout.txt"
+        assert results[1]["status"] == 503 and results[1]["answer"] is None
+        assert results[2]["query"] == "What is diabetes?" and results[2]["status"] == 200
+        mock_search.assert_called_once_with(queries, k=2, min_score=None)
+
+
+@pytest.mark.asyncio
+async def test_query_batch_endpoint_rejects_large_batches(client, monkeypatch):
+    """Test that batches above BATCH_QUERY_MAX_SIZE are refused"""
+    monkeypatch.setenv("BATCH_QUERY_MAX_SIZE", "2")
+    
+    response = client.post("/api/query/batch", json={"queries": ["a", "b", "c"]})
+    
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_query_endpoint_reranks_candidates(client, monkeypatch):
+    """Test that with reranking enabled, candidates are over-fetched and only the best reach the LLM"""
+    monkeypatch.setenv("RERANK_ENABLED", "true")
+    monkeypatch.setenv("RERANK_CANDIDATES", "10")
+    candidates = [SearchHit(f"Chunk {i} about gout.", 0.9 - i / 100, "gout.txt", i) for i in range(10)]
+    
+    async def fake_rerank(query, hits, top_n):
+        return [replace(hit, rerank_score=float(hit.chunk)) for hit in reversed(hits)][:top_n]
+    
+    with patch("app.api.routes.search_similar_documents", return_value=candidates) as mock_search, \
+         patch("app.api.routes.rerank", side_effect=fake_rerank), \
+         patch("app.api.routes.generate_response", return_value="Gout is treated with allopurinol.") as mock_generate, \
+         patch("app.core.context_builder.count_prompt_tokens", side_effect=lambda text: len(text.split())):
+        
+        response = client.post("/api/query", json={"query": "How is gout treated?", "max_documents": 2})
+        
+        assert response.status_code == 200
+        assert [source["chunk"] for source in response.json()["sources"]] == [9, 8]
+        mock_search.assert_called_once_with("How is gout treated?", k=10, min_score=None)
+        assert sorted(mock_generate.call_args.args[1]) == ["Chunk 8 about gout.", "Chunk 9 about gout."]
+
+
+@pytest.mark.asyncio
+async def test_query_stream_endpoint(client):
+    """Test that the streaming query endpoint emits sources, tokens and done events"""
+    async def fake_tokens():
+        for token in ["Increased", " thirst"]:
+            yield token
+    
+    with patch("app.api.routes.search_similar_documents") as mock_search, \
+         patch("app.api.routes.stream_response") as mock_stream, \
+         patch("app.core.context_builder.count_prompt_tokens", side_effect=lambda text: len(text.split())):
+        
+        mock_search.return_value = [SearchHit("Diabetes symptoms include increased thirst.", 0.8, "diabetes.txt", 2)]
+        mock_stream.return_value = fake_tokens()
+        
+        response = client.post("/api/query/stream", json={"query": "What are the symptoms of diabetes?"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        assert [lines[0] for lines in events] == [
+            "event: sources", "event: token", "event: token", "event: done"
+        ]
+        assert json.loads(events[0][1][len("data: "):]) == {"sources": [{
+            "content": "Diabetes symptoms include increased thirst.",
+            "score": 0.8,
+            "source": "diabetes.txt",
+            "chunk": 2,
+            "title": None,
+            "page": None,
+            "rrf_score": None,
+            "rerank_score": None
+        }]}
+        assert json.loads(events[2][1][len("data: "):]) == {"token": " thirst"}
+
+
+@pytest.mark.asyncio
+async def test_query_stream_endpoint_returns_503_when_saturated(client):
+    """Test that a full generation pool is reported before the event stream starts"""
+    from app.core.executors import ExecutorSaturatedError
+    
+    with patch("app.api.routes.search_similar_documents", return_value=[]), \
+         patch("app.api.routes.stream_response") as mock_stream, \
+         patch("app.core.context_builder.count_prompt_tokens", side_effect=lambda text: len(text.split())):
+        mock_stream.side_effect = ExecutorSaturatedError("The generation pool is saturated, try again later")
+        
+        response = client.post("/api/query/stream", json={"query": "What is gout?"})
+        
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
 
 
 @pytest.mark.asyncio
@@ -105,3 +298,110 @@ async def test_upload_document_endpoint(client, tmp_path):
         data = response.json()
         assert "message" in data
         assert "chunks" in data
+
+
+@pytest.mark.asyncio
+async def test_upload_document_streams_large_files(client):
+    """Test that uploads over the streaming threshold are decoded and chunked incrementally"""
+    received = {}
+    
+    async def fake_index(chunk_batches, replace_sources=False):
+        chunks = [chunk async for batch in chunk_batches for chunk in batch]
+        received["chunks"] = chunks
+        return len(chunks), len(chunks)
+    
+    text = " ".join(f"Patient {i} reports névralgie." for i in range(200))
+    
+    with patch.dict(os.environ, {"STREAMING_MIN_BYTES": "100", "CHUNK_UNIT": "characters"}), \
+         patch("app.api.routes.process_document") as mock_process, \
+         patch("app.api.routes.index_chunk_stream", side_effect=fake_index):
+        response = client.post(
+            "/api/documents",
+            files={"file": ("large.txt", text.encode("utf-8"), "text/plain")},
+            data={"title": "Large Document"}
+        )
+    
+    assert response.status_code == 201
+    mock_process.assert_not_called()
+    assert response.json()["chunks"] == len(received["chunks"]) > 1
+    assert "névralgie" in received["chunks"][0]["page_content"]
+    assert received["chunks"][0]["metadata"]["title"] == "Large Document"
+    assert received["chunks"][0]["metadata"]["file_size"] == len(text.encode("utf-8"))
+
+
+@pytest.mark.asyncio
+async def test_upload_pdf_records_pages(client, make_pdf):
+    """Test that uploaded PDFs are chunked page by page through the streaming path"""
+    received = []
+    
+    async def fake_index(chunk_batches, replace_sources=False):
+        async for batch in chunk_batches:
+            received.extend(batch)
+        return len(received), len(received)
+    
+    with patch.dict(os.environ, {"CHUNK_UNIT": "characters"}), \
+         patch("app.api.routes.index_chunk_stream", side_effect=fake_index):
+        response = client.post(
+            "/api/documents",
+            files={"file": ("guide.pdf", make_pdf(["Asthma overview.", "Inhaler technique."]), "application/pdf")},
+            data={"title": "Asthma Guide"}
+        )
+    
+    assert response.status_code == 201
+    assert response.json()["file_type"] == "pdf"
+    assert [(chunk["metadata"]["page"], chunk["page_content"]) for chunk in received] == [
+        (1, "Asthma overview."), (2, "Inhaler technique.")
+    ]
+    assert received[0]["metadata"]["page_count"] == 2
+
+
+def test_upload_size_limit():
+    """Test that oversized uploads are refused, with or without a Content-Length"""
+    limited_app = FastAPI()
+    limited_app.include_router(router, prefix="/api")
+    limited_app.add_middleware(UploadSizeLimitMiddleware, max_bytes=1000, paths=["/api/documents"])
+    limited_client = TestClient(limited_app)
+    
+    response = limited_client.post(
+        "/api/documents",
+        files={"file": ("big.txt", b"x" * 5000, "text/plain")},
+        data={"title": "Too big"}
+    )
+    assert response.status_code == 413
+    
+    # A chunked body has no Content-Length, so the limit applies while it streams in
+    boundary = "limitboundary"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nToo big\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.txt\"\r\n"
+        f"Content-Type: text/plain\r\n\r\n{'x' * 5000}\r\n--{boundary}--\r\n"
+    ).encode()
+    response = limited_client.post(
+        "/api/documents",
+        content=(body[i:i + 256] for i in range(0, len(body), 256)),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_background_text_job_and_status(client, tmp_path):
+    """Test that background submission returns a job ID that can be polled"""
+    queue = IngestionJobQueue(JobStore(str(tmp_path / "jobs.sqlite")), spool_dir=str(tmp_path / "files"))
+    
+    with patch("app.api.routes.get_job_queue", return_value=queue), \
+         patch("app.api.routes.process_document") as mock_process:
+        response = client.post(
+            "/api/text?background=true",
+            json={"content": "Aspirin is used for pain.", "metadata": {"source": "notes.txt"}}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        mock_process.assert_not_called()
+        
+        status = client.get(f"/api/jobs/{job_id}")
+        assert status.status_code == 200
+        assert status.json()["state"] == "queued"
+        assert status.json()["source"] == "notes.txt"
+        
+        assert client.get("/api/jobs/unknown").status_code == 404
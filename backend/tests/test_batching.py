@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.core.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_a_batch():
+    """Test that concurrent submits are processed in one batch call"""
+    calls = []
+    
+    async def process(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+    
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=5)
+    
+    results = await asyncio.gather(*(batcher.submit(text) for text in ["a", "b", "c"]))
+    
+    assert results == ["A", "B", "C"]
+    assert calls == [["a", "b", "c"]]
+    assert batcher.stats()["batch_size_histogram"] == {3: 1}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_dispatched_without_waiting():
+    """Test that reaching max_batch_size flushes immediately and splits the rest"""
+    calls = []
+    
+    async def process(items):
+        calls.append(list(items))
+        return items
+    
+    batcher = MicroBatcher(process, max_batch_size=2, max_wait_ms=10_000)
+    
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=1
+    )
+    
+    assert results == [0, 1, 2, 3]
+    assert calls == [[0, 1], [2, 3]]
+    assert batcher.stats()["mean_batch_size"] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_caller():
+    """Test that a failing batch raises in every waiting caller"""
+    async def process(items):
+        raise ValueError("encode failed")
+    
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=1)
+    
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+    
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,69 @@
+import pytest
+
+from app.core.context_builder import get_context_token_budget, pack_context, remove_overlap
+from app.core.llm import build_prompt
+from app.database.vector_store import SearchHit
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def test_pack_context_orders_by_score_within_budget():
+    """Test that the best chunks are packed first and oversized ones skipped"""
+    hits = [
+        SearchHit("Metformin lowers hepatic glucose output.", 0.71, "a.txt", 0),
+        SearchHit("Insulin is a peptide hormone made by beta cells in the pancreas.", 0.93, "b.txt", 0),
+        SearchHit("Glucose is a sugar.", 0.52, "c.txt", 0),
+    ]
+    
+    # 12 words + 1 slack, then 5 words + 1 slack + 0 for the separator
+    assert pack_context("q", hits, budget=19, count_tokens=count_words) == ([
+        "Insulin is a peptide hormone made by beta cells in the pancreas.",
+        "Metformin lowers hepatic glucose output.",
+    ], [hits[1], hits[0]])
+    # The second chunk no longer fits, but the smaller third one does
+    assert pack_context("q", hits, budget=18, count_tokens=count_words) == ([
+        "Insulin is a peptide hormone made by beta cells in the pancreas.",
+        "Glucose is a sugar.",
+    ], [hits[1], hits[2]])
+
+
+def test_pack_context_truncates_the_best_chunk_when_nothing_fits():
+    """Test that the top chunk is cut down rather than overflowing the window"""
+    hits = [SearchHit("one two three four five six seven eight", 0.9)]
+    
+    assert pack_context("q", hits, budget=4, count_tokens=count_words) == (["one two three"], hits)
+    assert pack_context("q", hits, budget=1, count_tokens=count_words) == ([], [])
+
+
+def test_remove_overlap_between_neighbouring_chunks():
+    """Test that text repeated by the chunk overlap is only kept once"""
+    first = "Asthma is a chronic disease of the airways. Inhaled steroids reduce inflammation."
+    second = "Inhaled steroids reduce inflammation. Bronchodilators relieve acute symptoms."
+    
+    assert remove_overlap(second, [first]) == "Bronchodilators relieve acute symptoms."
+    assert remove_overlap(first, [second]) == "Asthma is a chronic disease of the airways."
+    assert remove_overlap("Inhaled steroids reduce inflammation.", [first]) == ""
+    assert remove_overlap("Unrelated text about kidney function.", [first]) == "Unrelated text about kidney function."
+    
+    hits = [SearchHit(second, 0.8, "asthma.txt", 1), SearchHit(first, 0.9, "asthma.txt", 0)]
+    assert pack_context("q", hits, budget=100, count_tokens=count_words) == (
+        [first, "Bronchodilators relieve acute symptoms."], [hits[1], hits[0]]
+    )
+    # A chunk fully covered by a better one is not reported as a source
+    hits.append(SearchHit("Inhaled steroids reduce inflammation.", 0.5, "asthma.txt", 2))
+    assert pack_context("q", hits, budget=100, count_tokens=count_words)[1] == [hits[1], hits[0]]
+
+
+def test_context_budget_reserves_generation_tokens(monkeypatch):
+    """Test that the budget leaves room for the template, question and answer"""
+    monkeypatch.setenv("CONTEXT_WINDOW_SIZE", "1000")
+    monkeypatch.setenv("MAX_NEW_TOKENS", "200")
+    monkeypatch.delenv("CONTEXT_TOKEN_BUDGET", raising=False)
+    
+    template_tokens = count_words(build_prompt("What is asthma?", []))
+    assert get_context_token_budget("What is asthma?", count_words) == 1000 - 200 - template_tokens - 1
+    
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "300")
+    assert get_context_token_budget("What is asthma?", count_words) == 300
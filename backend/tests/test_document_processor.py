@@ -1,9 +1,22 @@
+import os
+import re
+import time
+import asyncio
+import threading
+
 import pytest
 from unittest.mock import patch, MagicMock
 
+from concurrent.futures import ThreadPoolExecutor
+
 from app.core.document_processor import (
     chunk_text,
-    process_document
+    chunk_text_by_tokens,
+    iter_document_chunks,
+    split_document,
+    process_document,
+    process_documents_in_pool,
+    stream_document_chunks
 )
 
 
@@ -62,3 +75,175 @@ async def test_process_document():
         assert processed_docs[0]["page_content"] == "This is a medical document about diabetes."
         assert processed_docs[0]["metadata"]["source"] == "test.pdf"
         assert processed_docs[0]["metadata"]["page"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_documents_in_pool_preserves_order():
+    """Test that batched pool processing yields one result per document, in order"""
+    documents = [
+        {"content": f"Patient {i} has hypertension.", "metadata": {"source": f"note_{i}.txt"}}
+        for i in range(7)
+    ]
+    
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = [
+            chunks async for chunks in process_documents_in_pool(documents, pool, batch_size=2, max_in_flight=2)
+        ]
+    
+    assert len(results) == 7
+    assert [chunks[0]["metadata"]["source"] for chunks in results] == [f"note_{i}.txt" for i in range(7)]
+    assert results[3][0]["page_content"] == "Patient 3 has hypertension."
+
+
+class WhitespaceTokenizer:
+    """Minimal stand-in for a fast tokenizer: one token per whitespace-separated word"""
+    
+    def __call__(self, text, **kwargs):
+        return {"offset_mapping": [match.span() for match in re.finditer(r'\S+', text)]}
+
+
+def test_chunk_text_by_tokens_respects_limit_and_offsets():
+    """Test that token chunks stay within the limit and their offsets slice the source text"""
+    text = " ".join(f"Sentence {i} mentions metformin and insulin dosing." for i in range(50))
+    
+    chunks = chunk_text_by_tokens(text, max_tokens=20, overlap_tokens=7, tokenizer=WhitespaceTokenizer())
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.token_count <= 20
+        assert text[chunk.start:chunk.end] == chunk.text
+    
+    # Chunks cover the text from start to end, and consecutive chunks overlap
+    assert chunks[0].start == 0
+    assert chunks[-1].end == len(text)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.start < previous.end
+
+
+def test_chunk_text_by_tokens_splits_long_sentences():
+    """Test that a sentence longer than the limit is cut at token boundaries"""
+    text = " ".join(f"word{i}" for i in range(25))
+    
+    chunks = chunk_text_by_tokens(text, max_tokens=10, overlap_tokens=0, tokenizer=WhitespaceTokenizer())
+    
+    assert [chunk.token_count for chunk in chunks] == [10, 10, 5]
+    assert chunks[1].text.split() == [f"word{i}" for i in range(10, 20)]
+
+
+def test_split_document_by_tokens_records_offsets():
+    """Test token-based splitting adds character offsets to the chunk metadata"""
+    document = {"content": "Aspirin reduces fever. It also thins the blood.", "metadata": {"source": "note.txt"}}
+    
+    with patch.dict(os.environ, {"CHUNK_UNIT": "tokens", "CHUNK_MAX_TOKENS": "4", "CHUNK_OVERLAP_TOKENS": "0"}), \
+            patch("app.core.document_processor.get_chunk_tokenizer", return_value=WhitespaceTokenizer()):
+        chunks = split_document(document)
+    
+    assert [chunk["page_content"] for chunk in chunks] == ["Aspirin reduces fever.", "It also thins the", "blood."]
+    metadata = chunks[1]["metadata"]
+    assert metadata["source"] == "note.txt"
+    assert (metadata["chunk"], metadata["start_char"], metadata["end_char"], metadata["token_count"]) == (1, 23, 40, 4)
+
+
+def test_iter_document_chunks_matches_split_document():
+    """Test that streaming chunking yields the same chunks as split_document, sharing base metadata"""
+    sentences = [f"Patient {i} takes metformin 500 mg b.i.d with meals." for i in range(40)]
+    document = {"content": "  ".join(sentences), "metadata": {"source": "guideline.txt"}}
+    
+    with patch.dict(os.environ, {"CHUNK_UNIT": "characters", "CHUNK_SIZE": "120", "CHUNK_OVERLAP": "60"}):
+        expected = [chunk["page_content"] for chunk in split_document(dict(document, metadata={"source": "guideline.txt"}))]
+        
+        # Content can also arrive as pieces, e.g. read from a file
+        pieces = [document["content"][i:i + 37] for i in range(0, len(document["content"]), 37)]
+        chunks = list(iter_document_chunks(dict(document, content=iter(pieces)), window_size=100))
+    
+    assert [chunk["page_content"] for chunk in chunks] == expected
+    assert [chunk["metadata"]["chunk"] for chunk in chunks] == list(range(len(expected)))
+    assert chunks[0]["metadata"]["source"] == "guideline.txt"
+    # Chunk fields are layered over the base metadata, which is neither copied nor modified
+    assert all(chunk["metadata"].maps[-1] is document["metadata"] for chunk in chunks)
+    assert document["metadata"] == {"source": "guideline.txt"}
+
+
+@pytest.mark.parametrize("settings", [
+    {"CHUNK_UNIT": "characters", "CHUNK_SIZE": "120", "CHUNK_OVERLAP": "40"},
+    {"CHUNK_UNIT": "tokens", "CHUNK_MAX_TOKENS": "12", "CHUNK_OVERLAP_TOKENS": "4"},
+])
+def test_both_chunking_paths_produce_the_same_metadata(settings):
+    """Test that split_document and iter_document_chunks give each chunk the same metadata, entities included"""
+    text = " ".join(
+        f"Patient {i} takes metformin twice a day. Blood pressure was {120 + i} mmHg."
+        for i in range(12)
+    )
+    
+    with patch.dict(os.environ, settings), \
+            patch("app.core.document_processor.get_chunk_tokenizer", return_value=WhitespaceTokenizer()):
+        split = split_document({"content": text, "metadata": {"source": "visit.txt"}})
+        streamed = list(iter_document_chunks({"content": text, "metadata": {"source": "visit.txt"}}))
+    
+    assert len(split) > 1
+    assert [(chunk["page_content"], dict(chunk["metadata"])) for chunk in streamed] == [
+        (chunk["page_content"], chunk["metadata"]) for chunk in split
+    ]
+    # Entities are those of the chunk, not of the whole document
+    assert split[0]["metadata"]["extracted_entities"]["measurements"] != split[-1]["metadata"]["extracted_entities"]["measurements"]
+
+
+@pytest.mark.asyncio
+async def test_stream_document_chunks_batches():
+    """Test that chunks are streamed in batches of the requested size"""
+    document = {"content": " ".join(f"Sentence number {i}." for i in range(30)), "metadata": {"source": "a.txt"}}
+    
+    with patch.dict(os.environ, {"CHUNK_UNIT": "characters", "CHUNK_SIZE": "40", "CHUNK_OVERLAP": "0"}):
+        batches = [batch async for batch in stream_document_chunks(document, batch_size=4)]
+    
+    assert all(len(batch) == 4 for batch in batches[:-1])
+    assert 0 < len(batches[-1]) <= 4
+    assert sum(len(batch) for batch in batches) == 15
+
+
+@pytest.mark.asyncio
+async def test_stream_document_chunks_propagates_cancellation():
+    """Test that cancelling the consumer mid-batch raises CancelledError, not a generator error"""
+    started = threading.Event()
+    closed = []
+    
+    def slow_chunks(document, window_size=None):
+        try:
+            for i in range(10):
+                started.set()
+                time.sleep(0.05)
+                yield {"page_content": f"chunk {i}", "metadata": {}}
+        finally:
+            closed.append(True)
+    
+    async def consume():
+        async for _ in stream_document_chunks({"content": ""}, batch_size=4):
+            pass
+    
+    with patch("app.core.document_processor.iter_document_chunks", side_effect=slow_chunks):
+        task = asyncio.ensure_future(consume())
+        await asyncio.to_thread(started.wait)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    assert closed == [True]
+
+
+def test_iter_document_chunks_records_pages():
+    """Test that paged documents are chunked page by page with their page numbers"""
+    document = {
+        "content": "",
+        "pages": iter([(1, "Asthma is a chronic disease. It affects the airways."), (2, ""), (3, "Inhalers relieve symptoms.")]),
+        "metadata": {"source": "asthma.pdf"}
+    }
+    
+    with patch.dict(os.environ, {"CHUNK_UNIT": "characters", "CHUNK_SIZE": "30", "CHUNK_OVERLAP": "0"}):
+        chunks = list(iter_document_chunks(document))
+    
+    assert [(chunk["metadata"]["page"], chunk["page_content"]) for chunk in chunks] == [
+        (1, "Asthma is a chronic disease."),
+        (1, "It affects the airways."),
+        (3, "Inhalers relieve symptoms.")
+    ]
+    assert [chunk["metadata"]["chunk"] for chunk in chunks] == [0, 1, 2]
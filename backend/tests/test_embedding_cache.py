@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.core.embedding_cache import EmbeddingCache, make_cache_key
+
+
+def test_cache_key_depends_on_model_and_normalized_text():
+    """Test that keys ignore whitespace noise but not the model name"""
+    assert make_cache_key("model-a", "Take  5mg\ndaily ") == make_cache_key("model-a", "Take 5mg daily")
+    assert make_cache_key("model-a", "Take 5mg daily") != make_cache_key("model-b", "Take 5mg daily")
+    # Compatibility characters tokenize differently, so they must not share a key
+    assert make_cache_key("model-a", "Take \uff15mg daily") != make_cache_key("model-a", "Take 5mg daily")
+
+
+def test_memory_tier_is_lru():
+    """Test that the in-memory tier evicts the least recently used entry"""
+    cache = EmbeddingCache(max_memory_items=2)
+    cache.put_many(["a", "b"], [np.ones(3), np.zeros(3)])
+    
+    # Touch "a" so that "b" becomes the eviction candidate
+    cache.get_many(["a"])
+    cache.put_many(["c"], [np.full(3, 2.0)])
+    
+    a, b, c = cache.get_many(["a", "b", "c"])
+    assert a is not None and c is not None
+    assert b is None
+    stats = cache.stats()
+    assert stats["memory_hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Test that vectors written to SQLite are found by a new cache instance"""
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(path=path).put_many(["key"], [np.array([0.5, 0.25], dtype=np.float64)])
+    
+    reopened = EmbeddingCache(path=path)
+    [vector] = reopened.get_many(["key"])
+    
+    assert vector.dtype == np.float32
+    np.testing.assert_array_equal(vector, [0.5, 0.25])
+    assert reopened.stats()["disk_hits"] == 1
+    
+    # Disk hits are promoted into memory
+    reopened.get_many(["key"])
+    assert reopened.stats()["memory_hits"] == 1
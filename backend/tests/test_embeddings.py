@@ -2,7 +2,8 @@ import pytest
 from unittest.mock import patch, MagicMock
 import numpy as np
 
-from app.core.embeddings import get_embeddings_model, embed_text
+from app.core.embeddings import get_embeddings_model, embed_text, embed_documents
+from app.core.embedding_cache import EmbeddingCache
 
 
 @pytest.mark.asyncio
@@ -35,3 +36,29 @@ async def test_embed_text():
         assert isinstance(result, np.ndarray)
         assert result.shape == (768,)
         np.testing.assert_array_equal(result, mock_embedding)
+
+
+@pytest.mark.asyncio
+async def test_embed_documents_only_encodes_cache_misses():
+    """Test that cached texts are not re-encoded"""
+    def fake_encode(texts):
+        if isinstance(texts, str):
+            return np.array([float(len(texts))] * 3)
+        return np.array([[float(len(t))] * 3 for t in texts])
+    
+    with patch("app.core.embeddings.get_embeddings_model") as mock_get_model, \
+         patch("app.core.embeddings.get_embedding_cache") as mock_get_cache:
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = fake_encode
+        mock_get_model.return_value = mock_model
+        mock_get_cache.return_value = EmbeddingCache()
+        
+        first = await embed_documents(["insulin", "metformin", "insulin"])
+        second = await embed_documents(["metformin", "aspirin"])
+        
+        assert [v[0] for v in first] == [7.0, 9.0, 7.0]
+        assert [v[0] for v in second] == [9.0, 7.0]
+        # Duplicates and cached texts are encoded only once
+        assert [call.args[0] for call in mock_model.encode.call_args_list] == [
+            ["insulin", "metformin"], "aspirin"
+        ]
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.executors import BoundedExecutor, ExecutorSaturatedError, ExecutorTimeoutError, ModelPool
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_off_the_event_loop():
+    """Test that work runs on a pool thread and its result is returned"""
+    executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+    
+    result = await executor.run(lambda x, y=0: (threading.current_thread().name, x + y), 1, y=2)
+    
+    assert result[0].startswith("test")
+    assert result[1] == 3
+    assert executor.stats()["completed"] == 1
+    assert executor.stats()["pending"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_rejects_when_saturated():
+    """Test that a full pool fails fast instead of queueing"""
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    
+    running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+    
+    with pytest.raises(ExecutorSaturatedError):
+        await executor.run(release.wait)
+    
+    release.set()
+    await asyncio.gather(*running)
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["pending"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_model_pool_gives_each_worker_its_own_instance():
+    """Test that concurrent requests never share a model instance"""
+    created = []
+    pool = ModelPool("models", factory=lambda: created.append(object()) or created[-1], max_workers=2, max_queue=4)
+    in_use = set()
+    lock = threading.Lock()
+    release = threading.Event()
+    
+    def work(model, deadline):
+        with lock:
+            assert id(model) not in in_use
+            in_use.add(id(model))
+        release.wait()
+        with lock:
+            in_use.discard(id(model))
+        return id(model)
+    
+    running = [asyncio.ensure_future(pool.run(work)) for _ in range(4)]
+    await asyncio.sleep(0.05)
+    release.set()
+    used = await asyncio.gather(*running)
+    
+    assert len(created) == 2
+    assert set(used) == {id(model) for model in created}
+    stats = pool.stats()
+    assert stats["instances_loaded"] == 2
+    assert stats["completed"] == 4
+    assert stats["avg_queue_wait_ms"] > 0
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_model_pool_is_fifo_and_times_out_queued_requests():
+    """Test that requests run in order and expire while waiting in the queue"""
+    pool = ModelPool("models", factory=object, max_workers=1, max_queue=4, timeout=0.2)
+    order = []
+    release = threading.Event()
+    
+    blocker = asyncio.ensure_future(pool.run(lambda model, deadline: release.wait()))
+    await asyncio.sleep(0)
+    queued = [asyncio.ensure_future(pool.run(lambda model, deadline, i=i: order.append(i))) for i in range(3)]
+    await asyncio.sleep(0.3)
+    release.set()
+    
+    await blocker
+    for request in queued:
+        with pytest.raises(ExecutorTimeoutError):
+            await request
+    assert order == []
+    assert pool.stats()["timeouts"] == 3
+    
+    # Without a backlog, requests run in submission order
+    pool.timeout = None
+    await asyncio.gather(*[pool.run(lambda model, deadline, i=i: order.append(i)) for i in range(3)])
+    assert order == [0, 1, 2]
+    pool.shutdown()
@@ -0,0 +1,79 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.file_parsers import (
+    count_decoded_chars,
+    iter_decoded_text,
+    iter_pdf_pages,
+    parse_file,
+    parse_file_stream,
+)
+
+
+
+def test_iter_decoded_text_handles_split_characters():
+    """Test that multi-byte characters split across read blocks are decoded correctly"""
+    text = "Névralgie — 5 µg/kg ✓ " * 50
+    file_obj = io.BytesIO(text.encode("utf-8"))
+    
+    pieces = list(iter_decoded_text(file_obj, "utf-8", block_size=7))
+    
+    assert "".join(pieces) == text
+    assert count_decoded_chars(file_obj, "utf-8", block_size=7) == len(text)
+
+
+def test_count_decoded_chars_rejects_invalid_input():
+    """Test that invalid UTF-8 is detected, even at the very end of the file"""
+    assert count_decoded_chars(io.BytesIO(b"valid text \xe2\x82"), "utf-8", block_size=4) is None
+
+
+@pytest.mark.asyncio
+async def test_parse_file_stream_falls_back_to_latin1():
+    """Test that text files that are not UTF-8 are streamed as Latin-1"""
+    file_obj = io.BytesIO("Caf\xe9 patients: 12".encode("latin-1"))
+    
+    document = await parse_file_stream(file_obj, "notes.txt")
+    
+    assert document["metadata"]["char_count"] == 17
+    assert document["metadata"]["file_type"] == "text"
+    assert "".join(document["content"]) == "Caf\xe9 patients: 12"
+
+
+@pytest.mark.asyncio
+async def test_parse_file_stream_unsupported_binary():
+    """Test that undecodable files of unknown types get placeholder content"""
+    document = await parse_file_stream(io.BytesIO(b"\xff\xfe\x00binary"), "scan.bin")
+    
+    assert document["metadata"]["error"] == "Unable to decode file content"
+    assert isinstance(document["content"], str)
+
+
+@pytest.mark.asyncio
+async def test_parse_file_extracts_pdf_text(make_pdf):
+    """Test that PDFs are parsed into their pages' text instead of placeholder content"""
+    document = await parse_file(make_pdf(["Hypertension guideline.", "Lisinopril 10 mg daily."]), "guide.pdf")
+    
+    assert document["content"] == "Hypertension guideline.\n\nLisinopril 10 mg daily."
+    assert document["metadata"]["file_type"] == "pdf"
+    assert document["metadata"]["page_count"] == 2
+
+
+def test_iter_pdf_pages_in_pool_preserves_order(make_pdf):
+    """Test that pages extracted in parallel come out in page order"""
+    pdf = make_pdf([f"Page {i} text." for i in range(1, 8)])
+    
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        pages = list(iter_pdf_pages(io.BytesIO(pdf), pool=pool, pages_per_task=2, max_in_flight=2))
+    
+    assert pages == [(i, f"Page {i} text.") for i in range(1, 8)]
+
+
+@pytest.mark.asyncio
+async def test_parse_file_stream_returns_lazy_pdf_pages(make_pdf):
+    """Test that streamed PDFs expose their pages lazily"""
+    document = await parse_file_stream(io.BytesIO(make_pdf(["First.", "Second."])), "notes.pdf")
+    
+    assert document["metadata"]["page_count"] == 2
+    assert list(document["pages"]) == [(1, "First."), (2, "Second.")]
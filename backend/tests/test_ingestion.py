@@ -0,0 +1,96 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+from qdrant_client import AsyncQdrantClient
+
+from app.core.ingestion import IngestionCheckpoint, run_ingestion_pipeline
+from app.database.vector_backend import QdrantBackend
+
+
+def make_local_store():
+    return QdrantBackend(AsyncQdrantClient(":memory:"), "test_collection", vector_size=3)
+
+
+async def fake_embed(texts):
+    return [np.array([1.0, float(len(text)), 0.5]) for text in texts]
+
+
+def make_documents(count):
+    return [
+        (f"doc-{i}", {"content": f"Medical note number {i}.", "metadata": {"source": f"note_{i}.txt"}})
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_ingests_all_documents_in_batches():
+    """Test that every document ends up in the collection with small batch sizes"""
+    store = make_local_store()
+    progress = []
+    
+    with patch("app.core.ingestion.get_vector_backend", return_value=store), \
+         patch("app.core.ingestion.embed_documents", side_effect=fake_embed) as mock_embed:
+        
+        stats = await run_ingestion_pipeline(
+            make_documents(7),
+            embed_batch_size=2,
+            upsert_batch_size=3,
+            queue_size=1,
+            progress_callback=lambda s: progress.append(s.documents_processed)
+        )
+    
+    assert stats.documents_processed == 7
+    assert stats.chunks_written == 7
+    assert (await store.client.count("test_collection")).count == 7
+    assert all(len(call.args[0]) <= 2 for call in mock_embed.call_args_list)
+    assert progress[-1] == 7 and len(progress) > 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_resumes_from_checkpoint(tmp_path):
+    """Test that documents recorded in the checkpoint are skipped on the next run"""
+    checkpoint_path = str(tmp_path / "ingest.checkpoint")
+    IngestionCheckpoint(checkpoint_path).mark_done(["doc-0", "doc-1"])
+    store = make_local_store()
+    
+    with patch("app.core.ingestion.get_vector_backend", return_value=store), \
+         patch("app.core.ingestion.embed_documents", side_effect=fake_embed):
+        
+        stats = await run_ingestion_pipeline(make_documents(4), checkpoint_path=checkpoint_path)
+    
+    assert stats.documents_skipped == 2
+    assert stats.documents_processed == 2
+    assert IngestionCheckpoint(checkpoint_path).completed == {"doc-0", "doc-1", "doc-2", "doc-3"}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_failure_propagates():
+    """Test that a failing stage stops the pipeline instead of hanging"""
+    store = make_local_store()
+    
+    async def failing_embed(texts):
+        raise RuntimeError("embedding failed")
+    
+    with patch("app.core.ingestion.get_vector_backend", return_value=store), \
+         patch("app.core.ingestion.embed_documents", side_effect=failing_embed):
+        
+        with pytest.raises(RuntimeError, match="embedding failed"):
+            await run_ingestion_pipeline(make_documents(20), embed_batch_size=1, queue_size=1)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_with_worker_processes():
+    """Test that multi-process preprocessing keeps documents and keys aligned"""
+    store = make_local_store()
+    
+    with patch("app.core.ingestion.get_vector_backend", return_value=store), \
+         patch("app.core.ingestion.embed_documents", side_effect=fake_embed):
+        
+        stats = await run_ingestion_pipeline(make_documents(9), workers=2, preprocess_batch_size=2)
+    
+    assert stats.documents_processed == 9
+    records, _ = await store.client.scroll("test_collection", limit=20, with_payload=True)
+    assert sorted(record.payload["metadata"]["source"] for record in records) == sorted(
+        f"note_{i}.txt" for i in range(9)
+    )
@@ -0,0 +1,153 @@
+import io
+import os
+import asyncio
+import sqlite3
+
+import pytest
+from unittest.mock import patch
+
+from app.core.jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    IngestionJobQueue,
+    JobStore,
+)
+
+
+async def fake_index(chunk_batches, replace_sources=False, progress_callback=None):
+    """Consume the chunk stream like index_chunk_stream, without a vector store"""
+    received = 0
+    async for batch in chunk_batches:
+        received += len(batch)
+        await progress_callback(received, received)
+    return received, received
+
+
+def make_queue(tmp_path):
+    return IngestionJobQueue(JobStore(str(tmp_path / "jobs.sqlite")), spool_dir=str(tmp_path / "files"))
+
+
+@pytest.mark.asyncio
+async def test_text_job_runs_to_completion(tmp_path):
+    """Test that a queued text job is processed by a worker and reports its progress"""
+    queue = make_queue(tmp_path)
+    document = {"content": " ".join(f"Sentence {i} about asthma." for i in range(100)), "metadata": {"source": "a.txt"}}
+    
+    with patch.dict(os.environ, {"CHUNK_UNIT": "characters"}), \
+         patch("app.core.jobs.index_chunk_stream", side_effect=fake_index):
+        job = await queue.submit_text(document)
+        assert (await queue.get(job.id)).state == JOB_QUEUED
+        
+        queue.start()
+        for _ in range(100):
+            if (await queue.get(job.id)).state == JOB_SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+    
+    status = (await queue.get(job.id)).to_dict()
+    assert status["state"] == JOB_SUCCEEDED
+    assert status["source"] == "a.txt"
+    assert status["chunks_processed"] > 1
+    assert status["finished_at"] >= status["started_at"]
+
+
+@pytest.mark.asyncio
+async def test_upload_job_survives_restart(tmp_path):
+    """Test that queued and interrupted jobs are picked up again by a new queue on the same database"""
+    queue = make_queue(tmp_path)
+    job = await queue.submit_upload(io.BytesIO(b"Hypertension notes. Follow up in 2 weeks."), "notes.txt", {"title": "Notes"})
+    interrupted = await queue.submit_text({"content": "Interrupted text.", "metadata": {"source": "b.txt"}})
+    assert queue.store.claim_next().id == job.id
+    assert queue.store.claim_next().id == interrupted.id
+    
+    # A new process opens the same database after the first one died
+    restarted = make_queue(tmp_path)
+    assert restarted.store.requeue_stale(heartbeat_timeout=60) == 0
+    assert restarted.store.requeue_stale(heartbeat_timeout=0) == 2
+    
+    captured = []
+    
+    async def capture_index(chunk_batches, replace_sources=False, progress_callback=None):
+        async for batch in chunk_batches:
+            captured.extend(batch)
+        return len(captured), len(captured)
+    
+    with patch("app.core.jobs.index_chunk_stream", side_effect=capture_index):
+        await restarted.run_job(restarted.store.claim_next())
+    
+    assert (await restarted.get(job.id)).state == JOB_SUCCEEDED
+    assert captured[0]["metadata"]["title"] == "Notes"
+    assert captured[0]["metadata"]["source"] == "notes.txt"
+    assert not os.path.exists(job.payload["file_path"])
+    assert (await restarted.get(interrupted.id)).state == JOB_QUEUED
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(tmp_path):
+    """Test that a job that raises is marked failed with its error"""
+    queue = make_queue(tmp_path)
+    await queue.submit_text({"content": "Some text.", "metadata": {}})
+    
+    with patch("app.core.jobs.index_chunk_stream", side_effect=RuntimeError("vector store down")):
+        job = queue.store.claim_next()
+        assert job.state == JOB_RUNNING
+        await queue.run_job(job)
+    
+    failed = await queue.get(job.id)
+    assert failed.state == JOB_FAILED
+    assert "vector store down" in failed.error
+    assert queue.store.counts()[JOB_FAILED] == 1
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_claimed_once_across_processes(tmp_path):
+    """Test that stores sharing a database never claim the same job or requeue live jobs"""
+    path = str(tmp_path / "jobs.sqlite")
+    first, second = JobStore(path), JobStore(path)
+    queue = IngestionJobQueue(first, spool_dir=str(tmp_path / "files"))
+    jobs = [await queue.submit_text({"content": f"Text {i}.", "metadata": {}}) for i in range(3)]
+    
+    claimed = [first.claim_next(), second.claim_next(), first.claim_next(), second.claim_next()]
+    assert sorted(job.id for job in claimed if job) == sorted(job.id for job in jobs)
+    assert claimed[-1] is None
+    
+    # A process starting up leaves jobs with a live heartbeat alone
+    assert JobStore(path).requeue_stale(heartbeat_timeout=60) == 0
+    
+    # Once the second store's job was taken over, its updates are ignored
+    second.release_running()
+    taken_over = first.claim_next()
+    assert taken_over.id == claimed[1].id
+    second.set_state(taken_over.id, JOB_FAILED, error="stale worker")
+    assert first.get(taken_over.id).state == JOB_RUNNING
+    assert first.get(taken_over.id).error is None
+    
+    assert first.release_running() == 3
+    assert first.counts()[JOB_QUEUED] == 3
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_survives_store_errors(tmp_path):
+    """Test that a failed heartbeat is logged and retried instead of stopping the heartbeat"""
+    queue = IngestionJobQueue(JobStore(str(tmp_path / "jobs.sqlite")), spool_dir=str(tmp_path / "files"), heartbeat_timeout=0.04)
+    beats = []
+    
+    def flaky_heartbeat():
+        beats.append(True)
+        if len(beats) == 1:
+            raise sqlite3.OperationalError("database is locked")
+    
+    with patch.object(queue.store, "heartbeat", side_effect=flaky_heartbeat):
+        queue.start()
+        for _ in range(100):
+            if len(beats) >= 3:
+                break
+            await asyncio.sleep(0.01)
+        heartbeat_task = queue._tasks[-1]
+        assert not heartbeat_task.done()
+        await queue.stop()
+    
+    assert len(beats) >= 3
@@ -0,0 +1,90 @@
+import os
+import tempfile
+
+from app.database.lexical_index import LexicalIndex, tokenize_for_index
+
+
+CHUNKS = [
+    ("id-1", "Metformin 500mg/day is first-line therapy for type 2 diabetes (E11.9).", "diabetes.txt"),
+    ("id-2", "Insulin therapy is used when diabetes is poorly controlled.", "diabetes.txt"),
+    ("id-3", "Asthma is a chronic inflammatory disease of the airways.", "asthma.txt"),
+]
+
+
+def test_tokenize_keeps_codes_and_dosages():
+    """Test that codes and dosages are indexed whole and by their parts"""
+    terms = tokenize_for_index("Metformin 500mg/day for E11.9")
+    
+    assert "500mg/day" in terms and "500mg" in terms and "day" in terms
+    assert "e11.9" in terms and "e11" in terms
+    assert "for" not in terms
+
+
+def test_search_ranks_exact_matches_first():
+    """Test that chunks are ranked by BM25 and re-adding a chunk is a no-op"""
+    index = LexicalIndex()
+    assert index.add(CHUNKS) == 3
+    assert index.add(CHUNKS[:1]) == 0
+    
+    assert [point_id for point_id, _ in index.search("E11.9 metformin", k=5)] == ["id-1"]
+    
+    ranked = index.search("diabetes therapy", k=5)
+    assert {point_id for point_id, _ in ranked} == {"id-1", "id-2"}
+    assert ranked[0][1] >= ranked[1][1] > 0
+    assert len(index.search("diabetes therapy", k=1)) == 1
+    assert index.search("unrelated words", k=5) == []
+
+
+def test_remove_stale_and_persist():
+    """Test that replaced chunks are dropped and the index survives a reload"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lexical.npz")
+        index = LexicalIndex(path)
+        index.add(CHUNKS)
+        index.remove_stale(["diabetes.txt"], keep_ids=["id-2"])
+        
+        assert [point_id for point_id, _ in index.search("metformin", k=5)] == []
+        assert index.stats()["removed"] == 1
+        
+        index.save()
+        # Saving drops the removed chunk from the postings
+        assert (index.stats()["documents"], index.stats()["removed"]) == (2, 0)
+        
+        reloaded = LexicalIndex(path)
+        assert reloaded.stats() == index.stats()
+        assert reloaded.search("insulin diabetes", k=5) == index.search("insulin diabetes", k=5)
+        assert [point_id for point_id, _ in reloaded.search("asthma", k=5)] == ["id-3"]
+        
+        # New chunks are numbered after the reloaded ones
+        reloaded.add([("id-4", "Metformin can cause lactic acidosis.", "metformin.txt")])
+        assert [point_id for point_id, _ in reloaded.search("metformin", k=5)] == ["id-4"]
+
+
+def test_processes_share_the_snapshot(tmp_path):
+    """Test that indexes on the same file merge their changes and reload each other's snapshots"""
+    path = str(tmp_path / "lexical.npz")
+    api_worker, ingest_script = LexicalIndex(path), LexicalIndex(path)
+    
+    ingest_script.add(CHUNKS[:2])
+    assert ingest_script.save()
+    api_worker.add(CHUNKS[2:])
+    
+    # Reloading keeps the changes this process has not saved yet
+    assert api_worker.refresh(collection_version=1)
+    assert not api_worker.refresh(collection_version=1)
+    assert [point_id for point_id, _ in api_worker.search("metformin", k=5)] == ["id-1"]
+    assert [point_id for point_id, _ in api_worker.search("asthma", k=5)] == ["id-3"]
+    
+    # Saving merges with the newer snapshot instead of overwriting it
+    ingest_script.remove(["id-2"])
+    ingest_script.save()
+    api_worker.save()
+    merged = LexicalIndex(path)
+    assert sorted(point_id for point_id, _ in merged.search("metformin insulin asthma", k=5)) == ["id-1", "id-3"]
+    
+    # A rebuild replaces the snapshot
+    ingest_script.clear()
+    ingest_script.add(CHUNKS[1:2])
+    ingest_script.save()
+    assert api_worker.refresh(collection_version=2)
+    assert [point_id for point_id, _ in api_worker.search("metformin insulin asthma", k=5)] == ["id-2"]
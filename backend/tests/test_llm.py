@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
 
-from app.core.llm import get_llm_model, generate_response
+from app.core.executors import ExecutorTimeoutError, ModelPool
+from app.core.llm import get_llm_model, count_prompt_tokens, generate_response, stream_response
 
 
 @pytest.mark.asyncio
@@ -24,12 +25,57 @@ async def test_generate_response():
     test_context = ["Diabetes symptoms include increased thirst, frequent urination."]
     expected_response = "Symptoms of diabetes include increased thirst and frequent urination."
     
-    with patch("app.core.llm.get_llm_model") as mock_get_model:
-        mock_model = MagicMock()
-        mock_model.return_value = expected_response
-        mock_get_model.return_value = mock_model
-        
+    mock_model = MagicMock()
+    mock_model.return_value = expected_response
+    pool = ModelPool("test", factory=lambda: mock_model, max_workers=1, max_queue=1)
+    
+    with patch("app.core.llm.get_generation_executor", return_value=pool):
         result = await generate_response(test_query, test_context)
         
         assert result == expected_response
         mock_model.assert_called_once()
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stream_response():
+    """Test that tokens are streamed in order from the model"""
+    test_query = "What are the symptoms of diabetes?"
+    test_context = ["Diabetes symptoms include increased thirst, frequent urination."]
+    
+    mock_model = MagicMock()
+    mock_model.stream.return_value = iter(["Increased", " thirst", "."])
+    pool = ModelPool("test", factory=lambda: mock_model, max_workers=1, max_queue=1)
+    
+    with patch("app.core.llm.get_generation_executor", return_value=pool):
+        tokens = [token async for token in await stream_response(test_query, test_context)]
+        
+        assert tokens == ["Increased", " thirst", "."]
+        mock_model.stream.assert_called_once()
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stream_response_times_out():
+    """Test that a stream past its deadline stops with a timeout error"""
+    mock_model = MagicMock()
+    mock_model.stream.return_value = iter(["Increased", " thirst", "."])
+    pool = ModelPool("test", factory=lambda: mock_model, max_workers=1, max_queue=1, timeout=1e-9)
+    
+    with patch("app.core.llm.get_generation_executor", return_value=pool):
+        with pytest.raises(ExecutorTimeoutError):
+            [token async for token in await stream_response("What is gout?", ["Gout is arthritis."])]
+    
+    assert pool.stats()["timeouts"] == 1
+    pool.shutdown()
+
+
+def test_count_prompt_tokens():
+    """Test that tokens are counted with the model's llama.cpp tokenizer"""
+    with patch("app.core.llm.get_llm_model") as mock_get_model:
+        mock_model = MagicMock()
+        mock_model.client.tokenize.return_value = [1100, 2200, 3300]
+        mock_get_model.return_value = mock_model
+        
+        assert count_prompt_tokens("Insulin resistance") == 3
+        mock_model.client.tokenize.assert_called_once_with(b"Insulin resistance", add_bos=False)
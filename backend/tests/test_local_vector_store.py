@@ -0,0 +1,134 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.database.local_vector_store import LocalVectorStore
+from app.database.vector_store import init_vector_store, search_similar_documents
+from app.database.retrieval_cache import RetrievalCache
+
+
+def random_points(count, dimension=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimension)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(count)]
+    chunks = [(f"chunk {i}", {"source": f"doc-{i % 3}.txt", "chunk": i}) for i in range(count)]
+    return ids, list(vectors), chunks
+
+
+@pytest.mark.asyncio
+async def test_exhaustive_search_matches_cosine_ranking():
+    """Test that top-k search returns the best cosine matches, with filters"""
+    store = LocalVectorStore()
+    ids, vectors, chunks = random_points(50)
+    await store.upsert(ids, vectors, chunks)
+    
+    query = vectors[7] + 0.1
+    results = await store.search(query, k=5)
+    
+    matrix = np.stack(vectors)
+    cosine = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    expected = np.argsort(-cosine)[:5]
+    assert [content for content, _, _ in results] == [f"chunk {i}" for i in expected]
+    assert results[0][2] == pytest.approx(cosine[expected[0]], rel=1e-5)
+    
+    filtered = await store.search(query, k=5, filters={"source": "doc-1.txt"})
+    assert len(filtered) == 5
+    assert all(metadata["source"] == "doc-1.txt" for _, metadata, _ in filtered)
+    assert [score for _, _, score in filtered] == sorted((score for _, _, score in filtered), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_store_grows_persists_and_deletes():
+    """Test that the memory-mapped matrix grows, survives a reload and drops stale points"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "collection")
+        store = LocalVectorStore(path)
+        ids, vectors, chunks = random_points(1500)
+        await store.upsert(ids[:1000], vectors[:1000], chunks[:1000])
+        await store.upsert(ids[1000:], vectors[1000:], chunks[1000:])
+        assert await store.existing_ids(["id-3", "id-1499", "missing"]) == {"id-3", "id-1499"}
+        
+        reloaded = LocalVectorStore(path)
+        assert reloaded.stats()["points"] == 1500
+        assert await reloaded.search(vectors[1234], k=1) == [("chunk 1234", chunks[1234][1], pytest.approx(1.0))]
+        
+        await reloaded.delete_stale(["doc-0.txt"], keep_ids=["id-0"])
+        assert reloaded.stats() == {
+            "points": 1001, "dead_rows": 499, "dimension": 8, "hnsw": False, "searches": 1, "graph_searches": 0
+        }
+        assert (await reloaded.search(vectors[3], k=1))[0][0] != "chunk 3"
+        assert await reloaded.get_chunks(["id-0", "id-3"]) == {"id-0": chunks[0]}
+        
+        scrolled = [point async for batch in LocalVectorStore(path).scroll(batch_size=400) for point in batch]
+        assert len(scrolled) == 1001
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("hnsw", [False, True])
+async def test_deleted_rows_are_reused(hnsw):
+    """Test that re-ingesting a document reuses the rows of its deleted points"""
+    if hnsw:
+        pytest.importorskip("hnswlib")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "collection")
+        store = LocalVectorStore(path, hnsw=hnsw, hnsw_min_points=10)
+        ids, vectors, chunks = random_points(60)
+        await store.upsert(ids[:30], vectors[:30], chunks[:30])
+        await store.search(vectors[0], k=1)
+        
+        # Each new version of the documents replaces the previous one
+        for start in (30, 0, 30):
+            await store.delete_stale(["doc-0.txt", "doc-1.txt", "doc-2.txt"], keep_ids=[])
+            await store.upsert(ids[start:start + 30], vectors[start:start + 30], chunks[start:start + 30])
+            assert store.stats()["points"] + store.stats()["dead_rows"] == 30
+            assert (await store.search(vectors[start + 15], k=1))[0][0] == f"chunk {start + 15}"
+        
+        await store.delete_stale(["doc-0.txt"], keep_ids=[])
+        
+        # The free rows are found again after a restart
+        reloaded = LocalVectorStore(path)
+        await reloaded.upsert(["new"], [vectors[0]], [("new chunk", {"source": "new.txt"})])
+        assert reloaded.stats()["points"] == 21 and reloaded.stats()["points"] + reloaded.stats()["dead_rows"] <= 30
+        assert await reloaded.existing_ids(["new", "id-3", "id-45", "id-46"]) == {"new", "id-46"}
+        assert (await reloaded.search(vectors[0], k=1))[0][0] == "new chunk"
+
+
+@pytest.mark.asyncio
+async def test_hnsw_search_agrees_with_exhaustive_search():
+    """Test that the HNSW graph serves searches once the collection is large enough"""
+    pytest.importorskip("hnswlib")
+    store = LocalVectorStore(hnsw=True, hnsw_min_points=100)
+    ids, vectors, chunks = random_points(300)
+    await store.upsert(ids, vectors, chunks)
+    
+    results = await store.search(vectors[42], k=3)
+    assert results[0][0] == "chunk 42"
+    assert store.stats()["hnsw"] and store.stats()["graph_searches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_search_through_the_local_backend(monkeypatch):
+    """Test that ingestion and search run on the embedded store when it is selected"""
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    
+    async def fake_embed(texts):
+        return [np.array([1.0, float(len(text)), 0.5]) for text in texts]
+    
+    with patch("app.database.vector_store.get_local_vector_store", return_value=LocalVectorStore()), \
+         patch("app.database.vector_store.get_qdrant_backend") as mock_get_store, \
+         patch("app.database.vector_store.embed_documents", side_effect=fake_embed), \
+         patch("app.database.vector_store.embed_text", return_value=np.array([1.0, 4.0, 0.5])), \
+         patch("app.database.vector_store.get_retrieval_cache", return_value=RetrievalCache()):
+        documents = [
+            {"page_content": "Gout", "metadata": {"source": "gout.txt", "chunk": 0}},
+            {"page_content": "Asthma is common.", "metadata": {"source": "asthma.txt", "chunk": 0}},
+        ]
+        assert await init_vector_store(documents) == 2
+        assert await init_vector_store(documents) == 0
+        
+        hits = await search_similar_documents("gout", k=1, min_score=0.0)
+        assert [(hit.content, hit.source) for hit in hits] == [("Gout", "gout.txt")]
+        mock_get_store.assert_not_called()
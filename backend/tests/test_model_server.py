@@ -0,0 +1,128 @@
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.core.embeddings import embed_documents
+from app.core.executors import ExecutorSaturatedError
+from app.core.llm import stream_response
+from app.core.model_client import ModelServerClient, ModelServerError
+from app.model_server import handle_connection
+
+
+@asynccontextmanager
+async def model_server():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "models.sock")
+        server = await asyncio.start_unix_server(handle_connection, path=path)
+        client = ModelServerClient(path, max_connections=2)
+        async with server:
+            yield client
+            await client.close()
+            # Let the server see the connections close
+            await asyncio.sleep(0.01)
+
+
+async def fake_encode(texts):
+    return [np.full(4, len(text), dtype=np.float32) for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_embed_and_generate_over_the_socket():
+    """Test that embeddings and completions round-trip through the model server"""
+    async def fake_generate(prompt):
+        return f"answer to {prompt}"
+    
+    with patch("app.model_server.encode_texts", side_effect=fake_encode), \
+         patch("app.model_server.generate_text", side_effect=fake_generate):
+        async with model_server() as client:
+            vectors = await client.embed(["ab", "abcd"])
+            assert [vector.tolist() for vector in vectors] == [[2.0] * 4, [4.0] * 4]
+            
+            assert await client.generate("What is gout?") == "answer to What is gout?"
+            
+            # Concurrent requests use separate connections, which are reused afterwards
+            answers = await asyncio.gather(*[client.generate(str(i)) for i in range(4)])
+            assert answers == [f"answer to {i}" for i in range(4)]
+            assert len(client._idle) == 2
+
+
+@pytest.mark.asyncio
+async def test_rerank_over_the_socket():
+    """Test that pair scores round-trip through the model server"""
+    async def fake_score_pairs(pairs):
+        return [float(len(content)) for _, content in pairs]
+    
+    with patch("app.model_server.score_pairs", side_effect=fake_score_pairs) as mock_score:
+        async with model_server() as client:
+            assert await client.rerank([("q", "ab"), ("q", "abcd")]) == [2.0, 4.0]
+            mock_score.assert_called_once_with([["q", "ab"], ["q", "abcd"]])
+
+
+@pytest.mark.asyncio
+async def test_stream_and_errors_over_the_socket():
+    """Test that tokens are streamed and pool errors are re-raised by the client"""
+    async def fake_tokens():
+        for token in ["Uric", " acid"]:
+            yield token
+    
+    def saturated(texts):
+        raise ExecutorSaturatedError("The embedding pool is saturated, try again later")
+    
+    with patch("app.model_server.stream_text", return_value=fake_tokens()), \
+         patch("app.model_server.encode_texts", side_effect=saturated):
+        async with model_server() as client:
+            assert [token async for token in await client.stream_tokens("What is gout?")] == ["Uric", " acid"]
+            
+            with pytest.raises(ExecutorSaturatedError):
+                await client.embed(["gout"])
+            
+            with pytest.raises(ModelServerError):
+                await client.request({"op": "unknown"})
+
+
+@pytest.mark.asyncio
+async def test_saturated_stream_is_refused_before_the_first_token(monkeypatch):
+    """Test that a full generation pool on the server is raised when the stream is opened"""
+    monkeypatch.setenv("MODEL_SERVER_SOCKET", "/unused.sock")
+    
+    async def slow_tokens():
+        await asyncio.sleep(0.05)
+        yield "Uric"
+    
+    def saturated(prompt):
+        raise ExecutorSaturatedError("The generation pool is saturated, try again later")
+    
+    async with model_server() as client:
+        with patch("app.core.llm.get_model_client", return_value=client):
+            with patch("app.model_server.stream_text", side_effect=saturated):
+                with pytest.raises(ExecutorSaturatedError):
+                    await stream_response("What is gout?", ["Gout is arthritis."])
+            
+            # An admitted stream that is closed before being read gives its connection slot back
+            with patch("app.model_server.stream_text", return_value=slow_tokens()):
+                tokens = await stream_response("What is gout?", ["Gout is arthritis."])
+                await tokens.aclose()
+                # Let the server notice the closed connection
+                await asyncio.sleep(0.1)
+        
+        assert client._get_slots()._value == 2
+
+
+@pytest.mark.asyncio
+async def test_embed_documents_uses_the_model_server(monkeypatch):
+    """Test that API processes embed through the model server when it is configured"""
+    monkeypatch.setenv("MODEL_SERVER_SOCKET", "/unused.sock")
+    
+    with patch("app.model_server.encode_texts", side_effect=fake_encode), \
+         patch("app.core.embeddings.get_embeddings_model") as mock_get_model:
+        async with model_server() as client:
+            with patch("app.core.embeddings.get_model_client", return_value=client):
+                vectors = await embed_documents(["abc"])
+    
+    assert vectors[0].tolist() == [3.0] * 4
+    mock_get_model.assert_not_called()
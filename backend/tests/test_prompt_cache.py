@@ -0,0 +1,75 @@
+import numpy as np
+
+from app.core.prompt_cache import PromptPrefixCache
+
+
+class FakeLlama:
+    """Tracks evaluated tokens like llama_cpp.Llama, with one token per word"""
+    
+    def __init__(self):
+        self.input_ids = np.zeros(64, dtype=np.intc)
+        self.n_tokens = 0
+        self.evaluated = 0
+        self.vocab = {}
+    
+    def tokenize(self, text, special=False):
+        return [self.vocab.setdefault(word, len(self.vocab) + 1) for word in text.decode("utf-8").split()]
+    
+    def reset(self):
+        self.n_tokens = 0
+    
+    def eval(self, tokens):
+        self.input_ids[self.n_tokens:self.n_tokens + len(tokens)] = tokens
+        self.n_tokens += len(tokens)
+        self.evaluated += len(tokens)
+    
+    def save_state(self):
+        return (self.input_ids.copy(), self.n_tokens)
+    
+    def load_state(self, state):
+        self.input_ids, self.n_tokens = state[0].copy(), state[1]
+    
+    def complete(self, prompt):
+        # Reuse the longest evaluated prefix, as llama-cpp-python does
+        tokens = self.tokenize(prompt.encode("utf-8"))
+        reused = 0
+        while reused < min(self.n_tokens, len(tokens) - 1) and self.input_ids[reused] == tokens[reused]:
+            reused += 1
+        self.n_tokens = reused
+        self.eval(tokens[reused:])
+        return "answer"
+
+
+def test_prefix_is_evaluated_once_and_restored():
+    """Test that the prefix is warmed once, kept while resident and restored after other prompts"""
+    cache = PromptPrefixCache("You are a medical assistant. Context:")
+    llama = FakeLlama()
+    
+    assert cache.run(llama, lambda: llama.complete("You are a medical assistant. Context: asthma Question: what")) == "answer"
+    assert llama.evaluated == 9
+    
+    # The prefix is still in the KV cache, so only the rest of the prompt is evaluated
+    cache.run(llama, lambda: llama.complete("You are a medical assistant. Context: copd Question: why"))
+    assert llama.evaluated == 9 + 3
+    
+    # A different prompt displaces the prefix; the saved state brings it back without evaluating it
+    llama.complete("Summarize this note please")
+    evaluated = llama.evaluated
+    cache.run(llama, lambda: llama.complete("You are a medical assistant. Context: gout Question: how"))
+    assert llama.evaluated == evaluated + 3
+    
+    stats = cache.stats()
+    assert stats["prefix_tokens"] == 6
+    assert (stats["warmups"], stats["resident"], stats["restores"], stats["requests"]) == (1, 1, 1, 3)
+
+
+def test_disabled_cache_only_records_requests():
+    """Test that a disabled cache leaves the model's state alone"""
+    cache = PromptPrefixCache("You are a medical assistant. Context:", enabled=False)
+    llama = FakeLlama()
+    
+    cache.run(llama, lambda: llama.complete("You are a medical assistant. Context: asthma Question: what"))
+    
+    assert llama.evaluated == 9
+    assert cache.stats()["warmups"] == 0
+    assert cache.stats()["requests"] == 1
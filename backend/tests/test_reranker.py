@@ -0,0 +1,66 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.reranker import PairScoreCache, get_rerank_candidates, rerank, rerank_batch
+from app.database.vector_store import SearchHit
+
+
+def make_model(scores):
+    model = MagicMock()
+    model.predict.side_effect = lambda pairs, **kwargs: [scores[content] for _, content in pairs]
+    return model
+
+
+@pytest.mark.asyncio
+async def test_rerank_keeps_the_best_hits():
+    """Test that hits are reordered by cross-encoder score and cut to top_n"""
+    hits = [
+        SearchHit("Gout is a form of arthritis.", 0.9, "gout.txt", 0),
+        SearchHit("Allopurinol lowers uric acid in gout.", 0.8, "gout.txt", 1),
+        SearchHit("Asthma narrows the airways.", 0.7, "asthma.txt", 0),
+    ]
+    model = make_model({hit.content: score for hit, score in zip(hits, [1.5, 7.0, -3.0])})
+    
+    with patch("app.core.reranker.get_reranker_model", return_value=model), \
+         patch("app.core.reranker.get_pair_score_cache", return_value=PairScoreCache()):
+        
+        reranked = await rerank("How is gout treated?", hits, top_n=2)
+    
+    assert [hit.content for hit in reranked] == ["Allopurinol lowers uric acid in gout.", "Gout is a form of arthritis."]
+    assert [hit.rerank_score for hit in reranked] == [7.0, 1.5]
+    assert [hit.score for hit in reranked] == [0.8, 0.9]
+    assert reranked[0].source == "gout.txt" and reranked[0].chunk == 1
+    model.predict.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_rerank_batch_scores_in_one_call_and_caches_pairs():
+    """Test that a batch is scored in one model call and cached pairs are not rescored"""
+    scores = {"Gout.": 2.0, "Asthma.": 1.0, "Diabetes.": 3.0}
+    model = make_model(scores)
+    cache = PairScoreCache()
+    queries = ["What is gout?", "What is asthma?"]
+    hit_lists = [
+        [SearchHit("Asthma.", 0.9), SearchHit("Gout.", 0.8)],
+        [SearchHit("Asthma.", 0.9), SearchHit("Diabetes.", 0.5)],
+    ]
+    
+    with patch("app.core.reranker.get_reranker_model", return_value=model), \
+         patch("app.core.reranker.get_pair_score_cache", return_value=cache):
+        
+        reranked = await rerank_batch(queries, hit_lists, top_n=1)
+        assert [[hit.content for hit in hits] for hits in reranked] == [["Gout."], ["Diabetes."]]
+        assert len(model.predict.call_args.args[0]) == 4
+        
+        # Only the new pair reaches the model
+        await rerank_batch(["What is gout?"], [[SearchHit("Gout.", 0.8), SearchHit("Diabetes.", 0.4)]], top_n=2)
+        assert model.predict.call_count == 2
+        assert model.predict.call_args.args[0] == [["What is gout?", "Diabetes."]]
+        assert cache.stats() == {"hits": 1, "misses": 5, "size": 5}
+
+
+def test_rerank_candidates(monkeypatch):
+    """Test that the candidate count never drops below the number of documents kept"""
+    monkeypatch.setenv("RERANK_CANDIDATES", "20")
+    assert get_rerank_candidates(5) == 20
+    assert get_rerank_candidates(30) == 30
@@ -0,0 +1,106 @@
+import time
+import asyncio
+
+import pytest
+
+from app.database.collection_version import CollectionVersionStore
+from app.database.retrieval_cache import RetrievalCache, make_retrieval_key
+
+
+@pytest.mark.asyncio
+async def test_results_are_cached_until_the_collection_changes():
+    """Test that repeated searches are served from the cache until the version is bumped"""
+    cache = RetrievalCache()
+    calls = []
+    
+    async def load():
+        calls.append(1)
+        return [f"result {len(calls)}"]
+    
+    key = make_retrieval_key("What is asthma?", 5)
+    assert make_retrieval_key("What is  asthma? ", 5) == key
+    assert make_retrieval_key("What is asthma?", 3) != key
+    assert make_retrieval_key("What is asthma?", 5, {"source": "a.pdf"}) != key
+    
+    assert await cache.get_or_load(key, 0, load) == ["result 1"]
+    assert await cache.get_or_load(key, 0, load) == ["result 1"]
+    assert await cache.get_or_load(key, 1, load) == ["result 2"]
+    
+    # Results of a search that started before the collection changed are not kept
+    cache.put(make_retrieval_key("old", 5), 0, ["stale"])
+    assert cache.get(make_retrieval_key("old", 5), 1) is None
+    
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_search():
+    """Test that a burst of identical queries runs a single search"""
+    cache = RetrievalCache()
+    calls = []
+    
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["shared"]
+    
+    key = make_retrieval_key("burst", 5)
+    results = await asyncio.gather(*(cache.get_or_load(key, 0, load) for _ in range(10)))
+    
+    assert results == [["shared"]] * 10
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_failed_search_is_not_cached():
+    """Test that errors reach every waiter and nothing is cached"""
+    cache = RetrievalCache()
+    
+    async def load():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("qdrant unavailable")
+    
+    key = make_retrieval_key("q", 5)
+    results = await asyncio.gather(*(cache.get_or_load(key, 0, load) for _ in range(3)), return_exceptions=True)
+    
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get(key, 0) is None
+
+
+def test_collection_version_is_shared_between_processes(tmp_path):
+    """Test that a version bumped through one store is seen by another on the same file"""
+    path = str(tmp_path / "versions.sqlite")
+    writer, reader = CollectionVersionStore(path), CollectionVersionStore(path)
+    
+    assert reader.get("medical_documents") == 0
+    assert writer.bump("medical_documents") == 1
+    assert writer.bump("medical_documents") == 2
+    assert reader.get("medical_documents") == 2
+    assert reader.get("other_collection") == 0
+    
+    # Results cached at the old version are dropped on the next lookup
+    cache = RetrievalCache()
+    key = make_retrieval_key("What is asthma?", 5)
+    cache.put(key, reader.get("medical_documents"), ["old"])
+    writer.bump("medical_documents")
+    assert cache.get(key, reader.get("medical_documents")) is None
+
+
+def test_collection_version_is_remembered_for_its_ttl(tmp_path):
+    """Test that peek() answers from memory until the TTL passes, and sees own bumps at once"""
+    path = str(tmp_path / "versions.sqlite")
+    writer, reader = CollectionVersionStore(path), CollectionVersionStore(path, ttl=60)
+    
+    assert reader.peek("medical_documents") is None
+    assert reader.get("medical_documents") == 0
+    writer.bump("medical_documents")
+    # Another process's bump is not seen before the TTL passes
+    assert reader.peek("medical_documents") == 0
+    assert reader.bump("medical_documents") == 2
+    assert reader.peek("medical_documents") == 2
+    
+    reader.ttl = 0.001
+    time.sleep(0.01)
+    assert reader.peek("medical_documents") is None
@@ -1,5 +1,10 @@
 import pytest
-from app.utils.text_preprocessing import clean_text, extract_medical_entities, preprocess_medical_document
+from app.utils.text_preprocessing import (
+    MEDICAL_ABBREVIATIONS,
+    TextCleaner,
+    clean_text,
+    extract_medical_entities,
+)
 
 
 def test_clean_text():
@@ -29,6 +34,29 @@ def test_clean_text():
     assert clean_text(None) == ""
 
 
+def test_clean_text_matches_original_edge_cases():
+    """Test ordering-sensitive cases of the original chained implementation"""
+    # URLs are removed after whitespace collapsing, leaving both neighbouring spaces
+    assert clean_text("see https://example.org/guide  now") == "see  now"
+    # Abbreviations are expanded before URLs are removed
+    assert clean_text("link http://x.org/b.i.d/page") == "link  daily/page"
+    # Case-insensitive matching, including non-ASCII case variants
+    assert clean_text("Take 1 tab T.I.D") == "Take 1 tab three times daily"
+    assert clean_text("take b.\u0131.d") == "take twice daily"
+    # Abbreviations need word boundaries
+    assert clean_text("xb.i.d and b.i.dx") == "xb.i.d and b.i.dx"
+
+
+def test_text_cleaner_extended_abbreviations():
+    """Test the larger abbreviation table"""
+    cleaner = TextCleaner(MEDICAL_ABBREVIATIONS)
+    
+    assert cleaner.clean("Paracetamol 1g p.o. q6h p.r.n. pain") == "Paracetamol 1g by mouth. every 6 hours as needed. pain"
+    assert cleaner.clean("Give 2mg i.v. then q.d.") == "Give 2mg intravenously. then once daily."
+    # Longer abbreviations win over their prefixes
+    assert cleaner.clean("Zolpidem q.h.s") == "Zolpidem at bedtime"
+
+
 def test_extract_medical_entities():
     """Test medical entity extraction"""
     # Test medication extraction
@@ -54,36 +82,3 @@ def test_extract_medical_entities():
     entities = extract_medical_entities(input_text)
     
     assert all(len(entity_list) == 0 for entity_list in entities.values())
-
-
-def test_preprocess_medical_document():
-    """Test complete document preprocessing"""
-    # Create a test document
-    document = {
-        "content": "  Patient reports taking Metformin 500mg b.i.d.  Blood pressure was 140/90 mmHg. ",
-        "metadata": {
-            "source": "test_document.pdf",
-            "page": 1
-        }
-    }
-    
-    # Process the document
-    result = preprocess_medical_document(document)
-    
-    # Check that content is cleaned
-    assert "  " not in result["content"]
-    assert "twice daily" in result["content"]
-    
-    # Check that metadata is preserved and entities are added
-    assert "source" in result["metadata"]
-    assert result["metadata"]["source"] == "test_document.pdf"
-    assert "extracted_entities" in result["metadata"]
-    assert "medications" in result["metadata"]["extracted_entities"]
-    assert "measurements" in result["metadata"]["extracted_entities"]
-    
-    # Test with empty document
-    empty_document = {"content": "", "metadata": {}}
-    result = preprocess_medical_document(empty_document)
-    
-    assert result["content"] == ""
-    assert "extracted_entities" in result["metadata"]
@@ -1,30 +1,61 @@
+import os
 import pytest
-from unittest.mock import patch, MagicMock
+from collections import ChainMap
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+import numpy as np
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 
 from app.database.vector_store import (
-    get_vector_store,
+    flush_lexical_index,
+    fuse_rankings,
+    get_collection_version,
+    get_qdrant_backend,
+    index_chunk_stream,
     init_vector_store,
+    make_point_id,
     search_similar_documents,
+    search_similar_documents_batch,
+    SearchHit,
+    upsert_chunk_vectors,
 )
+from app.database.retrieval_cache import RetrievalCache
+from app.database.lexical_index import LexicalIndex
+from app.database.vector_backend import QdrantBackend
+
+
+def make_local_backend():
+    return QdrantBackend(AsyncQdrantClient(":memory:"), "test_collection", vector_size=3)
+
+
+def make_mock_backend(**kwargs):
+    client = AsyncMock()
+    client.get_collections.return_value = SimpleNamespace(collections=[SimpleNamespace(name="test_collection")])
+    return QdrantBackend(client, "test_collection", **kwargs)
+
+
+def scored_point(content, metadata, score):
+    return SimpleNamespace(payload={"page_content": content, "metadata": metadata}, score=score)
 
 
 @pytest.mark.asyncio
-async def test_get_vector_store():
-    """Test that the vector store is initialized correctly"""
-    with patch("qdrant_client.QdrantClient") as mock_client, \
-         patch("langchain_community.vectorstores.Qdrant") as mock_qdrant:
-        
-        mock_client_instance = MagicMock()
-        mock_client.return_value = mock_client_instance
-        
-        mock_qdrant_instance = MagicMock()
-        mock_qdrant.return_value = mock_qdrant_instance
+async def test_get_qdrant_backend():
+    """Test that the Qdrant backend is configured from the environment"""
+    get_qdrant_backend.cache_clear()
+    with patch.dict(os.environ, {"QDRANT_PREFER_GRPC": "true", "QDRANT_MAX_CONNECTIONS": "8"}), \
+         patch("app.database.vector_store.AsyncQdrantClient") as mock_client:
         
-        vector_store = get_vector_store()
+        backend = get_qdrant_backend()
         
-        assert vector_store == mock_qdrant_instance
-        mock_client.assert_called_once()
-        mock_qdrant.assert_called_once()
+        assert backend.client == mock_client.return_value
+        assert backend.collection_name == "test_collection"
+        kwargs = mock_client.call_args.kwargs
+        assert kwargs["prefer_grpc"] is True
+        assert kwargs["limits"].max_keepalive_connections == 8
+        assert get_qdrant_backend() is backend
+    get_qdrant_backend.cache_clear()
 
 
 @pytest.mark.asyncio
@@ -35,20 +66,82 @@ async def test_init_vector_store():
         {"page_content": "Test medical document 2", "metadata": {"source": "test2.pdf"}},
     ]
     
-    with patch("app.database.vector_store.get_vector_store") as mock_get_store, \
-         patch("app.core.embeddings.get_embeddings_model") as mock_get_embeddings:
+    with patch("app.database.vector_store.get_vector_backend") as mock_get_backend, \
+         patch("app.database.vector_store.embed_documents") as mock_embed:
         
-        mock_store = MagicMock()
-        mock_get_store.return_value = mock_store
+        backend = make_mock_backend()
+        backend.client.retrieve.return_value = []
+        mock_get_backend.return_value = backend
         
-        mock_embeddings = MagicMock()
-        mock_get_embeddings.return_value = mock_embeddings
+        mock_embed.return_value = [np.array([0.1] * 768), np.array([0.2] * 768)]
         
         await init_vector_store(test_docs)
         
-        mock_get_store.assert_called_once()
-        # Check if the store was initialized with documents
-        mock_store.from_documents.assert_called_once()
+        mock_get_backend.assert_called_once()
+        mock_embed.assert_called_once_with(["Test medical document 1", "Test medical document 2"])
+        # Check that the embedded documents were upserted into the collection
+        backend.client.upsert.assert_awaited_once()
+        points = backend.client.upsert.call_args.kwargs["points"]
+        assert len(points) == 2
+        assert points[0].payload["page_content"] == "Test medical document 1"
+        assert points[1].payload["metadata"] == {"source": "test2.pdf"}
+
+
+@pytest.mark.asyncio
+async def test_init_vector_store_is_idempotent():
+    """Test that re-ingesting only writes changed chunks and can drop stale ones"""
+    backend = make_local_backend()
+    
+    def doc(content, chunk):
+        return {"page_content": content, "metadata": {"source": "guide.txt", "chunk": chunk}}
+    
+    async def fake_embed(texts):
+        return [np.array([1.0, float(len(text)), 0.5]) for text in texts]
+    
+    with patch("app.database.vector_store.get_vector_backend", return_value=backend), \
+         patch("app.database.vector_store.embed_documents", side_effect=fake_embed) as mock_embed:
+        
+        assert await init_vector_store([doc("First chunk.", 0), doc("Second chunk.", 1)]) == 2
+        assert await init_vector_store([doc("First chunk.", 0), doc("Second chunk.", 1)]) == 0
+        
+        # Only the edited chunk is embedded again
+        written = await init_vector_store([doc("First chunk.", 0), doc("Edited chunk.", 1)], replace_sources=True)
+        assert written == 1
+        assert mock_embed.call_args.args[0] == ["Edited chunk."]
+        
+        records, _ = await backend.client.scroll("test_collection", with_payload=True)
+        assert sorted(record.payload["page_content"] for record in records) == ["Edited chunk.", "First chunk."]
+        assert str(records[0].id) in {make_point_id("guide.txt", 0, "First chunk."), make_point_id("guide.txt", 1, "Edited chunk.")}
+
+
+@pytest.mark.asyncio
+async def test_index_chunk_stream():
+    """Test that streamed batches are upserted incrementally and stale chunks are dropped"""
+    backend = make_local_backend()
+    
+    base_metadata = {"source": "dump.txt"}
+    
+    async def batches(texts):
+        for start in range(0, len(texts), 2):
+            yield [
+                {"page_content": text, "metadata": ChainMap({"chunk": start + i}, base_metadata)}
+                for i, text in enumerate(texts[start:start + 2])
+            ]
+    
+    async def fake_embed(texts):
+        return [np.array([1.0, float(len(text)), 0.5]) for text in texts]
+    
+    with patch("app.database.vector_store.get_vector_backend", return_value=backend), \
+         patch("app.database.vector_store.embed_documents", side_effect=fake_embed) as mock_embed:
+        
+        assert await index_chunk_stream(batches(["One.", "Two.", "Three.", "Four.", "Five."])) == (5, 5)
+        assert mock_embed.call_count == 3
+        
+        assert await index_chunk_stream(batches(["One.", "Two."]), replace_sources=True) == (2, 0)
+    
+    records, _ = await backend.client.scroll("test_collection", with_payload=True)
+    assert sorted(record.payload["page_content"] for record in records) == ["One.", "Two."]
+    assert records[0].payload["metadata"]["source"] == "dump.txt"
 
 
 @pytest.mark.asyncio
@@ -57,15 +150,209 @@ async def test_search_similar_documents():
     test_query = "What are diabetes symptoms?"
     expected_docs = ["Diabetes symptoms include increased thirst and frequent urination."]
     
-    with patch("app.database.vector_store.get_vector_store") as mock_get_store:
-        mock_store = MagicMock()
-        mock_doc = MagicMock()
-        mock_doc.page_content = expected_docs[0]
-        mock_store.similarity_search_with_score.return_value = [(mock_doc, 0.95)]
-        mock_get_store.return_value = mock_store
+    with patch("app.database.vector_store.get_vector_backend") as mock_get_backend, \
+         patch("app.database.vector_store.embed_text") as mock_embed:
+        backend = make_mock_backend()
+        backend.client.search.return_value = [
+            scored_point(expected_docs[0], {"source": "diabetes.txt", "chunk": 3, "title": "Diabetes"}, 0.95)
+        ]
+        mock_get_backend.return_value = backend
+        mock_embed.return_value = np.array([0.1] * 768)
         
-        results = await search_similar_documents(test_query, k=1)
+        results = await search_similar_documents(test_query, k=1, filters={"source": "diabetes.txt"})
         
         assert len(results) == 1
-        assert results[0] == expected_docs[0]
-        mock_store.similarity_search_with_score.assert_called_once()
+        assert results[0] == SearchHit(expected_docs[0], 0.95, "diabetes.txt", 3, "Diabetes")
+        mock_embed.assert_called_once_with(test_query)
+        backend.client.search.assert_awaited_once()
+        query_filter = backend.client.search.call_args.kwargs["query_filter"]
+        assert query_filter.must[0].key == "metadata.source"
+
+
+@pytest.mark.asyncio
+async def test_search_results_cached_until_upsert():
+    """Test that repeated searches skip Qdrant until chunks are written"""
+    with patch("app.database.vector_store.get_vector_backend") as mock_get_backend, \
+         patch("app.database.vector_store.embed_text") as mock_embed, \
+         patch("app.database.vector_store.get_retrieval_cache", return_value=RetrievalCache()):
+        backend = make_mock_backend()
+        backend.client.search.return_value = [
+            scored_point("Asthma is a chronic airway disease.", {"source": "asthma.txt", "chunk": 0}, 0.9)
+        ]
+        mock_get_backend.return_value = backend
+        mock_embed.return_value = np.array([0.1] * 768)
+        
+        hits = await search_similar_documents("What is asthma?", k=1)
+        assert [hit.content for hit in hits] == ["Asthma is a chronic airway disease."]
+        assert await search_similar_documents("What is asthma?", k=1) == hits
+        # The score cutoff is applied to the cached results
+        assert await search_similar_documents("What is asthma?", k=1, min_score=0.95) == []
+        assert backend.client.search.await_count == 1
+        assert mock_embed.call_count == 1
+        
+        await upsert_chunk_vectors(
+            backend,
+            {"id-1": ("New chunk.", {"source": "b.txt"})},
+            ["id-1"],
+            [np.array([0.2] * 768)]
+        )
+        
+        await search_similar_documents("What is asthma?", k=1)
+        assert backend.client.search.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_search_embeds_and_searches_once():
+    """Test that a batch of queries shares one embedding call and one batched search"""
+    backend = make_local_backend()
+    documents = [
+        {"page_content": "Gout causes sudden joint pain.", "metadata": {"source": "gout.txt", "chunk": 0}},
+        {"page_content": "Asthma narrows the airways.", "metadata": {"source": "asthma.txt", "chunk": 0}},
+    ]
+    directions = {
+        "Gout causes sudden joint pain.": np.array([1.0, 0.0, 0.0]),
+        "Asthma narrows the airways.": np.array([0.0, 1.0, 0.0]),
+        "What is gout?": np.array([1.0, 0.1, 0.0]),
+        "What is asthma?": np.array([0.1, 1.0, 0.0]),
+    }
+    
+    async def fake_embed(texts):
+        return [directions[text] for text in texts]
+    
+    with patch("app.database.vector_store.get_vector_backend", return_value=backend), \
+         patch("app.database.vector_store.embed_documents", side_effect=fake_embed) as mock_embed, \
+         patch("app.database.vector_store.get_retrieval_cache", return_value=RetrievalCache()):
+        await init_vector_store(documents)
+        mock_embed.reset_mock()
+        
+        with patch.object(backend.client, "search_batch", wraps=backend.client.search_batch) as spy:
+            queries = ["What is gout?", "What is asthma?", "What is gout?"]
+            results = await search_similar_documents_batch(queries, k=1, min_score=0.5)
+            
+            assert [[hit.content for hit in hits] for hits in results] == [
+                ["Gout causes sudden joint pain."],
+                ["Asthma narrows the airways."],
+                ["Gout causes sudden joint pain."],
+            ]
+            mock_embed.assert_called_once_with(["What is gout?", "What is asthma?"])
+            spy.assert_awaited_once()
+            
+            # Repeated queries are served from the retrieval cache
+            assert await search_similar_documents_batch(["What is asthma?"], k=1) == [results[1]]
+            assert spy.await_count == 1 and mock_embed.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_transient_qdrant_errors_are_retried():
+    """Test that timeouts are retried with backoff and other errors are raised at once"""
+    backend = make_mock_backend(retries=2, retry_backoff=0)
+    backend.client.search.side_effect = [
+        ResponseHandlingException(TimeoutError("timed out")),
+        [scored_point("Gout.", {"source": "gout.txt"}, 0.7)],
+    ]
+    
+    assert await backend.search(np.array([0.1, 0.2, 0.3]), k=1) == [("Gout.", {"source": "gout.txt"}, 0.7)]
+    assert backend.stats() == {"calls": 2, "retries": 1, "failures": 0}
+    
+    backend.client.search.side_effect = UnexpectedResponse(400, "Bad Request", b"wrong vector size", {})
+    with pytest.raises(UnexpectedResponse):
+        await backend.search(np.array([0.1]), k=1)
+    assert backend.client.search.await_count == 3
+    assert backend.stats()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_collection_is_created_on_first_use():
+    """Test that a missing collection is created with the configured vector size"""
+    backend = make_local_backend()
+    
+    assert await backend.search(np.array([1.0, 0.0, 0.0]), k=3) == []
+    collection = await backend.client.get_collection("test_collection")
+    assert collection.config.params.vectors.size == 3
+
+
+def test_fuse_rankings():
+    """Test that reciprocal rank fusion favours hits found by both searches"""
+    a, b, c = SearchHit("A", 0.9, "a.txt"), SearchHit("B", 0.8, "b.txt"), SearchHit("C", 12.0, "c.txt")
+    
+    fused = fuse_rankings([[a, b], [c, b]], k=3, rrf_k=60)
+    
+    assert [hit.content for hit in fused] == ["B", "A", "C"]
+    assert fused[0].rrf_score == pytest.approx(2 / 62)
+    assert fused[1].rrf_score == pytest.approx(1 / 61)
+    # The hits keep their own score
+    assert [hit.score for hit in fused] == [0.8, 0.9, 12.0]
+    assert len(fuse_rankings([[a, b], [c, b]], k=1)) == 1
+
+
+@pytest.mark.asyncio
+async def test_hybrid_search_fuses_vector_and_lexical_hits(monkeypatch):
+    """Test that ingested chunks are indexed lexically and both rankings are fused"""
+    monkeypatch.setenv("HYBRID_RETRIEVAL", "true")
+    backend = make_local_backend()
+    
+    documents = [
+        {"page_content": "Gout causes sudden joint pain.", "metadata": {"source": "gout.txt", "chunk": 0}},
+        {"page_content": "Allopurinol 100mg daily lowers uric acid.", "metadata": {"source": "gout.txt", "chunk": 1}},
+        {"page_content": "Allopurinol dosing for asthma patients.", "metadata": {"source": "other.txt", "chunk": 0}},
+    ]
+    # Only the first chunk is close to the query embedding
+    directions = {document["page_content"]: np.eye(3)[i] for i, document in enumerate(documents)}
+    
+    async def fake_embed(texts):
+        return [directions[text] for text in texts]
+    
+    with patch("app.database.vector_store.get_vector_backend", return_value=backend), \
+         patch("app.database.vector_store.embed_documents", side_effect=fake_embed) as mock_embed, \
+         patch("app.database.vector_store.embed_text", return_value=np.array([1.0, 0.0, 0.0])), \
+         patch("app.database.vector_store.get_lexical_index", return_value=LexicalIndex()), \
+         patch("app.database.vector_store.get_retrieval_cache", return_value=RetrievalCache()):
+        await init_vector_store(documents)
+        
+        hits = await search_similar_documents("allopurinol 100mg for gout", k=3)
+        assert [hit.content for hit in hits] == [
+            "Gout causes sudden joint pain.",
+            "Allopurinol 100mg daily lowers uric acid.",
+            "Allopurinol dosing for asthma patients.",
+        ]
+        assert hits[1].source == "gout.txt" and hits[1].chunk == 1
+        assert hits[0].rrf_score == pytest.approx(1 / 61 + 1 / 62)
+        # Lexical hits carry their cosine similarity too, from the stored vectors
+        assert [hit.score for hit in hits] == pytest.approx([1.0, 0.0, 0.0])
+        assert mock_embed.call_count == 1
+        
+        # The score cutoff also drops lexical matches that are not similar enough
+        hits = await search_similar_documents("allopurinol 100mg for gout", k=3, min_score=0.5)
+        assert [hit.content for hit in hits] == ["Gout causes sudden joint pain."]
+        
+        # Metadata filters also apply to the lexical hits
+        hits = await search_similar_documents("allopurinol", k=3, filters={"source": "other.txt"})
+        assert [hit.content for hit in hits] == ["Allopurinol dosing for asthma patients."]
+
+
+@pytest.mark.asyncio
+async def test_writes_save_the_lexical_index_only_when_due(monkeypatch, tmp_path):
+    """Test that requests do not rewrite the lexical snapshot before its save interval"""
+    monkeypatch.setenv("HYBRID_RETRIEVAL", "true")
+    index = LexicalIndex(path=str(tmp_path / "lexical.npz"), save_interval=3600)
+    documents = [{"page_content": "Gout causes sudden joint pain.", "metadata": {"source": "gout.txt", "chunk": 0}}]
+    
+    async def fake_embed(texts):
+        return [np.array([1.0, 0.0, 0.0]) for _ in texts]
+    
+    with patch("app.database.vector_store.get_vector_backend", return_value=make_local_backend()), \
+         patch("app.database.vector_store.embed_documents", side_effect=fake_embed), \
+         patch("app.database.vector_store.get_lexical_index", return_value=index):
+        version = await get_collection_version()
+        await init_vector_store(documents)
+        
+        # One bump for the write, and no snapshot yet
+        assert await get_collection_version() == version + 1
+        assert not os.path.exists(index.path)
+        assert await flush_lexical_index() is False
+        
+        # Once due, the snapshot is written and other processes are told to reload it
+        index.save_interval = 0
+        assert await flush_lexical_index() is True
+        assert os.path.exists(index.path)
+        assert await get_collection_version() == version + 2
@@ -27,11 +27,13 @@ const MedicalResponse = ({ answer, sources }) => {
             {sources.map((source, index) => (
               <AccordionItem key={index} value={`source-${index}`}>
                 <AccordionTrigger className="text-sm text-gray-600">
-                  Source {index + 1}
+                  {source.title || source.source || `Source ${index + 1}`}
+                  {source.page != null && ` (p. ${source.page})`}
+                  {` · score ${source.score.toFixed(2)}`}
                 </AccordionTrigger>
                 <AccordionContent>
                   <div className="text-xs bg-gray-50 p-2 rounded border">
-                    {source}
+                    {source.content}
                   </div>
                 </AccordionContent>
               </AccordionItem>